@@ -0,0 +1,100 @@
+"""Answer cache adapter bridging the async semantic cache to sync domain services."""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ..ports.cache import IAnswerCache, ISemanticCache
+from .background_loop import BackgroundLoop
+
+logger = logging.getLogger(__name__)
+
+# Hit fields kept in the cache; embeddings and other bulky metadata are dropped.
+_HIT_FIELDS = ("id", "text", "source", "score", "page_start", "page_end")
+
+
+class SemanticAnswerCache(IAnswerCache):
+    """IAnswerCache over an ISemanticCache, run on a shared background loop.
+
+    Redis errors and timeouts degrade to cache misses; stores happen off the
+    request path.
+    """
+
+    def __init__(
+        self,
+        semantic_cache: ISemanticCache,
+        loop: BackgroundLoop,
+        threshold: float = 0.95,
+        timeout: float = 0.5,
+    ):
+        self.semantic_cache = semantic_cache
+        self.loop = loop
+        self.threshold = threshold
+        self.timeout = timeout
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _get_similar(self, tenant_id: str, query_vector: List[float]):
+        return self.semantic_cache.get_similar(
+            np.asarray(query_vector, dtype=np.float32), self.threshold, tenant_id=tenant_id
+        )
+
+    def lookup(self, tenant_id: str, query_vector: List[float], k: int) -> Optional[Dict[str, Any]]:
+        try:
+            cached = self.loop.run(self._get_similar(tenant_id, query_vector), self.timeout)
+        except Exception as e:
+            logger.warning(f"Answer cache lookup failed, treating as miss: {e}")
+            cached = None
+        return self._result(cached, k)
+
+    async def alookup(
+        self, tenant_id: str, query_vector: List[float], k: int
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            cached = await asyncio.wait_for(
+                self._get_similar(tenant_id, query_vector), self.timeout
+            )
+        except Exception as e:
+            logger.warning(f"Answer cache lookup failed, treating as miss: {e}")
+            cached = None
+        return self._result(cached, k)
+
+    def _result(self, cached: Optional[Dict[str, Any]], k: int) -> Optional[Dict[str, Any]]:
+        metadata = (cached or {}).get("metadata") or {}
+        # An answer grounded on a different number of hits is not the one asked for
+        if not cached or metadata.get("k") != k:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return {
+            "answer": cached["response"],
+            "hits": metadata.get("hits", []),
+            "similarity": cached.get("similarity"),
+        }
+
+    def store(
+        self,
+        tenant_id: str,
+        query: str,
+        query_vector: List[float],
+        answer: str,
+        hits: List[Dict[str, Any]],
+        k: int,
+    ) -> None:
+        metadata = {
+            "tenant_id": tenant_id,
+            "k": k,
+            "hits": [{f: hit.get(f) for f in _HIT_FIELDS if f in hit} for hit in hits],
+        }
+        self.loop.submit(
+            self.semantic_cache.store(
+                query, np.asarray(query_vector, dtype=np.float32), answer, metadata
+            )
+        )
+
+    def invalidate_tenant(self, tenant_id: str) -> None:
+        try:
+            self.loop.run(self.semantic_cache.clear_tenant_cache(tenant_id), timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Answer cache invalidation failed for tenant {tenant_id}: {e}")
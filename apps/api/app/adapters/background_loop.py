@@ -0,0 +1,46 @@
+"""Dedicated event loop thread for calling async adapters from sync code."""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """Runs an asyncio loop on a daemon thread.
+
+    Sync request handlers execute on worker threads without a running loop; routing
+    their async cache calls through one long-lived loop lets connection pools bound
+    to that loop be reused instead of opening a new loop per call.
+    """
+
+    def __init__(self, name: str = "background-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Run ``coro`` on the loop and block until it completes."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("BackgroundLoop.run cannot be called from the loop thread")
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except Exception:
+            future.cancel()
+            raise
+
+    def submit(self, coro: Awaitable[Any]) -> "concurrent.futures.Future[Any]":
+        """Schedule ``coro`` without waiting for it (fire-and-forget)."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self) -> None:
+        """Stop the loop and wait for its thread to exit."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
@@ -0,0 +1,383 @@
+"""Pipelined batch ingest of document trees.
+
+Documents flow through three stages connected by bounded queues, each with its own
+worker threads, so extraction, embedding and store writes overlap instead of
+running one after another per document:
+
+    extract + chunk  ->  embed  ->  write
+
+The embed stage packs chunk groups from several documents into one embeddings
+request.  Every document gets a stable source id (tenant + relative path) and is
+ingested incrementally, so re-running a batch only embeds what changed.  That also
+makes resuming safe: progress is checkpointed to the ingest job repository as a
+low watermark over the sorted file list, and a resumed run starts from it.
+"""
+
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..domain.chunking import chunk_id
+from ..domain.services import RagService, stable_source_id
+from .ingest_job_repo import IngestJobRepository
+from .ingest_queue import IngestQueueFull
+
+logger = logging.getLogger(__name__)
+
+BATCH_EXTENSIONS = (".txt", ".md", ".pdf", ".docx", ".doc")
+_MAX_ERRORS = 50  # per-document errors kept on the job record
+_DONE = object()  # stage shutdown sentinel
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def list_batch_files(root: str, pattern: str = "**/*") -> List[str]:
+    """Supported files under ``root`` matching ``pattern``, as sorted relative paths."""
+    root = os.path.abspath(root)
+    files = []
+    for path in glob.glob(os.path.join(root, pattern), recursive=True):
+        path = os.path.abspath(path)
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            continue
+        if os.path.splitext(path.lower())[1] in BATCH_EXTENSIONS:
+            files.append(os.path.relpath(path, root))
+    return sorted(files)
+
+
+@dataclass
+class _Doc:
+    index: int
+    path: str
+    title: str
+    source_id: str
+    manifest: Set[str]
+    seen: Set[str] = field(default_factory=set)
+    pending: int = 0  # chunk groups queued but not yet written
+    chunked: bool = False
+    created: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class _Group:
+    doc: _Doc
+    chunks: List[str]
+    metadata: Optional[List[Dict[str, Any]]]
+    embeddings: Optional[List[List[float]]] = None
+
+
+class _Run:
+    """Progress of one batch job: document completion and the checkpoint watermark."""
+
+    def __init__(self, job: Dict[str, Any], total: int, start: int):
+        self.job_id = job["jobId"]
+        self.tenant_id = job["tenantId"]
+        self.total = total
+        self.watermark = start  # every document before this index is done
+        self.completed: Set[int] = set()
+        self.processed = start  # documents past the watermark are re-run on resume
+        self.chunks_created = job.get("chunksCreated", 0)
+        self.failed = job.get("failed", 0)
+        self.errors: List[Dict[str, str]] = list(job.get("errors", []))
+        self.lock = threading.Lock()
+
+
+class BatchIngestPipeline:
+    """Runs batch ingest jobs recorded in an ``IngestJobRepository``.
+
+    ``workers`` threads run each stage; ``queue_size`` bounds the chunk groups
+    buffered between stages, which bounds memory regardless of batch size.
+    """
+
+    def __init__(
+        self,
+        rag: RagService,
+        jobs: IngestJobRepository,
+        workers: int = 2,
+        queue_size: int = 16,
+        group_size: int = 64,
+        max_running: int = 2,
+        checkpoint_every: int = 20,
+    ):
+        self.rag = rag
+        self.jobs = jobs
+        self.workers = workers
+        self.queue_size = queue_size
+        self.group_size = group_size  # chunks per group handed between stages
+        self.embed_size = max(group_size, rag.ingest_window)  # chunks per embeddings request
+        self.max_running = max_running
+        self.checkpoint_every = checkpoint_every
+        self._running: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    # Jobs --------------------------------------------------------------------
+
+    def create_job(
+        self, tenant_id: str, user_id: str, root: str, pattern: str = "**/*"
+    ) -> Dict[str, Any]:
+        """Record a batch job for the files under ``root`` matching ``pattern``."""
+        now_ms = _now_ms()
+        job = {
+            "jobId": str(uuid.uuid4()),
+            "kind": "batch",
+            "tenantId": tenant_id,
+            "userId": user_id,
+            "title": f"Batch: {pattern}",
+            "root": os.path.abspath(root),
+            "pattern": pattern,
+            "status": "created",  # not a pending status: the ingest worker pool skips it
+            "total": len(list_batch_files(root, pattern)),
+            "processed": 0,
+            "checkpoint": 0,
+            "chunksCreated": 0,
+            "failed": 0,
+            "errors": [],
+            "createdAt": now_ms,
+            "updatedAt": now_ms,
+        }
+        self.jobs.create_job(job)
+        return job
+
+    def reject(self, job_id: str, reason: str) -> None:
+        """Mark a job that could not be started, so it is not mistaken for a pending one."""
+        self.jobs.update_job(
+            job_id, {"status": "rejected", "error": reason, "updatedAt": _now_ms()}
+        )
+
+    def start(self, job_id: str) -> None:
+        """Run (or resume) a job on a background thread."""
+        with self._lock:
+            self._running = {k: t for k, t in self._running.items() if t.is_alive()}
+            if job_id in self._running:
+                return
+            if len(self._running) >= self.max_running:
+                raise IngestQueueFull(f"{self.max_running} batch ingest jobs are already running")
+            thread = threading.Thread(
+                target=self._run_safely, args=(job_id,), name=f"batch-{job_id[:8]}", daemon=True
+            )
+            self._running[job_id] = thread
+        thread.start()
+
+    def _run_safely(self, job_id: str) -> None:
+        try:
+            self.run(job_id)
+        except Exception as e:
+            logger.error(f"Batch ingest job {job_id} failed: {e}")
+            self.jobs.update_job(
+                job_id, {"status": "failed", "error": str(e), "updatedAt": _now_ms()}
+            )
+
+    def run(self, job_id: str) -> Dict[str, Any]:
+        """Run a job to completion from its checkpoint; returns the final job record."""
+        job = self.jobs.get_job(job_id)
+        if not job or job.get("kind") != "batch":
+            raise ValueError(f"Unknown batch ingest job: {job_id}")
+        files = list_batch_files(job["root"], job["pattern"])
+        start = min(job.get("checkpoint", 0), len(files))
+        run = _Run(job, len(files), start)
+        self.jobs.update_job(
+            job_id, {"status": "running", "total": len(files), "updatedAt": _now_ms()}
+        )
+        logger.info(f"Batch ingest {job_id}: {len(files) - start} of {len(files)} files to go")
+
+        embed_q: "queue.Queue" = queue.Queue(self.queue_size)
+        write_q: "queue.Queue" = queue.Queue(self.queue_size)
+        todo = iter(list(enumerate(files))[start:])
+        todo_lock = threading.Lock()
+
+        stages = [
+            (self._extract_worker, (run, job["root"], todo, todo_lock, embed_q), embed_q),
+            (self._embed_worker, (run, embed_q, write_q), write_q),
+            (self._write_worker, (run, write_q), None),
+        ]
+        started = []
+        for target, args, downstream in stages:
+            threads = [
+                threading.Thread(target=target, args=args, daemon=True) for _ in range(self.workers)
+            ]
+            for t in threads:
+                t.start()
+            started.append((threads, downstream))
+        # A stage is finished once its upstream is; then tell the next one to stop
+        for threads, downstream in started:
+            for t in threads:
+                t.join()
+            if downstream is not None:
+                for _ in range(self.workers):
+                    downstream.put(_DONE)
+
+        # Changed documents can change answers
+        if self.rag.answer_cache and run.chunks_created:
+            self.rag.answer_cache.invalidate_tenant(run.tenant_id)
+        self._checkpoint(run, final=True)
+        return self.jobs.get_job(job_id)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            running = sum(t.is_alive() for t in self._running.values())
+        return {"running": running, "max_running": self.max_running}
+
+    # Stages ------------------------------------------------------------------
+
+    def _extract_worker(self, run: _Run, root: str, todo, todo_lock, embed_q) -> None:
+        """Extract and chunk documents, queueing chunk groups for embedding."""
+        while True:
+            with todo_lock:
+                item = next(todo, None)
+            if item is None:
+                return
+            index, path = item
+            doc = _Doc(
+                index=index,
+                path=path,
+                title=path,
+                source_id=stable_source_id(run.tenant_id, path),
+                manifest=set(),
+            )
+            try:
+                doc.manifest = set(
+                    self.rag.store.get_source_manifest(run.tenant_id, doc.source_id) or ()
+                )
+                spans, locate = self.rag.file_spans(os.path.join(root, path))
+                group: List[Tuple[str, int, int]] = []
+                for span in spans:
+                    cid = chunk_id(run.tenant_id, span[0])
+                    if cid in doc.seen:
+                        continue
+                    doc.seen.add(cid)
+                    if cid not in doc.manifest:
+                        group.append(span)
+                    if len(group) >= self.group_size:
+                        self._queue_group(run, doc, group, locate, embed_q)
+                        group = []
+                if group:
+                    self._queue_group(run, doc, group, locate, embed_q)
+            except Exception as e:
+                doc.error = f"extract: {e}"
+            with run.lock:
+                doc.chunked = True
+            self._maybe_finish(run, doc)
+
+    def _queue_group(self, run: _Run, doc: _Doc, spans, locate, embed_q) -> None:
+        metadata = [locate(start, end) for _, start, end in spans] if locate else None
+        with run.lock:
+            doc.pending += 1
+        embed_q.put(_Group(doc, [text for text, _, _ in spans], metadata))  # Blocks when behind
+
+    def _embed_worker(self, run: _Run, embed_q, write_q) -> None:
+        """Embed chunk groups, packing groups from several documents per request."""
+        while True:
+            first = embed_q.get()
+            if first is _DONE:
+                return
+            groups = [first]
+            size = len(first.chunks)
+            stop = False
+            while size < self.embed_size:
+                try:
+                    nxt = embed_q.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _DONE:
+                    stop = True
+                    break
+                groups.append(nxt)
+                size += len(nxt.chunks)
+            try:
+                vectors = self.rag.embed.embed_batch([c for g in groups for c in g.chunks])
+                offset = 0
+                for g in groups:
+                    g.embeddings = vectors[offset : offset + len(g.chunks)]
+                    offset += len(g.chunks)
+                    write_q.put(g)
+            except Exception as e:
+                for g in groups:
+                    if g.embeddings is None:
+                        self._group_failed(run, g, f"embed: {e}")
+            if stop:
+                return
+
+    def _write_worker(self, run: _Run, write_q) -> None:
+        """Write embedded groups to the store under their document's source."""
+        while True:
+            group = write_q.get()
+            if group is _DONE:
+                return
+            doc = group.doc
+            try:
+                self.rag.store.upsert_chunks(
+                    tenant_id=run.tenant_id,
+                    title=doc.title,
+                    chunks=group.chunks,
+                    embeddings=group.embeddings,
+                    source_id=doc.source_id,
+                    metadata=group.metadata,
+                )
+            except Exception as e:
+                self._group_failed(run, group, f"write: {e}")
+                continue
+            with run.lock:
+                doc.created += len(group.chunks)
+                doc.pending -= 1
+            self._maybe_finish(run, doc)
+
+    # Progress ----------------------------------------------------------------
+
+    def _group_failed(self, run: _Run, group: _Group, error: str) -> None:
+        with run.lock:
+            group.doc.error = group.doc.error or error
+            group.doc.pending -= 1
+        self._maybe_finish(run, group.doc)
+
+    def _maybe_finish(self, run: _Run, doc: _Doc) -> None:
+        with run.lock:
+            if not doc.chunked or doc.pending or doc.index in run.completed:
+                return
+            run.completed.add(doc.index)
+        if doc.error is None:
+            # Chunks that disappeared from the document; skipped on errors so a
+            # partial read never deletes what is still there
+            removed = sorted(doc.manifest - doc.seen)
+            if removed:
+                try:
+                    self.rag.store.remove_chunks(run.tenant_id, doc.source_id, removed)
+                except Exception as e:
+                    doc.error = f"remove: {e}"
+        with run.lock:
+            run.processed += 1
+            run.chunks_created += doc.created
+            if doc.error is not None:
+                run.failed += 1
+                logger.warning(f"Batch ingest {run.job_id}: {doc.path} failed ({doc.error})")
+                if len(run.errors) < _MAX_ERRORS:
+                    run.errors.append({"path": doc.path, "error": doc.error})
+            while run.watermark in run.completed:
+                run.completed.discard(run.watermark)
+                run.watermark += 1
+            due = run.processed % self.checkpoint_every == 0
+        if due:
+            self._checkpoint(run)
+
+    def _checkpoint(self, run: _Run, final: bool = False) -> None:
+        with run.lock:
+            updates = {
+                "checkpoint": run.watermark,
+                "processed": run.processed,
+                "chunksCreated": run.chunks_created,
+                "failed": run.failed,
+                "errors": list(run.errors),
+                "updatedAt": _now_ms(),
+            }
+        if final:
+            updates["status"] = "completed"
+            if run.failed:
+                updates["error"] = f"{run.failed} documents failed"
+        self.jobs.update_job(run.job_id, updates)
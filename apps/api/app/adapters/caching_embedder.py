@@ -0,0 +1,150 @@
+"""Read-through embedding cache decorating any IEmbedder."""
+
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from ..domain.chunking import normalize_text
+from ..ports.cache import IVectorCache
+from ..ports.llm import IEmbedder
+from .background_loop import BackgroundLoop
+
+logger = logging.getLogger(__name__)
+
+
+class LRUEmbeddingCache:
+    """Thread-safe in-process LRU of embeddings keyed by text hash."""
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is not None:
+                self._data.move_to_end(key)
+            return vector
+
+    def put(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._data[key] = vector
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+class CachingEmbedder(IEmbedder):
+    """IEmbedder decorator with a two-tier (LRU, then Redis) read-through cache.
+
+    Keys are (model name, hash of normalised text).  Only misses reach the wrapped
+    embedder; their vectors are backfilled into both tiers.  Redis is optional and
+    failures there degrade to cache misses rather than errors.
+    """
+
+    def __init__(
+        self,
+        inner: IEmbedder,
+        model_name: str,
+        vector_cache: Optional[IVectorCache] = None,
+        loop: Optional[BackgroundLoop] = None,
+        max_entries: int = 10_000,
+        redis_timeout: float = 0.5,
+    ):
+        self.inner = inner
+        self.model_name = model_name
+        self.vector_cache = vector_cache
+        self.loop = loop if loop is not None or vector_cache is None else BackgroundLoop()
+        self.lru = LRUEmbeddingCache(max_entries)
+        self.redis_timeout = redis_timeout
+        self.stats = {"memory_hits": 0, "redis_hits": 0, "misses": 0}
+
+    def _key(self, normalized: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{normalized}".encode()).hexdigest()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text], query=True)[0]
+
+    def embed_batch(self, chunks: list[str]) -> list[list[float]]:
+        return self._embed(chunks, query=False)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        normalized = normalize_text(text)
+        key = self._key(normalized)
+        vector = self.lru.get(key)
+        if vector is not None:
+            self.stats["memory_hits"] += 1
+            return vector
+        if self.vector_cache is not None:
+            # Already on an event loop, so query Redis directly rather than via self.loop
+            try:
+                found = await asyncio.wait_for(
+                    self.vector_cache.get_batch_embeddings([normalized]), self.redis_timeout
+                )
+                vector = found.get(normalized)
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed, treating as miss: {e}")
+            if vector:
+                self.stats["redis_hits"] += 1
+                self.lru.put(key, vector)
+                return vector
+        self.stats["misses"] += 1
+        vector = await self.inner.aembed_query(text)
+        self.lru.put(key, vector)
+        self._redis_store({normalized: vector})
+        return vector
+
+    def _embed(self, texts: List[str], query: bool) -> List[List[float]]:
+        normalized = [normalize_text(t) for t in texts]
+        keys = [self._key(n) for n in normalized]
+        results: List[Optional[List[float]]] = [self.lru.get(k) for k in keys]
+        self.stats["memory_hits"] += sum(r is not None for r in results)
+
+        # Tier 2: Redis, for everything the LRU did not have
+        pending = {n: k for n, k, r in zip(normalized, keys, results) if r is None}
+        if pending and self.vector_cache is not None:
+            found = self._redis_get(list(pending))
+            for n, vector in found.items():
+                self.lru.put(pending.pop(n), vector)
+            self.stats["redis_hits"] += len(found)
+            results = [r if r is not None else self.lru.get(k) for r, k in zip(results, keys)]
+
+        # Embed each distinct miss once, using the original (un-normalised) text
+        misses: Dict[str, str] = {}
+        for text, n, r in zip(texts, normalized, results):
+            if r is None and n not in misses:
+                misses[n] = text
+        if misses:
+            self.stats["misses"] += len(misses)
+            miss_texts = list(misses.values())
+            if query and len(miss_texts) == 1:
+                vectors = [self.inner.embed_query(miss_texts[0])]
+            else:
+                vectors = self.inner.embed_batch(miss_texts)
+            fresh = dict(zip(misses, vectors))
+            for n, vector in fresh.items():
+                self.lru.put(self._key(n), vector)
+            self._redis_store(fresh)
+            results = [r if r is not None else fresh[n] for r, n in zip(results, normalized)]
+
+        return results  # type: ignore[return-value]
+
+    def _redis_get(self, normalized: List[str]) -> Dict[str, List[float]]:
+        try:
+            found = self.loop.run(
+                self.vector_cache.get_batch_embeddings(normalized), timeout=self.redis_timeout
+            )
+            return {n: v for n, v in found.items() if v}
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed, treating as misses: {e}")
+            return {}
+
+    def _redis_store(self, vectors: Dict[str, List[float]]) -> None:
+        if self.vector_cache is None or not vectors:
+            return
+        # Backfill off the request path; the LRU already serves these
+        self.loop.submit(self.vector_cache.store_batch_embeddings(vectors))
@@ -0,0 +1,40 @@
+"""Local cross-encoder reranker (sentence-transformers), run on CPU by default."""
+
+import asyncio
+import threading
+from typing import Any, Dict, List
+
+from sentence_transformers import CrossEncoder
+
+from ..ports.reranker import IReranker
+
+
+class CrossEncoderReranker(IReranker):
+    """Scores (query, chunk) pairs jointly, which ranks far better than embeddings alone.
+
+    All candidates of a query are scored in batches of ``batch_size`` pairs; the
+    model is shared, so concurrent queries are serialised rather than oversubscribing
+    the CPU.
+    """
+
+    def __init__(
+        self, model_name: str, batch_size: int = 32, max_length: int = 512, device: str = "cpu"
+    ):
+        self.model = CrossEncoder(model_name, max_length=max_length, device=device)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+
+    def rerank(self, query: str, hits: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        if not hits:
+            return []
+        pairs = [(query, hit.get("text", "")) for hit in hits]
+        with self._lock:
+            scores = self.model.predict(
+                pairs, batch_size=self.batch_size, show_progress_bar=False, convert_to_numpy=True
+            )
+        ranked = sorted(zip(hits, scores.tolist()), key=lambda pair: pair[1], reverse=True)
+        return [{**hit, "rerank_score": score} for hit, score in ranked[:k]]
+
+    async def arerank(self, query: str, hits: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        # Inference is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(self.rerank, query, hits, k)
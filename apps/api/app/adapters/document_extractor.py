@@ -0,0 +1,140 @@
+"""Incremental text extraction for PDF and DOCX documents.
+
+Pages are yielded in order as they are extracted, so ingestion can chunk and embed
+the start of a document while the rest is still being parsed.  Large PDFs are
+split into page ranges extracted in parallel worker processes (PDF parsing is
+CPU-bound and holds the GIL).
+"""
+
+import concurrent.futures
+import concurrent.futures.process
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from ..ports.document_extractor import IDocumentExtractor
+
+logger = logging.getLogger(__name__)
+
+
+def _page_text(page, number: int) -> str:
+    try:
+        return page.extract_text() or ""
+    except Exception as e:
+        # One malformed page should not fail the whole document
+        logger.warning(f"Failed to extract text from page {number}: {e}")
+        return ""
+
+
+def _extract_pdf_range(file_path: str, start: int, end: int) -> List[str]:
+    """Extract pages [start, end) of a PDF; runs in a worker process."""
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(file_path)
+    return [_page_text(reader.pages[i], i + 1) for i in range(start, end)]
+
+
+class DocumentExtractor(IDocumentExtractor):
+    """Extracts PDF pages (in a process pool when large) and DOCX paragraphs.
+
+    PDFs with at least ``parallel_min_pages`` pages are split into tasks of
+    ``pages_per_task`` pages; at most ``2 * max_workers`` tasks are in flight so
+    extracted text does not pile up ahead of the consumer.
+    """
+
+    def __init__(
+        self, max_workers: int = 2, parallel_min_pages: int = 32, pages_per_task: int = 16
+    ):
+        self.max_workers = max_workers
+        self.parallel_min_pages = parallel_min_pages
+        self.pages_per_task = pages_per_task
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def iter_pages(self, file_path: str, file_ext: str) -> Iterator[Tuple[Optional[int], str]]:
+        if file_ext == ".pdf":
+            return self._pdf_pages(file_path)
+        if file_ext in (".docx", ".doc"):
+            return self._docx_paragraphs(file_path, file_ext)
+        raise ValueError(f"Unsupported document type: {file_ext}")
+
+    def close(self) -> None:
+        """Shut down worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned (not forked) workers: the API process runs threads and event loops
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _pdf_pages(self, file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+        try:
+            import PyPDF2
+        except ImportError:
+            raise ValueError("PyPDF2 not installed. Cannot process PDF files.")
+
+        try:
+            reader = PyPDF2.PdfReader(file_path)
+            total = len(reader.pages)
+        except Exception as e:
+            raise ValueError(f"Failed to extract text from .pdf file: {e}")
+
+        if total < self.parallel_min_pages or self.max_workers <= 1:
+            for i, page in enumerate(reader.pages):
+                yield i + 1, _page_text(page, i + 1)
+            return
+
+        logger.info(f"Extracting {total} PDF pages with {self.max_workers} worker processes")
+        ranges = deque(
+            (start, min(start + self.pages_per_task, total))
+            for start in range(0, total, self.pages_per_task)
+        )
+        in_flight: Deque[Tuple[int, concurrent.futures.Future]] = deque()
+        next_page = 0
+        try:
+            while ranges or in_flight:
+                while ranges and len(in_flight) < 2 * self.max_workers:
+                    start, end = ranges.popleft()
+                    in_flight.append(
+                        (start, self._pool().submit(_extract_pdf_range, file_path, start, end))
+                    )
+                start, future = in_flight.popleft()
+                for i, text in enumerate(future.result()):
+                    yield start + i + 1, text
+                    next_page = start + i + 1
+        except concurrent.futures.process.BrokenProcessPool as e:
+            logger.warning(f"PDF extraction pool failed ({e}); continuing in-process")
+            self.close()
+            for i in range(next_page, total):
+                yield i + 1, _page_text(reader.pages[i], i + 1)
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+
+    def _docx_paragraphs(
+        self, file_path: str, file_ext: str
+    ) -> Iterator[Tuple[Optional[int], str]]:
+        try:
+            from docx import Document
+        except ImportError:
+            raise ValueError("python-docx not installed. Cannot process DOCX files.")
+
+        try:
+            paragraphs = Document(file_path).paragraphs
+        except Exception as e:
+            # Legacy .doc and other non-OOXML files: fall back to reading them as text
+            logger.warning(f"Could not parse {file_ext} file, reading it as plain text: {e}")
+            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                yield None, f.read()
+            return
+        for paragraph in paragraphs:
+            yield None, paragraph.text + "\n\n"  # a blank line is a chunk boundary
@@ -1,5 +1,34 @@
+import json
+import os
+import threading
 from typing import Any, Dict, List, Optional
 
+# Jobs in these states are waiting to run; "processing" jobs hold a lease.
+PENDING_STATUSES = ("queued", "retrying")
+# Batch jobs share the repository but are run by BatchIngestPipeline, never the worker pool
+BATCH_KIND = "batch"
+
+
+def _claimable(job: Dict[str, Any], worker_id: str, now_ms: int) -> bool:
+    """A job can be leased if it is pending, or its lease is ours or has expired."""
+    if job.get("kind") == BATCH_KIND:
+        return False
+    status = job.get("status")
+    if status in PENDING_STATUSES:
+        return job.get("notBefore", 0) <= now_ms
+    if status == "processing":
+        return job.get("leaseOwner") == worker_id or job.get("leaseExpiresAt", 0) < now_ms
+    return False
+
+
+def _is_stale(job: Dict[str, Any], now_ms: int, grace_ms: int) -> bool:
+    """Pending jobs nobody picked up within ``grace_ms``, or processing with a dead lease."""
+    if job.get("kind") == BATCH_KIND:
+        return False
+    if job.get("status") in PENDING_STATUSES:
+        return max(job.get("updatedAt", 0), job.get("notBefore", 0)) + grace_ms < now_ms
+    return job.get("status") == "processing" and job.get("leaseExpiresAt", 0) < now_ms
+
 
 class IngestJobRepository:
     def create_job(self, job: Dict[str, Any]) -> None:
@@ -14,10 +43,19 @@ class IngestJobRepository:
     def list_jobs(self, tenant_id: str, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         raise NotImplementedError
 
+    def claim_job(self, job_id: str, worker_id: str, lease_ms: int, now_ms: int) -> bool:
+        """Atomically lease a job to ``worker_id`` (also used to renew the lease)."""
+        raise NotImplementedError
+
+    def list_stale_jobs(self, now_ms: int, grace_ms: int, limit: int = 100) -> List[Dict[str, Any]]:
+        """Jobs that should be (re)run: long-pending ones and those whose lease expired."""
+        raise NotImplementedError
+
 
 class InMemoryIngestJobRepo(IngestJobRepository):
     def __init__(self):
         self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
 
     def create_job(self, job: Dict[str, Any]) -> None:
         self._jobs[job["jobId"]] = job
@@ -38,6 +76,59 @@ class InMemoryIngestJobRepo(IngestJobRepository):
         jobs.sort(key=lambda j: j.get("updatedAt", 0), reverse=True)
         return jobs[:limit]
 
+    def claim_job(self, job_id: str, worker_id: str, lease_ms: int, now_ms: int) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or not _claimable(job, worker_id, now_ms):
+                return False
+            job.update(
+                {
+                    "status": "processing",
+                    "leaseOwner": worker_id,
+                    "leaseExpiresAt": now_ms + lease_ms,
+                    "updatedAt": now_ms,
+                }
+            )
+            return True
+
+    def list_stale_jobs(self, now_ms: int, grace_ms: int, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            stale = [dict(j) for j in self._jobs.values() if _is_stale(j, now_ms, grace_ms)]
+        stale.sort(key=lambda j: j.get("createdAt", 0))
+        return stale[:limit]
+
+
+class JsonFileIngestJobRepo(InMemoryIngestJobRepo):
+    """In-memory repository persisted to a JSON file (CLI runs without Firestore)."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self._jobs = json.load(f)
+
+    def _save(self) -> None:
+        with self._lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._jobs, f)
+            os.replace(tmp, self.path)
+
+    def create_job(self, job: Dict[str, Any]) -> None:
+        super().create_job(job)
+        self._save()
+
+    def update_job(self, job_id: str, updates: Dict[str, Any]) -> None:
+        super().update_job(job_id, updates)
+        self._save()
+
+    def claim_job(self, job_id: str, worker_id: str, lease_ms: int, now_ms: int) -> bool:
+        claimed = super().claim_job(job_id, worker_id, lease_ms, now_ms)
+        if claimed:
+            self._save()
+        return claimed
+
 
 class FirestoreIngestJobRepo(IngestJobRepository):
     def __init__(self, project_id: Optional[str] = None):
@@ -64,3 +155,32 @@ class FirestoreIngestJobRepo(IngestJobRepository):
             .limit(limit)
         )
         return [d.to_dict() for d in q.stream()]
+
+    def claim_job(self, job_id: str, worker_id: str, lease_ms: int, now_ms: int) -> bool:
+        from google.cloud import firestore  # lazy import
+
+        ref = self._col.document(job_id)
+
+        @firestore.transactional
+        def _claim(transaction) -> bool:
+            snapshot = ref.get(transaction=transaction)
+            if not snapshot.exists or not _claimable(snapshot.to_dict(), worker_id, now_ms):
+                return False
+            transaction.update(
+                ref,
+                {
+                    "status": "processing",
+                    "leaseOwner": worker_id,
+                    "leaseExpiresAt": now_ms + lease_ms,
+                    "updatedAt": now_ms,
+                },
+            )
+            return True
+
+        return _claim(self._db.transaction())
+
+    def list_stale_jobs(self, now_ms: int, grace_ms: int, limit: int = 100) -> List[Dict[str, Any]]:
+        q = self._col.where("status", "in", [*PENDING_STATUSES, "processing"]).limit(limit * 4)
+        stale = [j for j in (d.to_dict() for d in q.stream()) if _is_stale(j, now_ms, grace_ms)]
+        stale.sort(key=lambda j: j.get("createdAt", 0))
+        return stale[:limit]
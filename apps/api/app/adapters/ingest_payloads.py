@@ -0,0 +1,107 @@
+"""Storage for queued ingest payloads, kept out of the job records.
+
+Job records are read on every claim, status poll and recovery sweep (and a
+Firestore document is capped at 1 MiB), so the document text is stored here
+under the job id and the job only carries the returned reference.
+"""
+
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IngestPayloadStore:
+    def put(self, job_id: str, text: str) -> str:
+        """Store a job's text and return a reference to record in the job."""
+        raise NotImplementedError
+
+    def get(self, ref: str) -> Optional[str]:
+        """The stored text, or None if it is gone."""
+        raise NotImplementedError
+
+    def delete(self, ref: str) -> None:
+        raise NotImplementedError
+
+
+class InMemoryIngestPayloadStore(IngestPayloadStore):
+    def __init__(self):
+        self._payloads: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def put(self, job_id: str, text: str) -> str:
+        with self._lock:
+            self._payloads[job_id] = text
+        return job_id
+
+    def get(self, ref: str) -> Optional[str]:
+        return self._payloads.get(ref)
+
+    def delete(self, ref: str) -> None:
+        with self._lock:
+            self._payloads.pop(ref, None)
+
+
+class LocalIngestPayloadStore(IngestPayloadStore):
+    """One UTF-8 file per job in a local directory (single instance only)."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, ref: str) -> str:
+        return os.path.join(self.directory, os.path.basename(ref))
+
+    def put(self, job_id: str, text: str) -> str:
+        ref = f"{job_id}.txt"
+        tmp = self._path(ref) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, self._path(ref))
+        return ref
+
+    def get(self, ref: str) -> Optional[str]:
+        try:
+            with open(self._path(ref), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, ref: str) -> None:
+        try:
+            os.remove(self._path(ref))
+        except FileNotFoundError:
+            pass
+
+
+class GCSIngestPayloadStore(IngestPayloadStore):
+    """One object per job in a GCS bucket, shared by every API instance."""
+
+    def __init__(self, bucket_name: str, prefix: str = "ingest-payloads/"):
+        from google.cloud import storage  # lazy import
+
+        self.bucket = storage.Client().bucket(bucket_name)
+        self.prefix = prefix
+
+    def put(self, job_id: str, text: str) -> str:
+        ref = f"{self.prefix}{job_id}.txt"
+        self.bucket.blob(ref).upload_from_string(text, content_type="text/plain; charset=utf-8")
+        return ref
+
+    def get(self, ref: str) -> Optional[str]:
+        from google.cloud.exceptions import NotFound  # lazy import
+
+        try:
+            return self.bucket.blob(ref).download_as_text(encoding="utf-8")
+        except NotFound:
+            return None
+
+    def delete(self, ref: str) -> None:
+        from google.cloud.exceptions import NotFound  # lazy import
+
+        try:
+            self.bucket.blob(ref).delete()
+        except NotFound:
+            pass
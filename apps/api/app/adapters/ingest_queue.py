@@ -0,0 +1,310 @@
+"""Bounded, tenant-fair ingest queue with a leased worker pool.
+
+Jobs are recorded in an ``IngestJobRepository`` before they are queued (their
+text goes to an ``IngestPayloadStore`` and the job keeps a reference), so the
+repository is the source of truth: workers lease a job before running it and
+renew the lease while it runs, and a periodic sweep re-queues jobs that were
+never picked up or whose worker died (e.g. after a restart).
+"""
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+from .ingest_job_repo import IngestJobRepository
+from .ingest_payloads import IngestPayloadStore, InMemoryIngestPayloadStore
+
+logger = logging.getLogger(__name__)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class IngestQueueFull(Exception):
+    """Raised when the ingest queue is at capacity; callers should retry later."""
+
+
+class TenantFairQueue:
+    """Bounded queue of job ids served round-robin across tenants.
+
+    One tenant's bulk upload cannot starve others: each ``get`` takes the next job
+    from the next tenant with pending work.
+    """
+
+    def __init__(self, maxsize: int = 1000):
+        self.maxsize = maxsize
+        self._queues: Dict[str, Deque[str]] = {}
+        self._ring: Deque[str] = deque()
+        self._items = asyncio.Semaphore(0)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put_nowait(self, tenant_id: str, job_id: str) -> None:
+        if self._size >= self.maxsize:
+            raise IngestQueueFull(f"Ingest queue is full ({self.maxsize} pending jobs)")
+        queue = self._queues.get(tenant_id)
+        if queue is None:
+            queue = self._queues[tenant_id] = deque()
+            self._ring.append(tenant_id)
+        queue.append(job_id)
+        self._size += 1
+        self._items.release()
+
+    async def get(self) -> str:
+        await self._items.acquire()
+        tenant_id = self._ring.popleft()
+        queue = self._queues[tenant_id]
+        job_id = queue.popleft()
+        if queue:
+            self._ring.append(tenant_id)
+        else:
+            del self._queues[tenant_id]
+        self._size -= 1
+        return job_id
+
+
+class IngestWorkerPool:
+    """Runs queued ingest jobs on a fixed number of asyncio workers.
+
+    Ingestion itself is blocking (embedding + store writes), so each job runs in a
+    worker thread; concurrency is bounded by ``workers`` rather than by request
+    volume.  Failed jobs are retried with exponential backoff up to
+    ``max_attempts``.  Domain events are published from the event loop.
+    """
+
+    def __init__(
+        self,
+        jobs: IngestJobRepository,
+        rag: Any,
+        event_bus: Optional[Any] = None,
+        workers: int = 4,
+        max_queue_size: int = 1000,
+        max_attempts: int = 3,
+        lease_seconds: int = 60,
+        retry_base_seconds: float = 2.0,
+        payloads: Optional[IngestPayloadStore] = None,
+    ):
+        self.jobs = jobs
+        self.payloads = payloads or InMemoryIngestPayloadStore()
+        self.rag = rag
+        self.event_bus = event_bus
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_ms = int(lease_seconds * 1000)
+        self.retry_base_seconds = retry_base_seconds
+        self.worker_id = f"ingest-{uuid.uuid4().hex[:8]}"
+        self.queue = TenantFairQueue(max_queue_size)
+        # Job ids queued or running here, so the sweep does not queue them twice
+        self._local: Set[str] = set()
+        self._tasks: list = []
+        self._metrics = {"submitted": 0, "completed": 0, "failed": 0, "retried": 0, "recovered": 0}
+
+    # Lifecycle ---------------------------------------------------------------
+
+    async def start(self) -> None:
+        """Start workers and the recovery sweep on the running event loop."""
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"{self.worker_id}-{i}")
+            for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._sweep(), name=f"{self.worker_id}-sweep"))
+        logger.info(f"Ingest worker pool started: {self.workers} workers ({self.worker_id})")
+
+    async def stop(self) -> None:
+        """Stop workers; jobs still running are re-run elsewhere once their lease lapses."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # Submission --------------------------------------------------------------
+
+    async def submit(
+        self, tenant_id: str, user_id: str, title: str, text: str, incremental: bool = False
+    ) -> str:
+        """Record and queue an ingest job; raises IngestQueueFull under backpressure."""
+        if len(self.queue) >= self.queue.maxsize:
+            raise IngestQueueFull(f"Ingest queue is full ({self.queue.maxsize} pending jobs)")
+        job_id = str(uuid.uuid4())
+        now_ms = _now_ms()
+        payload_ref = await asyncio.to_thread(self.payloads.put, job_id, text)
+        try:
+            await asyncio.to_thread(
+                self.jobs.create_job,
+                {
+                    "jobId": job_id,
+                    "tenantId": tenant_id,
+                    "userId": user_id,
+                    "title": title,
+                    "payloadRef": payload_ref,
+                    "textLength": len(text),
+                    "incremental": incremental,
+                    "status": "queued",
+                    "attempts": 0,
+                    "createdAt": now_ms,
+                    "updatedAt": now_ms,
+                },
+            )
+        except Exception:
+            await asyncio.to_thread(self.payloads.delete, payload_ref)
+            raise
+        # If the queue filled up meanwhile, the recovery sweep runs the job later
+        self._requeue(tenant_id, job_id)
+        self._metrics["submitted"] += 1
+        return job_id
+
+    def _enqueue(self, tenant_id: str, job_id: str) -> None:
+        self.queue.put_nowait(tenant_id, job_id)
+        self._local.add(job_id)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self._metrics, "queued": len(self.queue), "workers": self.workers}
+
+    # Workers -----------------------------------------------------------------
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingest job {job_id} crashed the worker loop: {e}")
+            finally:
+                self._local.discard(job_id)
+
+    async def _run(self, job_id: str) -> None:
+        if not await asyncio.to_thread(
+            self.jobs.claim_job, job_id, self.worker_id, self.lease_ms, _now_ms()
+        ):
+            return  # Finished, or leased by another worker
+        job = await asyncio.to_thread(self.jobs.get_job, job_id)
+        if not job:
+            return
+        attempts = job.get("attempts", 0) + 1
+        start = time.time()
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            text = await asyncio.to_thread(self._payload, job)
+            result = await asyncio.to_thread(
+                self.rag.ingest_text,
+                title=job["title"],
+                text=text,
+                tenant_id=job["tenantId"],
+                incremental=job.get("incremental", False),
+            )
+        except Exception as e:
+            await self._failed(job, attempts, e)
+            return
+        finally:
+            heartbeat.cancel()
+
+        await asyncio.to_thread(
+            self.jobs.update_job,
+            job_id,
+            {
+                "status": "completed",
+                "attempts": attempts,
+                "sourceId": result.get("source_id"),
+                "chunkCount": result.get("chunks_created", 0),
+                "durationMs": int((time.time() - start) * 1000),
+                "leaseOwner": None,
+                "updatedAt": _now_ms(),
+                **await self._release_payload(job),
+            },
+        )
+        self._metrics["completed"] += 1
+        if self.event_bus:
+            try:
+                await self.event_bus.publish_document_ingested(
+                    document_id=result.get("source_id", ""), tenant_id=job["tenantId"]
+                )
+            except Exception as e:
+                logger.warning(f"Failed to publish ingest event for job {job_id}: {e}")
+
+    async def _failed(self, job: Dict[str, Any], attempts: int, error: Exception) -> None:
+        job_id = job["jobId"]
+        if attempts >= self.max_attempts:
+            logger.error(f"Ingest job {job_id} failed after {attempts} attempts: {error}")
+            updates = {"status": "failed", "error": str(error), **await self._release_payload(job)}
+            self._metrics["failed"] += 1
+        else:
+            base = self.retry_base_seconds
+            delay = min(base * 2 ** (attempts - 1), 60) + random.uniform(0, base)
+            logger.warning(f"Ingest job {job_id} failed ({error}), retrying in {delay:.1f}s")
+            updates = {"status": "retrying", "error": str(error)}
+            updates["notBefore"] = _now_ms() + int(delay * 1000)
+            self._metrics["retried"] += 1
+            asyncio.get_running_loop().call_later(delay, self._requeue, job["tenantId"], job_id)
+        updates.update({"attempts": attempts, "leaseOwner": None, "updatedAt": _now_ms()})
+        await asyncio.to_thread(self.jobs.update_job, job_id, updates)
+
+    def _payload(self, job: Dict[str, Any]) -> str:
+        if job.get("text") is not None:
+            return job["text"]  # Queued before payloads were stored separately
+        text = self.payloads.get(job.get("payloadRef") or "")
+        if text is None:
+            raise RuntimeError(f"Payload of ingest job {job['jobId']} is missing")
+        return text
+
+    async def _release_payload(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Delete a finished job's payload; returns the job fields to clear."""
+        if job.get("payloadRef"):
+            try:
+                await asyncio.to_thread(self.payloads.delete, job["payloadRef"])
+            except Exception as e:
+                logger.warning(f"Failed to delete payload of ingest job {job['jobId']}: {e}")
+        return {"payloadRef": None, "text": None}
+
+    def _requeue(self, tenant_id: str, job_id: str) -> None:
+        try:
+            self._enqueue(tenant_id, job_id)
+        except IngestQueueFull:
+            pass  # The sweep picks it up once there is room
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Renew the job lease while it runs so it is not re-run elsewhere."""
+        while True:
+            await asyncio.sleep(self.lease_ms / 3000)
+            try:
+                await asyncio.to_thread(
+                    self.jobs.claim_job, job_id, self.worker_id, self.lease_ms, _now_ms()
+                )
+            except Exception as e:
+                logger.warning(f"Failed to renew lease for ingest job {job_id}: {e}")
+
+    async def _sweep(self) -> None:
+        """Periodically queue jobs that were orphaned (crash, restart, full queue)."""
+        while True:
+            try:
+                await self.recover()
+            except Exception as e:
+                logger.warning(f"Ingest recovery sweep failed: {e}")
+            await asyncio.sleep(self.lease_ms / 1000)
+
+    async def recover(self) -> int:
+        """Queue stale jobs from the repository; returns how many were queued."""
+        stale = await asyncio.to_thread(self.jobs.list_stale_jobs, _now_ms(), self.lease_ms)
+        recovered = 0
+        for job in stale:
+            if job["jobId"] in self._local:
+                continue
+            try:
+                self._enqueue(job.get("tenantId", ""), job["jobId"])
+            except IngestQueueFull:
+                break
+            recovered += 1
+        if recovered:
+            self._metrics["recovered"] += recovered
+            logger.info(f"Re-queued {recovered} orphaned ingest jobs")
+        return recovered
@@ -0,0 +1,156 @@
+"""Append-only JSON Lines storage for the local (mock) adapters.
+
+Each table is a dict of JSON records kept in memory and persisted as a log: a
+write appends one line holding all of its puts and deletes, so a write is never
+half-applied (a torn last line from a crash is skipped on load).  When most of
+the log is superseded records it is compacted to one record per key, written to
+a temporary file and swapped in with ``os.replace``.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class JsonlTable:
+    """Keyed JSON records with an in-memory view and an append-only log on disk.
+
+    ``legacy_path`` names a whole-file JSON dict written by earlier versions; it
+    is imported the first time the log is created.  Compaction runs once the log
+    holds ``compact_ratio`` times more records than are live (and at least
+    ``min_compact_records``).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        legacy_path: Optional[str] = None,
+        compact_ratio: float = 2.0,
+        min_compact_records: int = 1000,
+        fsync: bool = False,
+    ):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.min_compact_records = min_compact_records
+        self.fsync = fsync
+        self.data: Dict[str, Any] = {}  # read-only for callers; write through put/delete
+        self._logged = 0  # records in the log, live or superseded
+        self._lock = threading.RLock()
+        self._file = None
+
+        if os.path.exists(path):
+            self._replay()
+        elif legacy_path and os.path.exists(legacy_path):
+            self._import_legacy(legacy_path)
+        if self._file is None:
+            self._file = open(path, "a", encoding="utf-8")
+        self._maybe_compact()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def values(self) -> Iterable[Any]:
+        return self.data.values()
+
+    def items(self) -> Iterable[Tuple[str, Any]]:
+        return self.data.items()
+
+    def put(self, key: str, value: Any) -> None:
+        self.write(puts={key: value})
+
+    def delete(self, key: str) -> None:
+        self.write(deletes=[key])
+
+    def write(
+        self, puts: Optional[Dict[str, Any]] = None, deletes: Optional[Iterable[str]] = None
+    ) -> None:
+        """Apply puts and deletes as one log entry."""
+        puts = puts or {}
+        deletes = [key for key in deletes or () if key not in puts]
+        if not puts and not deletes:
+            return
+        entry: Dict[str, Any] = {}
+        if puts:
+            entry["put"] = puts
+        if deletes:
+            entry["del"] = deletes
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._apply(entry)
+            self._maybe_compact()
+
+    def compact(self) -> None:
+        """Rewrite the log with one record per live key."""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for key, value in self.data.items():
+                    f.write(json.dumps({"put": {key: value}}, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self._file is not None:
+                self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._logged = len(self.data)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _apply(self, entry: Dict[str, Any]) -> None:
+        puts = entry.get("put", {})
+        deletes = entry.get("del", [])
+        self.data.update(puts)
+        for key in deletes:
+            self.data.pop(key, None)
+        self._logged += len(puts) + len(deletes)
+
+    def _maybe_compact(self) -> None:
+        if self._logged >= max(self.min_compact_records, self.compact_ratio * len(self.data)):
+            self.compact()
+
+    def _replay(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                self._apply(json.loads(line))
+            except json.JSONDecodeError:
+                # Only the last line can be torn (a crash mid-append); drop it
+                if number != len(lines):
+                    raise
+                logger.warning(f"Ignoring incomplete last record in {self.path}")
+                self._truncate_torn_tail(sum(len(ln.encode("utf-8")) for ln in lines[:-1]))
+
+    def _truncate_torn_tail(self, size: int) -> None:
+        with open(self.path, "r+b") as f:
+            f.truncate(size)
+
+    def _import_legacy(self, legacy_path: str) -> None:
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            legacy = {}
+        self.data = dict(legacy) if isinstance(legacy, dict) else {}
+        self.compact()
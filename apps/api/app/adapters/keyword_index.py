@@ -0,0 +1,86 @@
+"""In-process BM25 keyword index for local/offline deployments.
+
+Stands in for the Neo4j full-text index when the mock store runs hybrid search.
+Postings live in memory and are rebuilt from stored chunks on first use.
+"""
+
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens (roughly what Lucene's standard analyzer emits)."""
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index that supports incremental add/remove."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_terms
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index documents; re-adding an id replaces its previous text."""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id in self._doc_terms:
+                    self._remove(doc_id)
+                terms = Counter(tokenize(text))
+                self._doc_terms[doc_id] = terms
+                self._lengths[doc_id] = sum(terms.values())
+                self._total_length += self._lengths[doc_id]
+                for term, tf in terms.items():
+                    self._postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self._doc_terms:
+                    self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        terms = self._doc_terms.pop(doc_id)
+        self._total_length -= self._lengths.pop(doc_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k (id, score) pairs for the query's terms, best first."""
+        with self._lock:
+            n = len(self._doc_terms)
+            if n == 0 or k <= 0:
+                return []
+            avg_length = self._total_length / n
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    score = idf * tf * (self.k1 + 1) / (tf + norm)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + score
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
@@ -1,111 +1,262 @@
 """Mock store for RAG operations in tests."""
 
-import json
+import asyncio
 import os
+import threading
 import uuid
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+import numpy as np
+
+from ..domain.chunking import chunk_id
+from ..domain.retrieval import RRF_K, reciprocal_rank_fusion
+from .jsonl_store import JsonlTable
+from .keyword_index import BM25Index
+from .vector_index import FlatIndex, TenantVectorIndexes
+
 
 class MockStore:
     """Mock store for RAG operations in tests."""
 
-    def __init__(self, data_dir: str = "./local_data"):
+    def __init__(
+        self,
+        data_dir: str = "./local_data",
+        index_type: str = "flat",
+        ivf_nlist: int = 256,
+        ivf_nprobe: int = 8,
+        rrf_k: int = RRF_K,
+        keyword_weight: float = 1.0,
+        hybrid_fetch_factor: int = 4,
+    ):
         self.data_dir = data_dir
-        self.chunks_file = os.path.join(data_dir, "chunks.json")
-        self.sources_file = os.path.join(data_dir, "sources.json")
 
         # Ensure data directory exists
         os.makedirs(data_dir, exist_ok=True)
-
-        # Initialize empty data if files don't exist
-        self._init_empty_data()
-
-    def _init_empty_data(self):
-        """Initialize with empty data."""
-        if not os.path.exists(self.chunks_file):
-            with open(self.chunks_file, "w") as f:
-                json.dump({}, f)
-
-        if not os.path.exists(self.sources_file):
-            with open(self.sources_file, "w") as f:
-                json.dump({}, f)
-
-    def _load_data(self, file_path: str) -> Dict[str, Any]:
-        """Load data from file."""
-        try:
-            with open(file_path, "r") as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-
-    def _save_data(self, file_path: str, data: Dict[str, Any]):
-        """Save data to file."""
-        with open(file_path, "w") as f:
-            json.dump(data, f, indent=2)
+        self._write_lock = threading.RLock()  # serialises read-modify-write cycles
+
+        # Append-only logs; writes append only the changed records (legacy .json is imported)
+        self._chunk_table = JsonlTable(
+            os.path.join(data_dir, "chunks.jsonl"),
+            legacy_path=os.path.join(data_dir, "chunks.json"),
+        )
+        self._sources = JsonlTable(
+            os.path.join(data_dir, "sources.jsonl"),
+            legacy_path=os.path.join(data_dir, "sources.json"),
+        )
+        # Chunks are kept in memory so searches never touch the disk
+        self._chunks = self._chunk_table.data
+        self.indexes = TenantVectorIndexes(
+            os.path.join(data_dir, "vector_index"),
+            index_type=index_type,
+            nlist=ivf_nlist,
+            nprobe=ivf_nprobe,
+        )
+        # BM25 indexes for hybrid search, built per tenant on first use
+        self._keyword_indexes: Dict[str, BM25Index] = {}
+        self.rrf_k = rrf_k
+        self.keyword_weight = keyword_weight
+        self.hybrid_fetch_factor = hybrid_fetch_factor
 
     def upsert_chunks(
-        self, tenant_id: str, title: str, chunks: List[str], embeddings: List[List[float]]
+        self,
+        tenant_id: str,
+        title: str,
+        chunks: List[str],
+        embeddings: List[List[float]],
+        source_id: Optional[str] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None,
     ) -> str:
         """Mock upsert chunks operation."""
-        chunks_data = self._load_data(self.chunks_file)
-        sources_data = self._load_data(self.sources_file)
-
-        # Generate source ID
-        source_id = str(uuid.uuid4())
-
-        # Store chunks
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            chunk_id = f"{source_id}_{i}"
-            chunks_data[chunk_id] = {
-                "id": chunk_id,
+        with self._write_lock:
+            # Generate source ID, or extend an existing source of the same tenant
+            source_id = source_id or str(uuid.uuid4())
+            source = self._sources.get(source_id)
+            if source and source.get("tenant_id") != tenant_id:
+                raise ValueError(f"Source {source_id} belongs to another tenant")
+
+            index = self._tenant_index(tenant_id)
+            written: Dict[str, Any] = {}
+            source = source or {
+                "id": source_id,
                 "tenant_id": tenant_id,
-                "source_id": source_id,
-                "content": chunk,
-                "metadata": {"title": title},
-                "embedding": embedding,
+                "title": title,
+                "chunk_count": 0,
                 "created_at": datetime.now().isoformat(),
             }
-
-        # Store source info
-        sources_data[source_id] = {
-            "id": source_id,
-            "tenant_id": tenant_id,
-            "title": title,
-            "chunk_count": len(chunks),
-            "created_at": datetime.now().isoformat(),
-        }
-
-        self._save_data(self.chunks_file, chunks_data)
-        self._save_data(self.sources_file, sources_data)
-
-        return source_id
+            manifest = self._manifest(source)
+            listed = set(manifest)
+
+            # Store chunks under content-addressed ids, so identical text is stored once
+            indexed = set()
+            new_ids, new_vectors = [], []
+            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+                cid = chunk_id(tenant_id, chunk)
+                if cid not in listed:
+                    manifest.append(cid)
+                    listed.add(cid)
+                previous = self._chunks.get(cid)
+                # Index new chunks, and stored ones whose embedding changed (e.g. new model)
+                reindex = previous is None or previous.get("embedding") != embedding
+                written[cid] = {
+                    "id": cid,
+                    "tenant_id": tenant_id,
+                    "source_id": source_id,
+                    "content": chunk,
+                    "metadata": {**(metadata[i] if metadata else {}), "title": title},
+                    "embedding": embedding,
+                    "created_at": datetime.now().isoformat(),
+                }
+                if (reindex or cid not in index) and cid not in indexed:
+                    indexed.add(cid)
+                    new_ids.append(cid)
+                    new_vectors.append(embedding)
+
+            # Store source info
+            source["title"] = title
+            source["chunk_count"] = len(manifest)
+
+            # Chunks first, so a crash in between never leaves a source listing missing chunks
+            self._chunk_table.write(puts=written)
+            self._sources.put(source_id, source)
+
+            # Incrementally extend the tenant's vector and keyword indexes
+            index.add(new_ids, new_vectors)
+            keyword_index = self._keyword_indexes.get(tenant_id)
+            if keyword_index is not None:
+                fresh = [cid for cid in listed if cid not in keyword_index]
+                keyword_index.add(fresh, [self._chunks[cid]["content"] for cid in fresh])
+
+            return source_id
+
+    def get_source_manifest(self, tenant_id: str, source_id: str) -> Optional[List[str]]:
+        """Chunk ids of a source, or None if the tenant has no such source."""
+        source = self._sources.get(source_id)
+        if not source or source.get("tenant_id") != tenant_id:
+            return None
+        return list(self._manifest(source))
+
+    def remove_chunks(self, tenant_id: str, source_id: str, chunk_ids: List[str]) -> int:
+        """Drop chunks from a source; chunks no other source lists are deleted."""
+        with self._write_lock:
+            source = self._sources.get(source_id)
+            if not source or source.get("tenant_id") != tenant_id or not chunk_ids:
+                return 0
+            removed = set(chunk_ids)
+            source["chunk_ids"] = [cid for cid in self._manifest(source) if cid not in removed]
+            source["chunk_count"] = len(source["chunk_ids"])
+
+            still_listed = set()
+            for other in self._sources.values():
+                if other.get("tenant_id") == tenant_id:
+                    still_listed.update(self._manifest(other))
+            deleted = removed - still_listed
+            self._tenant_index(tenant_id).remove(list(deleted))
+            if tenant_id in self._keyword_indexes:
+                self._keyword_indexes[tenant_id].remove(list(deleted))
+
+            self._sources.put(source_id, source)
+            self._chunk_table.write(deletes=deleted)
+            return len(removed)
+
+    def _manifest(self, source: Dict[str, Any]) -> List[str]:
+        """A source's chunk id list, derived from chunks for sources written before it."""
+        if "chunk_ids" not in source:
+            source["chunk_ids"] = [
+                cid for cid, chunk in self._chunks.items() if chunk.get("source_id") == source["id"]
+            ]
+        return source["chunk_ids"]
+
+    def _tenant_index(self, tenant_id: str) -> FlatIndex:
+        """Get the tenant's vector index, rebuilding it from the stored chunks if missing."""
+        # Under the write lock, so a rebuild neither races a writer nor another rebuild
+        with self._write_lock:
+            rebuild = not self.indexes.exists(tenant_id)
+            index = self.indexes.get(tenant_id)
+            if rebuild and len(index) == 0:
+                existing = [
+                    chunk
+                    for chunk in self._chunks.values()
+                    if chunk["tenant_id"] == tenant_id and chunk.get("embedding")
+                ]
+                if existing:
+                    index.add(
+                        [chunk["id"] for chunk in existing],
+                        [chunk["embedding"] for chunk in existing],
+                    )
+            return index
 
     def search(self, tenant_id: str, query_vector: List[float], k: int = 5) -> List[Dict[str, Any]]:
-        """Mock similarity search."""
-        chunks_data = self._load_data(self.chunks_file)
-
-        # Filter by tenant
-        tenant_chunks = [chunk for chunk in chunks_data.values() if chunk["tenant_id"] == tenant_id]
-
-        # Simple mock: return first k chunks (no real similarity calculation)
+        """Cosine similarity search over the tenant's local vector index."""
         results = []
-        for chunk in tenant_chunks[:k]:
-            results.append(
-                {
-                    "id": chunk["id"],
-                    "text": chunk["content"],
-                    "source": chunk["metadata"].get("title", "Unknown"),
-                    "score": 0.95,  # Mock similarity score
-                }
-            )
+        for cid, score in self._tenant_index(tenant_id).search(query_vector, k):
+            chunk = self._chunks.get(cid)
+            if not chunk:
+                continue
+            results.append(self._hit(chunk, score))
 
         return results
 
+    def _hit(self, chunk: Dict[str, Any], score: float) -> Dict[str, Any]:
+        return {
+            "id": chunk["id"],
+            "text": chunk["content"],
+            "source": chunk["metadata"].get("title", "Unknown"),
+            "score": score,
+            "page_start": chunk["metadata"].get("page_start"),
+            "page_end": chunk["metadata"].get("page_end"),
+        }
+
+    def _keyword_index(self, tenant_id: str) -> BM25Index:
+        """Get the tenant's BM25 index, building it from the stored chunks if needed."""
+        with self._write_lock:
+            index = self._keyword_indexes.get(tenant_id)
+            if index is None:
+                index = self._keyword_indexes[tenant_id] = BM25Index()
+                chunks = [c for c in self._chunks.values() if c["tenant_id"] == tenant_id]
+                index.add([c["id"] for c in chunks], [c["content"] for c in chunks])
+            return index
+
+    def search_hybrid(
+        self, tenant_id: str, query_text: str, query_vector: List[float], k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """BM25 keyword search plus vector search, fused by reciprocal rank.
+
+        Keyword-only hits are given their cosine similarity as ``score`` so scores
+        stay comparable with vector hits; the BM25 score is kept as ``text_score``.
+        """
+        candidates = k * self.hybrid_fetch_factor
+        vector_hits = self.search(tenant_id, query_vector, candidates)
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= float(np.linalg.norm(query)) or 1.0
+        keyword_hits = []
+        for cid, text_score in self._keyword_index(tenant_id).search(query_text, candidates):
+            chunk = self._chunks.get(cid)
+            if not chunk:
+                continue
+            embedding = np.asarray(chunk.get("embedding") or [], dtype=np.float32)
+            score = 0.0
+            if embedding.shape == query.shape:
+                score = float(embedding @ query) / (float(np.linalg.norm(embedding)) or 1.0)
+            keyword_hits.append({**self._hit(chunk, score), "text_score": text_score})
+        return reciprocal_rank_fusion(
+            [vector_hits, keyword_hits], k, self.rrf_k, weights=[1.0, self.keyword_weight]
+        )
+
+    async def asearch_hybrid(
+        self, tenant_id: str, query_text: str, query_vector: List[float], k: int = 5
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.search_hybrid, tenant_id, query_text, query_vector, k)
+
+    async def asearch(
+        self, tenant_id: str, query_vector: List[float], k: int = 5
+    ) -> List[Dict[str, Any]]:
+        # Index scans (and first-use rebuilds) are CPU-bound; keep them off the event loop
+        return await asyncio.to_thread(self.search, tenant_id, query_vector, k)
+
     def get_source(self, source_id: str) -> Optional[Dict[str, Any]]:
         """Get source by ID."""
-        sources_data = self._load_data(self.sources_file)
-        return sources_data.get(source_id)
+        return self._sources.get(source_id)
 
     def ensure_vector_index(self, label: str, property_name: str, dimensions: int, similarity: str):
         """Mock vector index creation."""
@@ -114,11 +265,9 @@ class MockStore:
 
     def get_recent_sources(self, tenant_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         """Mock get recent sources operation."""
-        sources_data = self._load_data(self.sources_file)
-
         # Filter by tenant
         tenant_sources = [
-            source for source in sources_data.values() if source["tenant_id"] == tenant_id
+            source for source in self._sources.values() if source["tenant_id"] == tenant_id
         ]
 
         # Sort by created_at and limit
@@ -142,117 +291,147 @@ class MockStore:
 
 
 class MockConversationStore:
-    """Mock conversation store for testing."""
+    """Mock conversation store for testing.
+
+    Conversations and messages live in append-only JSON Lines logs (see
+    ``JsonlTable``), indexed in memory by conversation and by (tenant, user), so a
+    new message costs one appended line and reads never scan other threads.
+    """
 
     def __init__(self, data_dir: str = "./local_data"):
         self.data_dir = data_dir
-        self.conversations_file = os.path.join(data_dir, "conversations.json")
-        self.messages_file = os.path.join(data_dir, "messages.json")
 
         # Ensure data directory exists
         os.makedirs(data_dir, exist_ok=True)
-
-        # Initialize empty data if files don't exist
-        self._init_empty_data()
-
-    def _init_empty_data(self):
-        """Initialize with empty data."""
-        if not os.path.exists(self.conversations_file):
-            self._save_data(self.conversations_file, {})
-        if not os.path.exists(self.messages_file):
-            self._save_data(self.messages_file, {})
-
-    def _load_data(self, file_path: str) -> Dict[str, Any]:
-        """Load data from JSON file."""
-        try:
-            with open(file_path, "r") as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-
-    def _save_data(self, file_path: str, data: Dict[str, Any]):
-        """Save data to JSON file."""
-        with open(file_path, "w") as f:
-            json.dump(data, f, indent=2)
+        self._write_lock = threading.RLock()
+
+        # Logs replace the earlier whole-file JSON documents, which are imported once
+        self._conversations = JsonlTable(
+            os.path.join(data_dir, "conversations.jsonl"),
+            legacy_path=os.path.join(data_dir, "conversations.json"),
+        )
+        self._messages = JsonlTable(
+            os.path.join(data_dir, "messages.jsonl"),
+            legacy_path=os.path.join(data_dir, "messages.json"),
+        )
+
+        # In-memory indexes: messages per conversation (in order) and threads per user
+        self._by_conversation: Dict[str, List[Dict[str, Any]]] = {}
+        for msg in self._messages.values():
+            self._by_conversation.setdefault(msg["conversation_id"], []).append(msg)
+        for messages in self._by_conversation.values():
+            messages.sort(key=self._message_order)
+        self._by_user: Dict[tuple, set] = {}
+        for conv in self._conversations.values():
+            # Conversations written before message counts were kept
+            conv.setdefault("message_count", len(self._by_conversation.get(conv["id"], [])))
+            self._by_user.setdefault((conv["tenant_id"], conv["user_id"]), set()).add(conv["id"])
 
     def create_conversation(self, tenant_id: str, user_id: str, title: str) -> str:
         """Mock create conversation operation."""
-        conversations_data = self._load_data(self.conversations_file)
-
         # Generate conversation ID
         conversation_id = str(uuid.uuid4())
 
-        # Store conversation
-        conversations_data[conversation_id] = {
-            "id": conversation_id,
-            "tenant_id": tenant_id,
-            "user_id": user_id,
-            "title": title,
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat(),
-        }
-
-        self._save_data(self.conversations_file, conversations_data)
+        with self._write_lock:
+            self._put_conversation(
+                {
+                    "id": conversation_id,
+                    "tenant_id": tenant_id,
+                    "user_id": user_id,
+                    "title": title,
+                    "created_at": datetime.now().isoformat(),
+                    "updated_at": datetime.now().isoformat(),
+                    "message_count": 0,
+                }
+            )
 
         return conversation_id
 
     def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
         """Get conversation by ID."""
-        conversations_data = self._load_data(self.conversations_file)
-        return conversations_data.get(conversation_id)
+        return self._conversations.get(conversation_id)
 
     def add_message(self, conversation_id: str, message) -> None:
         """Mock add message operation."""
-        messages_data = self._load_data(self.messages_file)
-        conversations_data = self._load_data(self.conversations_file)
-
-        # Store message
-        messages_data[message.id] = {
+        with self._write_lock:
+            conversation = self._conversations.get(conversation_id)
+            record = self._message_record(conversation, conversation_id, message)
+            self._messages.put(record["id"], record)
+            self._index_message(record)
+
+            # Update conversation timestamp
+            if conversation is not None:
+                conversation["updated_at"] = datetime.now().isoformat()
+                self._put_conversation(conversation)
+
+    def record_turn(
+        self, conversation_id: str, tenant_id: str, user_id: str, title: str, messages: List
+    ) -> None:
+        """Append a turn's messages, creating the conversation if new (two log appends)."""
+        with self._write_lock:
+            now = datetime.now().isoformat()
+            conversation = self._conversations.get(conversation_id) or {
+                "id": conversation_id,
+                "tenant_id": tenant_id,
+                "user_id": user_id,
+                "title": title,
+                "created_at": now,
+                "message_count": 0,
+            }
+            conversation["updated_at"] = now
+            records = [self._message_record(conversation, conversation_id, m) for m in messages]
+            self._messages.write(puts={r["id"]: r for r in records})
+            for record in records:
+                self._index_message(record)
+            self._put_conversation(conversation)
+
+    def _put_conversation(self, conversation: Dict[str, Any]) -> None:
+        self._conversations.put(conversation["id"], conversation)
+        key = (conversation["tenant_id"], conversation["user_id"])
+        self._by_user.setdefault(key, set()).add(conversation["id"])
+
+    @staticmethod
+    def _message_record(
+        conversation: Optional[Dict[str, Any]], conversation_id: str, message
+    ) -> Dict[str, Any]:
+        # Per-conversation sequence number, so history order never depends on clock ties
+        conversation = conversation if conversation is not None else {}
+        seq = conversation.get("message_count", 0) + 1
+        conversation["message_count"] = seq
+        return {
             "id": message.id,
             "conversation_id": conversation_id,
+            "seq": seq,
             "role": message.role,
             "content": message.content,
             "timestamp": message.timestamp.isoformat(),
             "metadata": message.metadata or {},
         }
 
-        # Update conversation timestamp
-        if conversation_id in conversations_data:
-            conversations_data[conversation_id]["updated_at"] = datetime.now().isoformat()
-
-        self._save_data(self.messages_file, messages_data)
-        self._save_data(self.conversations_file, conversations_data)
+    def _index_message(self, record: Dict[str, Any]) -> None:
+        # Sequence numbers only grow, so appending keeps each list in order
+        self._by_conversation.setdefault(record["conversation_id"], []).append(record)
 
     def get_messages(self, conversation_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get messages for a conversation."""
-        messages_data = self._load_data(self.messages_file)
-
-        conversation_messages = [
-            msg for msg in messages_data.values() if msg["conversation_id"] == conversation_id
-        ]
+        return list(self._by_conversation.get(conversation_id, [])[-limit:])
 
-        # Sort by created_at and limit
-        conversation_messages.sort(key=lambda x: x["created_at"])
-        return conversation_messages[-limit:]
+    @staticmethod
+    def _message_order(msg: Dict[str, Any]) -> tuple:
+        # Messages stored before sequence numbers existed sort first, by time
+        return (msg.get("seq", 0), msg["timestamp"])
 
     def get_conversation_history(self, conversation_id: str, limit: int = 50) -> List:
-        """Mock get conversation history operation."""
+        """Get the newest ``limit`` messages, oldest first."""
         from ..domain.models import ConversationMessage
 
-        messages_data = self._load_data(self.messages_file)
-
-        # Filter messages by conversation_id
-        conversation_messages = [
-            msg for msg in messages_data.values() if msg["conversation_id"] == conversation_id
-        ]
-
-        # Sort by timestamp and limit
-        conversation_messages.sort(key=lambda x: x["timestamp"])
-        limited_messages = conversation_messages[:limit]
+        if limit <= 0:
+            return []
+        messages = self._by_conversation.get(conversation_id, [])[-limit:]
 
         # Convert to ConversationMessage objects
         result = []
-        for msg in limited_messages:
+        for msg in messages:
             result.append(
                 ConversationMessage(
                     id=msg["id"],
@@ -261,23 +440,44 @@ class MockConversationStore:
                     content=msg["content"],
                     timestamp=datetime.fromisoformat(msg["timestamp"]),
                     metadata=msg["metadata"],
+                    seq=msg.get("seq"),
                 )
             )
 
         return result
 
+    def get_summary(self, conversation_id: str):
+        """Get the conversation's rolling summary, if one has been written."""
+        from ..domain.models import ConversationSummary
+
+        conversation = self._conversations.get(conversation_id) or {}
+        if conversation.get("summary") is None:
+            return None
+        return ConversationSummary(
+            text=conversation["summary"],
+            through_seq=conversation["summary_through_seq"],
+            updated_at=datetime.fromisoformat(conversation["summary_updated_at"]),
+        )
+
+    def save_summary(self, conversation_id: str, summary) -> None:
+        """Store a rolling summary unless a newer one is already stored."""
+        with self._write_lock:
+            conversation = self._conversations.get(conversation_id)
+            stored_through = (conversation or {}).get("summary_through_seq", 0)
+            if not conversation or stored_through >= summary.through_seq:
+                return
+            conversation["summary"] = summary.text
+            conversation["summary_through_seq"] = summary.through_seq
+            conversation["summary_updated_at"] = (summary.updated_at or datetime.now()).isoformat()
+            self._put_conversation(conversation)
+
     def list_conversations(self, tenant_id: str, user_id: str, limit: int = 20) -> List:
         """Mock list conversations operation."""
         from ..domain.models import Conversation
 
-        conversations_data = self._load_data(self.conversations_file)
-        messages_data = self._load_data(self.messages_file)
-
-        # Filter by tenant and user
+        # Conversations of this tenant and user, from the index
         user_conversations = [
-            conv
-            for conv in conversations_data.values()
-            if conv["tenant_id"] == tenant_id and conv["user_id"] == user_id
+            self._conversations.get(cid) for cid in self._by_user.get((tenant_id, user_id), ())
         ]
 
         # Sort by updated_at and limit
@@ -287,11 +487,6 @@ class MockConversationStore:
         # Convert to Conversation objects
         result = []
         for conv in limited_conversations:
-            # Count messages for this conversation
-            message_count = sum(
-                1 for msg in messages_data.values() if msg["conversation_id"] == conv["id"]
-            )
-
             result.append(
                 Conversation(
                     id=conv["id"],
@@ -301,7 +496,7 @@ class MockConversationStore:
                     created_at=datetime.fromisoformat(conv["created_at"]),
                     updated_at=datetime.fromisoformat(conv["updated_at"]),
                     messages=[],  # Don't load messages for list view
-                    metadata={"message_count": message_count},
+                    metadata={"message_count": conv["message_count"]},
                 )
             )
 
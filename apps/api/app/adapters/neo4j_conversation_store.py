@@ -3,17 +3,74 @@ import uuid
 from datetime import datetime
 from typing import List, Optional
 
-from neo4j import GraphDatabase
+from neo4j import Driver, GraphDatabase
 
-from ..domain.models import Conversation, ConversationMessage
+from ..domain.models import Conversation, ConversationMessage, ConversationSummary
 from ..ports.conversation_store import IConversationStore
 
+# Messages carry their conversation id and a per-conversation sequence number
+# (1, 2, ...); the conversation's messageCount is the latest one.  The composite
+# index turns "newest N messages" into a range seek instead of a scan of the thread.
+MESSAGE_SEQ_INDEX = (
+    "CREATE INDEX message_conversation_seq IF NOT EXISTS "
+    "FOR (m:Message) ON (m.conversationId, m.seq)"
+)
+# A uniqueness constraint (backed by its own index) so concurrent first turns
+# cannot MERGE two conversations with the same id.  The plain index it replaces
+# covers the same property and must be dropped before the constraint is created.
+CONVERSATION_ID_CONSTRAINT = (
+    "CREATE CONSTRAINT conversation_id_unique IF NOT EXISTS "
+    "FOR (c:Conversation) REQUIRE c.id IS UNIQUE"
+)
+DROP_CONVERSATION_ID_INDEX = "DROP INDEX conversation_id IF EXISTS"
+
+# Numbers the messages of conversations created before sequence numbers existed
+BACKFILL_SEQ_QUERY = """
+MATCH (c:Conversation) WHERE c.messageCount IS NULL
+CALL {
+    WITH c
+    OPTIONAL MATCH (c)-[:HAS_MESSAGE]->(m:Message)
+    WITH c, m ORDER BY m.timestamp ASC
+    WITH c, collect(m) AS messages
+    SET c.messageCount = size(messages)
+    WITH c, messages
+    UNWIND range(0, size(messages) - 1) AS i
+    WITH c, messages[i] AS m, i
+    SET m.seq = i + 1, m.conversationId = c.id
+} IN TRANSACTIONS OF 100 ROWS
+"""
+
+# One turn (user question + assistant answer) in a single statement; the
+# conversation is created with its first turn.  As in add_message, messageCount
+# is incremented in place (taking the write lock) before the sequence numbers
+# are derived from it, so concurrent turns cannot read the same base.
+RECORD_TURN_QUERY = """
+MERGE (c:Conversation {id: $convId})
+ON CREATE SET c.tenantId = $tenantId, c.userId = $userId, c.title = $title,
+              c.createdAt = $now, c.messageCount = 0
+SET c.messageCount = coalesce(c.messageCount, 0) + size($messages), c.updatedAt = $now
+WITH c, c.messageCount - size($messages) AS base
+UNWIND range(0, size($messages) - 1) AS i
+WITH c, base + i + 1 AS seq, $messages[i] AS msg
+CREATE (m:Message {
+    id: msg.id,
+    conversationId: c.id,
+    seq: seq,
+    role: msg.role,
+    content: msg.content,
+    timestamp: msg.timestamp,
+    metadata: msg.metadata
+})
+CREATE (c)-[:HAS_MESSAGE]->(m)
+"""
+
 
 class Neo4jConversationStore(IConversationStore):
     """Neo4j implementation of conversation storage."""
 
-    def __init__(self, cfg):
-        self.driver = GraphDatabase.driver(cfg.uri, auth=(cfg.user, cfg.password))
+    def __init__(self, cfg, driver: Optional[Driver] = None):
+        # Share the vector store's driver (and its connection pool) when given one
+        self.driver = driver or GraphDatabase.driver(cfg.uri, auth=(cfg.user, cfg.password))
         self.db = cfg.database
 
     def create_conversation(self, tenant_id: str, user_id: str, title: str) -> str:
@@ -30,7 +87,8 @@ class Neo4jConversationStore(IConversationStore):
                     userId: $userId,
                     title: $title,
                     createdAt: $now,
-                    updatedAt: $now
+                    updatedAt: $now,
+                    messageCount: 0
                 })
             """,
                 id=conversation_id,
@@ -66,7 +124,7 @@ class Neo4jConversationStore(IConversationStore):
                 """
                 MATCH (c:Conversation {id: $convId})-[:HAS_MESSAGE]->(m:Message)
                 RETURN m
-                ORDER BY m.timestamp ASC
+                ORDER BY m.seq ASC, m.timestamp ASC
             """,
                 convId=conversation_id,
             )
@@ -135,18 +193,23 @@ class Neo4jConversationStore(IConversationStore):
     def add_message(self, conversation_id: str, message: ConversationMessage) -> None:
         """Add a message to an existing conversation."""
         with self.driver.session(database=self.db) as session:
+            # Incrementing messageCount write-locks the conversation, so concurrent
+            # messages get distinct, gap-free sequence numbers
             session.run(
                 """
                 MATCH (c:Conversation {id: $convId})
+                SET c.messageCount = coalesce(c.messageCount, 0) + 1,
+                    c.updatedAt = $timestamp
                 CREATE (m:Message {
                     id: $msgId,
+                    conversationId: $convId,
+                    seq: c.messageCount,
                     role: $role,
                     content: $content,
                     timestamp: $timestamp,
                     metadata: $metadata
                 })
                 CREATE (c)-[:HAS_MESSAGE]->(m)
-                SET c.updatedAt = $timestamp
             """,
                 convId=conversation_id,
                 msgId=message.id,
@@ -156,17 +219,53 @@ class Neo4jConversationStore(IConversationStore):
                 metadata=json.dumps(message.metadata),
             )
 
+    def record_turn(
+        self,
+        conversation_id: str,
+        tenant_id: str,
+        user_id: str,
+        title: str,
+        messages: List[ConversationMessage],
+    ) -> None:
+        """Append a turn's messages in one transaction, creating the conversation if new."""
+        params = [
+            {
+                "id": m.id,
+                "role": m.role,
+                "content": m.content,
+                "timestamp": m.timestamp.isoformat() + "Z",
+                "metadata": json.dumps(m.metadata),
+            }
+            for m in messages
+        ]
+
+        def _tx(tx):
+            tx.run(
+                RECORD_TURN_QUERY,
+                convId=conversation_id,
+                tenantId=tenant_id,
+                userId=user_id,
+                title=title,
+                now=params[-1]["timestamp"] if params else datetime.utcnow().isoformat() + "Z",
+                messages=params,
+            ).consume()
+
+        with self.driver.session(database=self.db) as session:
+            session.execute_write(_tx)
+
     def get_conversation_history(
         self, conversation_id: str, limit: int = 50
     ) -> List[ConversationMessage]:
-        """Get conversation messages ordered by timestamp."""
+        """Get the newest ``limit`` messages, oldest first."""
         with self.driver.session(database=self.db) as session:
+            # Range seek on (conversationId, seq) for the last `limit` sequence numbers
             result = session.run(
                 """
-                MATCH (c:Conversation {id: $convId})-[:HAS_MESSAGE]->(m:Message)
+                MATCH (c:Conversation {id: $convId})
+                MATCH (m:Message)
+                WHERE m.conversationId = $convId AND m.seq > c.messageCount - $limit
                 RETURN m
-                ORDER BY m.timestamp ASC
-                LIMIT $limit
+                ORDER BY m.seq ASC
             """,
                 convId=conversation_id,
                 limit=limit,
@@ -183,10 +282,58 @@ class Neo4jConversationStore(IConversationStore):
                         content=m["content"],
                         timestamp=datetime.fromisoformat(m["timestamp"].replace("Z", "+00:00")),
                         metadata=json.loads(m.get("metadata", "{}")),
+                        seq=m.get("seq"),
                     )
                 )
             return messages
 
+    def get_summary(self, conversation_id: str) -> Optional[ConversationSummary]:
+        """Get the conversation's rolling summary, if one has been written."""
+        with self.driver.session(database=self.db) as session:
+            record = session.run(
+                """
+                MATCH (c:Conversation {id: $convId})
+                RETURN c.summary AS text, c.summaryThroughSeq AS throughSeq,
+                       c.summaryUpdatedAt AS updatedAt
+            """,
+                convId=conversation_id,
+            ).single()
+        if not record or record["text"] is None:
+            return None
+        updated_at = record["updatedAt"]
+        return ConversationSummary(
+            text=record["text"],
+            through_seq=record["throughSeq"],
+            updated_at=(
+                datetime.fromisoformat(updated_at.replace("Z", "+00:00")) if updated_at else None
+            ),
+        )
+
+    def save_summary(self, conversation_id: str, summary: ConversationSummary) -> None:
+        """Store a rolling summary unless a newer one is already stored."""
+        with self.driver.session(database=self.db) as session:
+            session.run(
+                """
+                MATCH (c:Conversation {id: $convId})
+                WHERE coalesce(c.summaryThroughSeq, 0) < $throughSeq
+                SET c.summary = $text,
+                    c.summaryThroughSeq = $throughSeq,
+                    c.summaryUpdatedAt = $updatedAt
+            """,
+                convId=conversation_id,
+                text=summary.text,
+                throughSeq=summary.through_seq,
+                updatedAt=(summary.updated_at or datetime.utcnow()).isoformat() + "Z",
+            )
+
+    def ensure_indexes(self) -> None:
+        """Create the conversation constraint and indexes and number messages stored before them."""
+        with self.driver.session(database=self.db) as session:
+            session.run(DROP_CONVERSATION_ID_INDEX)
+            session.run(CONVERSATION_ID_CONSTRAINT)
+            session.run(MESSAGE_SEQ_INDEX)
+            session.run(BACKFILL_SEQ_QUERY)
+
     def update_conversation_title(self, conversation_id: str, title: str) -> None:
         """Update conversation title."""
         with self.driver.session(database=self.db) as session:
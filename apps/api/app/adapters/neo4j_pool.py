@@ -4,6 +4,7 @@ import asyncio
 import logging
 from contextlib import asynccontextmanager
 from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
 from neo4j import AsyncGraphDatabase, AsyncDriver, AsyncSession
 from neo4j.exceptions import Neo4jError, ServiceUnavailable, SessionExpired
 
@@ -34,8 +35,10 @@ class Neo4jConnectionPool:
             "connection_acquisition_timeout": connection_acquisition_timeout,
             "max_transaction_retry_time": max_transaction_retry_time,
             "keep_alive": True,
-            "encrypted": False if "localhost" in uri or "127.0.0.1" in uri else True,
         }
+        # "+s"/"+ssc" schemes configure TLS themselves; the driver rejects `encrypted` with them
+        if urlparse(uri).scheme in ("bolt", "neo4j"):
+            self._config["encrypted"] = not ("localhost" in uri or "127.0.0.1" in uri)
         self._health_check_query = "RETURN 1 as health"
         self._pool_metrics = {
             "connections_created": 0,
@@ -1,76 +1,437 @@
-from typing import Any, Dict, List
+import asyncio
+import datetime
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
 from neo4j import GraphDatabase
+from neo4j.exceptions import AuthError, ConfigurationError
 
+from ..domain.chunking import chunk_id
+from ..domain.retrieval import RRF_K, reciprocal_rank_fusion
 from ..ports.vector_store import IVectorStore
+from .keyword_index import tokenize
+from .neo4j_pool import Neo4jConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# How long hybrid search skips a full-text index found missing before checking again
+FULLTEXT_RECHECK_SECONDS = 300
+
+# Filter the shared index to one tenant; `candidates` tells the caller whether the
+# index was exhausted before enough tenant hits were found, and `matched` how many
+# of them belong to the tenant.  Hits are projected to plain maps so embeddings
+# never travel back over the wire.
+SEARCH_QUERY = """
+CALL db.index.vector.queryNodes($index, $candidates, $vec) YIELD node, score
+WITH count(*) AS candidates,
+     collect(CASE WHEN coalesce(node.tenantId, 'demo') = $tenant
+                  THEN {id: elementId(node), text: coalesce(node.text, ''),
+                        source: coalesce(node.source, ''), score: score,
+                        page_start: node.pageStart, page_end: node.pageEnd} END) AS hits
+RETURN candidates, size(hits) AS matched, hits[..$k] AS hits
+"""
+
+# Same shape as SEARCH_QUERY over the full-text index.  Keyword hits carry their
+# cosine similarity as `score` (comparable with vector hits) and the Lucene score
+# as `text_score`.
+FULLTEXT_SEARCH_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $q, {limit: $candidates}) YIELD node, score
+WITH count(*) AS candidates,
+     collect(CASE WHEN coalesce(node.tenantId, 'demo') = $tenant
+                  THEN {id: elementId(node), text: coalesce(node.text, ''),
+                        source: coalesce(node.source, ''), text_score: score,
+                        score: coalesce(vector.similarity.cosine(node.embedding, $vec), 0.0),
+                        page_start: node.pageStart, page_end: node.pageEnd} END) AS hits
+RETURN candidates, size(hits) AS matched, hits[..$k] AS hits
+"""
+
+UPSERT_SOURCE_QUERY = """
+MERGE (s:Source {id:$sid})
+ON CREATE SET s.createdAt=$now
+SET s.title=$title, s.tenantId=$tenantId, s.updatedAt=$now
+"""
+
+# Set-based chunk write: the Source is matched once per batch, not once per chunk.
+# Chunk ids are content hashes, so re-ingesting identical text updates one node.
+UPSERT_CHUNKS_QUERY = """
+MATCH (s:Source {id:$sid})
+UNWIND $batch AS row
+MERGE (d:Doc {id: row.id})
+SET d.text=row.text, d.source=$title, d.embedding=row.embedding, d.tenantId=$tenantId,
+    d.createdAt=$now, d.pageStart=row.pageStart, d.pageEnd=row.pageEnd
+MERGE (s)-[:HAS_CHUNK]->(d)
+"""
+
+# The HAS_CHUNK relationships are the source's chunk manifest.
+SOURCE_MANIFEST_QUERY = """
+MATCH (s:Source {id:$sid})
+WHERE coalesce(s.tenantId, 'demo') = $tenant
+OPTIONAL MATCH (s)-[:HAS_CHUNK]->(d:Doc)
+RETURN s.id AS sid, collect(d.id) AS ids
+"""
+
+# Unlink chunks from a source and delete those no other source still uses.
+REMOVE_CHUNKS_QUERY = """
+MATCH (s:Source {id:$sid})-[r:HAS_CHUNK]->(d:Doc)
+WHERE coalesce(s.tenantId, 'demo') = $tenant AND d.id IN $ids
+DELETE r
+WITH d
+WHERE NOT (d)<-[:HAS_CHUNK]-()
+DETACH DELETE d
+"""
 
 
 class Neo4jStore(IVectorStore):
-    def __init__(self, cfg):
+    def __init__(
+        self,
+        cfg,
+        pool: Optional[Neo4jConnectionPool] = None,
+        rrf_k: int = RRF_K,
+        keyword_weight: float = 1.0,
+        hybrid_fetch_factor: int = 4,
+    ):
         self.driver = GraphDatabase.driver(cfg.uri, auth=(cfg.user, cfg.password))
         self.db = cfg.database
         self.index = cfg.vector_index
+        self.fulltext_index = getattr(cfg, "fulltext_index", "doc_text")
+        self.rrf_k = rrf_k
+        self.keyword_weight = keyword_weight
+        self.hybrid_fetch_factor = hybrid_fetch_factor
+        self._hybrid_executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._fulltext_missing_until = 0.0  # monotonic time; set when the index is missing
+        self.write_batch_size = getattr(cfg, "write_batch_size", 500)
+        self.search_growth_factor = getattr(cfg, "search_growth_factor", 4)
+        self.search_max_candidates = getattr(cfg, "search_max_candidates", 1000)
+        self.pool = pool
+        # Moving average of the candidates-per-hit each tenant needed; searches run
+        # on the hybrid executor's threads, so updates are locked
+        self._tenant_fetch_ratio: Dict[str, float] = {}
+        self._ratio_smoothing = 0.3
+        self._stats_lock = threading.Lock()
+        self._search_metrics = {
+            "searches": 0,
+            "rounds": 0,
+            "candidates_fetched": 0,
+            "hits_requested": 0,
+            "hits_returned": 0,
+            "short_results": 0,
+        }
 
     def search(self, tenant_id: str, query_vector: list[float], k: int = 5) -> List[Dict[str, Any]]:
-        q = (
-            "CALL db.index.vector.queryNodes($index, $k, $vec) YIELD node, score "
-            "WHERE coalesce(node.tenantId,'demo') = $tenant "
-            "RETURN node as n, score"
+        """Tenant-filtered vector search with adaptive over-fetch.
+
+        The shared index is queried for ``candidates`` neighbours and filtered to the
+        tenant; if fewer than k survive, candidates grow by ``search_growth_factor``
+        until k hits, the index is exhausted, or ``search_max_candidates`` is reached.
+        The starting over-fetch follows a moving average of what each tenant needed,
+        so small tenants in a busy index converge in a single round trip and one
+        capped search does not pin a tenant at the maximum.
+        """
+        return self._search(SEARCH_QUERY, tenant_id, k, index=self.index, vec=query_vector)
+
+    async def asearch(
+        self, tenant_id: str, query_vector: list[float], k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Async ``search`` through the connection pool (same over-fetch strategy).
+
+        Falls back to the sync driver on a worker thread if the pool is unusable.
+        """
+        if self.pool is not None:
+            try:
+                return await self._asearch(
+                    SEARCH_QUERY, tenant_id, k, index=self.index, vec=query_vector
+                )
+            except Exception as e:
+                self._pool_failed(e)
+        return await asyncio.to_thread(self.search, tenant_id, query_vector, k)
+
+    def search_hybrid(
+        self, tenant_id: str, query_text: str, query_vector: list[float], k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Full-text and vector search run concurrently, fused by reciprocal rank.
+
+        If the full-text query fails, the vector results are returned on their own.
+        A missing full-text index is remembered, so it is not queried on every call.
+        """
+        candidates = k * self.hybrid_fetch_factor
+        keywords = self._fulltext_keywords(query_text)
+        keyword_future = None
+        if keywords:
+            keyword_future = self._executor().submit(
+                self._search,
+                FULLTEXT_SEARCH_QUERY,
+                tenant_id,
+                candidates,
+                ratio_key=f"{tenant_id}\0fulltext",
+                index=self.fulltext_index,
+                q=keywords,
+                vec=query_vector,
+            )
+        vector_hits = self.search(tenant_id, query_vector, candidates)
+        keyword_hits = []
+        if keyword_future is not None:
+            try:
+                keyword_hits = keyword_future.result()
+            except Exception as e:
+                self._fulltext_failed(e)
+        return self._fuse(vector_hits, keyword_hits, k)
+
+    async def asearch_hybrid(
+        self, tenant_id: str, query_text: str, query_vector: list[float], k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Async ``search_hybrid`` through the connection pool."""
+        if self.pool is None:
+            return await asyncio.to_thread(
+                self.search_hybrid, tenant_id, query_text, query_vector, k
+            )
+        candidates = k * self.hybrid_fetch_factor
+        keywords = self._fulltext_keywords(query_text)
+        searches = [self.asearch(tenant_id, query_vector, candidates)]
+        if keywords:
+            searches.append(
+                self._asearch(
+                    FULLTEXT_SEARCH_QUERY,
+                    tenant_id,
+                    candidates,
+                    ratio_key=f"{tenant_id}\0fulltext",
+                    index=self.fulltext_index,
+                    q=keywords,
+                    vec=query_vector,
+                )
+            )
+        vector_hits, *keyword_results = await asyncio.gather(*searches, return_exceptions=True)
+        if isinstance(vector_hits, BaseException):
+            raise vector_hits  # asearch has already fallen back to the sync driver
+        keyword_hits = keyword_results[0] if keyword_results else []
+        if isinstance(keyword_hits, BaseException):
+            self._fulltext_failed(keyword_hits)
+            keyword_hits = []
+        return self._fuse(vector_hits, keyword_hits, k)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._hybrid_executor is None:
+                self._hybrid_executor = ThreadPoolExecutor(8, thread_name_prefix="neo4j-fulltext")
+            return self._hybrid_executor
+
+    def _fulltext_keywords(self, query_text: str) -> str:
+        """The full-text query for ``query_text``; empty while the index is known missing."""
+        if time.monotonic() < self._fulltext_missing_until:
+            return ""
+        return " ".join(tokenize(query_text))
+
+    def _fulltext_failed(self, error: BaseException) -> None:
+        if "no such fulltext schema index" in str(error).lower():
+            logger.warning(
+                f"Full-text index {self.fulltext_index} does not exist; hybrid search uses "
+                f"vector results only (create it with neo4j_setup.cypher): {error}"
+            )
+            self._fulltext_missing_until = time.monotonic() + FULLTEXT_RECHECK_SECONDS
+        else:
+            logger.warning(f"Full-text search failed, using vector results only: {error}")
+
+    def close(self) -> None:
+        """Shut down the full-text search threads and the driver."""
+        with self._executor_lock:
+            if self._hybrid_executor is not None:
+                self._hybrid_executor.shutdown(wait=False, cancel_futures=True)
+                self._hybrid_executor = None
+        self.driver.close()
+
+    def _pool_failed(self, error: Exception) -> None:
+        """Log a failed pooled query; stop using a pool that can never connect."""
+        if isinstance(error, (ConfigurationError, AuthError)):
+            logger.error(f"Neo4j connection pool unusable, using the sync driver: {error}")
+            self.pool = None
+        else:
+            logger.warning(f"Pooled Neo4j search failed, retrying with the sync driver: {error}")
+
+    def _fuse(
+        self, vector_hits: List[Dict[str, Any]], keyword_hits: List[Dict[str, Any]], k: int
+    ) -> List[Dict[str, Any]]:
+        return reciprocal_rank_fusion(
+            [vector_hits, keyword_hits], k, self.rrf_k, weights=[1.0, self.keyword_weight]
         )
+
+    def _search(
+        self, query: str, tenant_id: str, k: int, ratio_key: Optional[str] = None, **params
+    ) -> List[Dict[str, Any]]:
+        """Run a tenant-filtered index query, growing candidates until k hits."""
+        ratio_key = ratio_key or tenant_id
+        candidates = self._initial_candidates(ratio_key, k)
+        rounds = 0
         with self.driver.session(database=self.db) as s:
-            res = s.run(q, index=self.index, k=k, vec=query_vector, tenant=tenant_id)
-            out = []
-            for r in res:
-                n = r["n"]
-                out.append(
-                    {
-                        "id": n.element_id,
-                        "text": n.get("text", ""),
-                        "source": n.get("source", ""),
-                        "score": r["score"],
-                    }
+            while True:
+                rounds += 1
+                record = s.run(
+                    query, **self._search_params(tenant_id, candidates, k, params)
+                ).single()
+                hits, grown = self._search_round(record, candidates, k)
+                if grown is None:
+                    break
+                candidates = grown
+
+        self._record_search(ratio_key, k, candidates, rounds, hits, record)
+        return [dict(h) for h in hits]
+
+    async def _asearch(
+        self, query: str, tenant_id: str, k: int, ratio_key: Optional[str] = None, **params
+    ) -> List[Dict[str, Any]]:
+        """Async ``_search`` through the connection pool."""
+        ratio_key = ratio_key or tenant_id
+        candidates = self._initial_candidates(ratio_key, k)
+        rounds = 0
+        while True:
+            rounds += 1
+            records = await self.pool.execute_query(
+                query, self._search_params(tenant_id, candidates, k, params), self.db
+            )
+            record = records[0] if records else None
+            hits, grown = self._search_round(record, candidates, k)
+            if grown is None:
+                break
+            candidates = grown
+
+        self._record_search(ratio_key, k, candidates, rounds, hits, record)
+        return [dict(h) for h in hits]
+
+    def _initial_candidates(self, ratio_key: str, k: int) -> int:
+        return min(
+            max(k, int(k * self._tenant_fetch_ratio.get(ratio_key, 1.0))),
+            max(k, self.search_max_candidates),
+        )
+
+    def _search_params(
+        self, tenant_id: str, candidates: int, k: int, params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        return {**params, "candidates": candidates, "tenant": tenant_id, "k": k}
+
+    def _search_round(
+        self, record: Optional[Dict[str, Any]], candidates: int, k: int
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Hits from one round, plus the next candidate count (None when done)."""
+        returned = record["candidates"] if record else 0
+        hits = record["hits"] if record else []
+        if len(hits) >= k or returned < candidates or candidates >= self.search_max_candidates:
+            return hits, None
+        return hits, min(candidates * self.search_growth_factor, self.search_max_candidates)
+
+    def _record_search(
+        self,
+        ratio_key: str,
+        k: int,
+        candidates: int,
+        rounds: int,
+        hits: List[Dict[str, Any]],
+        record: Optional[Dict[str, Any]],
+    ) -> None:
+        needed = self._needed_ratio(record, k)
+        with self._stats_lock:
+            previous = self._tenant_fetch_ratio.get(ratio_key)
+            if previous is None:
+                self._tenant_fetch_ratio[ratio_key] = needed
+            else:
+                self._tenant_fetch_ratio[ratio_key] = previous + self._ratio_smoothing * (
+                    needed - previous
                 )
-            return out
+            m = self._search_metrics
+            m["searches"] += 1
+            m["rounds"] += rounds
+            m["candidates_fetched"] += candidates
+            m["hits_requested"] += k
+            m["hits_returned"] += len(hits)
+            if len(hits) < k:
+                m["short_results"] += 1
+
+    def _needed_ratio(self, record: Optional[Dict[str, Any]], k: int) -> float:
+        """Candidates per requested hit the last round suggests the tenant needs."""
+        returned = record["candidates"] if record else 0
+        matched = record.get("matched", len(record["hits"])) if record else 0
+        if matched:
+            ratio = returned / matched
+        else:
+            # No tenant hits at all: assume at least one more growth step was needed
+            ratio = returned * self.search_growth_factor / k
+        return min(max(ratio, 1.0), max(1.0, self.search_max_candidates / k))
+
+    def get_search_metrics(self) -> Dict[str, Any]:
+        """Over-fetch statistics for tenant-filtered vector search."""
+        with self._stats_lock:
+            m = dict(self._search_metrics)
+        m["overfetch_ratio"] = (
+            round(m["candidates_fetched"] / m["hits_requested"], 2) if m["hits_requested"] else 0.0
+        )
+        m["avg_rounds"] = round(m["rounds"] / m["searches"], 2) if m["searches"] else 0.0
+        return m
+
+    def _chunk_rows(
+        self,
+        tenant_id: str,
+        chunks: list[str],
+        embeddings: list[list[float]],
+        metadata: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[Dict[str, Any]]:
+        metadata = metadata or [{}] * len(chunks)
+        return [
+            {
+                "id": chunk_id(tenant_id, ch),
+                "text": ch,
+                "embedding": emb,
+                "pageStart": meta.get("page_start"),
+                "pageEnd": meta.get("page_end"),
+            }
+            for ch, emb, meta in zip(chunks, embeddings, metadata)
+        ]
 
     def upsert_chunks(
-        self, tenant_id: str, title: str, chunks: list[str], embeddings: list[list[float]]
+        self,
+        tenant_id: str,
+        title: str,
+        chunks: list[str],
+        embeddings: list[list[float]],
+        source_id: Optional[str] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None,
     ) -> str:
-        import datetime
-        import uuid
-
-        sid = str(uuid.uuid4())
+        sid = source_id or str(uuid.uuid4())
         now = datetime.datetime.utcnow().isoformat() + "Z"
+        rows = self._chunk_rows(tenant_id, chunks, embeddings, metadata)
+        params = {"sid": sid, "title": title, "tenantId": tenant_id, "now": now}
 
         def _tx(tx):
-            tx.run(
-                "MERGE (s:Source {id:$sid}) SET s.title=$title, s.tenantId=$tenantId, "
-                "s.createdAt=$now",
-                sid=sid,
-                title=title,
-                tenantId=tenant_id,
-                now=now,
-            )
-            for i, ch in enumerate(chunks):
-                tx.run(
-                    """
-                    MERGE (d:Doc {id:$id})
-                    SET d.text=$text, d.source=$title, d.embedding=$emb, d.tenantId=$tenantId,
-                        d.createdAt=$now
-                    WITH d MATCH (s:Source {id:$sid}) MERGE (s)-[:HAS_CHUNK]->(d)
-                    """,
-                    id=str(uuid.uuid4()),
-                    text=ch,
-                    emb=embeddings[i],
-                    tenantId=tenant_id,
-                    now=now,
-                    title=title,
-                    sid=sid,
-                )
+            tx.run(UPSERT_SOURCE_QUERY, **params)
+            for i in range(0, len(rows), self.write_batch_size):
+                tx.run(UPSERT_CHUNKS_QUERY, batch=rows[i : i + self.write_batch_size], **params)
 
         with self.driver.session(database=self.db) as s:
             s.execute_write(_tx)
         return sid
 
+    def get_source_manifest(self, tenant_id: str, source_id: str) -> Optional[List[str]]:
+        """Chunk ids of a source, or None if the tenant has no such source."""
+        with self.driver.session(database=self.db) as s:
+            record = s.run(SOURCE_MANIFEST_QUERY, sid=source_id, tenant=tenant_id).single()
+        # Grouped by source, so a missing source yields no row at all
+        return None if record is None else list(record["ids"])
+
+    def remove_chunks(self, tenant_id: str, source_id: str, chunk_ids: List[str]) -> int:
+        """Drop chunks from a source; chunks no other source links to are deleted."""
+        if not chunk_ids:
+            return 0
+
+        def _tx(tx):
+            for i in range(0, len(chunk_ids), self.write_batch_size):
+                batch = chunk_ids[i : i + self.write_batch_size]
+                tx.run(REMOVE_CHUNKS_QUERY, sid=source_id, tenant=tenant_id, ids=batch)
+
+        with self.driver.session(database=self.db) as s:
+            s.execute_write(_tx)
+        return len(chunk_ids)
+
     def ensure_vector_index(
         self,
         label: str = "Doc",
@@ -88,6 +449,16 @@ class Neo4jStore(IVectorStore):
         with self.driver.session(database=self.db) as session:
             session.run(cypher)
 
+    def ensure_fulltext_index(self, label: str = "Doc", property_name: str = "text") -> None:
+        """Ensure the full-text index used by hybrid search exists."""
+        cypher = (
+            f"CREATE FULLTEXT INDEX {self.fulltext_index} IF NOT EXISTS "
+            f"FOR (n:{label}) ON EACH [n.{property_name}]"
+        )
+        with self.driver.session(database=self.db) as session:
+            session.run(cypher)
+        self._fulltext_missing_until = 0.0
+
     def get_recent_sources(self, tenant_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         """Get recently ingested sources for a tenant."""
         q = """
@@ -1,23 +1,166 @@
-from typing import Any, Dict, List
+import asyncio
+import json
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 
+from ..domain.prompts import answer_messages, rag_only_answer
 from ..ports.llm import IChatLLM
 
 
 class OllamaChat(IChatLLM):
-    def __init__(self, base: str = "http://localhost:11434", model: str = "llama3"):
-        self.base, self.model = base, model
+    """Chat over Ollama's /api/chat with pooled keep-alive connections.
+
+    Sync calls share one ``requests.Session``; async calls share one
+    ``httpx.AsyncClient`` per event loop (clients are bound to the loop that
+    opened them).  In-flight requests are capped at ``max_parallel``, which should
+    match the server's OLLAMA_NUM_PARALLEL: Ollama queues anything beyond that,
+    so extra requests would only hold connections and run into timeouts.
+    ``keep_alive`` keeps the model loaded between questions and ``num_ctx`` sets
+    its context window (a change of ``num_ctx`` forces Ollama to reload the model,
+    so it is sent on every request).
+    """
+
+    def __init__(
+        self,
+        base: str = "http://localhost:11434",
+        model: str = "llama3",
+        num_ctx: Optional[int] = None,
+        keep_alive: Optional[str] = "30m",
+        max_parallel: int = 4,
+        timeout: float = 120.0,
+        connect_timeout: float = 5.0,
+    ):
+        self.base, self.model = base.rstrip("/"), model
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive
+        self.max_parallel = max(1, max_parallel)
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_parallel)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(self.max_parallel)
+        # event loop -> (client, request slots)
+        self._clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def _payload(self, messages: List[Dict[str, str]], stream: bool = False) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"model": self.model, "messages": messages, "stream": stream}
+        if self.keep_alive is not None:
+            # Ollama reads bare numbers as seconds ("-1" = forever), strings as durations
+            keep_alive = self.keep_alive
+            payload["keep_alive"] = (
+                int(keep_alive) if keep_alive.lstrip("-").isdigit() else keep_alive
+            )
+        if self.num_ctx:
+            payload["options"] = {"num_ctx": self.num_ctx}
+        return payload
+
+    def _aclient(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        """The pooled client and request slots for the running event loop."""
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(loop)
+        if entry is None:
+            client = httpx.AsyncClient(
+                base_url=self.base,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_parallel,
+                    max_keepalive_connections=self.max_parallel,
+                ),
+            )
+            entry = self._clients[loop] = (client, asyncio.Semaphore(self.max_parallel))
+        return entry
+
+    def close(self) -> None:
+        self._session.close()
+
+    async def aclose(self) -> None:
+        """Close the async client opened on the running event loop."""
+        entry = self._clients.pop(asyncio.get_running_loop(), None)
+        if entry:
+            await entry[0].aclose()
 
     def answer(self, hits: List[Dict[str, Any]], question: str, rag_only: bool = False) -> str:
-        ctx = [f"[{i + 1}] {h['text']} (src: {h.get('source', '')})" for i, h in enumerate(hits)]
         if rag_only:
-            return "RAG_ONLY mode (ollama):\n" + "\n".join(ctx[:3])
-        prompt = "Context:\n" + "\n".join(ctx) + f"\n\nQuestion: {question}\nAnswer:"
-        r = requests.post(
-            f"{self.base}/api/generate",
-            json={"model": self.model, "prompt": prompt, "stream": False},
-            timeout=120,
-        )
+            return rag_only_answer(hits)
+        return self.chat(answer_messages(hits, question))
+
+    async def aanswer(
+        self, hits: List[Dict[str, Any]], question: str, rag_only: bool = False
+    ) -> str:
+        if rag_only:
+            return rag_only_answer(hits)
+        return await self.achat(answer_messages(hits, question))
+
+    async def astream_answer(
+        self, hits: List[Dict[str, Any]], question: str, rag_only: bool = False
+    ) -> AsyncIterator[str]:
+        if rag_only:
+            yield rag_only_answer(hits)
+            return
+        async for delta in self.astream_chat(answer_messages(hits, question)):
+            yield delta
+
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        with self._slots:
+            r = self._session.post(
+                f"{self.base}/api/chat",
+                json=self._payload(messages),
+                timeout=(self.connect_timeout, self.timeout),
+            )
         r.raise_for_status()
-        return r.json().get("response", "")
+        return (r.json().get("message") or {}).get("content", "")
+
+    async def achat(self, messages: List[Dict[str, str]]) -> str:
+        client, slots = self._aclient()
+        async with slots:
+            r = await client.post("/api/chat", json=self._payload(messages))
+        r.raise_for_status()
+        return (r.json().get("message") or {}).get("content", "")
+
+    def batch_chat(
+        self, conversations: List[List[Dict[str, str]]], max_concurrency: int = 4
+    ) -> List[str]:
+        workers = max(1, min(max_concurrency, self.max_parallel))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.chat, conversations))
+
+    async def abatch_chat(
+        self, conversations: List[List[Dict[str, str]]], max_concurrency: int = 4
+    ) -> List[str]:
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def complete(messages: List[Dict[str, str]]) -> str:
+            async with semaphore:
+                return await self.achat(messages)
+
+        return list(await asyncio.gather(*(complete(m) for m in conversations)))
+
+    async def astream_chat(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        async for part in self._astream("/api/chat", self._payload(messages, stream=True)):
+            content = (part.get("message") or {}).get("content")
+            if content:
+                yield content
+
+    async def _astream(self, path: str, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """POST with streaming enabled and yield each NDJSON object Ollama sends."""
+        client, slots = self._aclient()
+        async with slots:
+            async with client.stream("POST", path, json=payload) as r:
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    if line.strip():
+                        part = json.loads(line)
+                        if part.get("error"):
+                            raise RuntimeError(f"Ollama error: {part['error']}")
+                        yield part
+                        if part.get("done"):
+                            return
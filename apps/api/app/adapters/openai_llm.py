@@ -1,19 +1,94 @@
-from typing import Any, Dict, List
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List
 
+import openai
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
+from ..domain.prompts import answer_messages, rag_only_answer
+from ..domain.tokens import get_token_counter
 from ..ports.llm import IChatLLM, IEmbedder
 
+logger = logging.getLogger(__name__)
+
 
 class OpenAIEmbedder(IEmbedder):
-    def __init__(self, model: str):
+    """OpenAI embeddings with token-budgeted, concurrent batch requests."""
+
+    def __init__(
+        self,
+        model: str,
+        max_batch_tokens: int = 100_000,
+        max_batch_size: int = 512,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+    ):
         self.emb = OpenAIEmbeddings(model=model)
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._count_tokens = get_token_counter(model)
+        # Bounds in-flight provider calls across all concurrent embed_batch callers
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
 
     def embed_query(self, text: str) -> list[float]:
         return self.emb.embed_query(text)
 
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.emb.aembed_query(text)
+
     def embed_batch(self, chunks: list[str]) -> list[list[float]]:
-        return [self.emb.embed_query(c) for c in chunks]
+        if not chunks:
+            return []
+        batches = self._pack(chunks)
+        if len(batches) == 1:
+            results = [self._embed_with_retry(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                results = list(executor.map(self._embed_with_retry, batches))
+        return [vector for batch in results for vector in batch]
+
+    def _pack(self, chunks: list[str]) -> List[List[str]]:
+        """Split chunks, in order, into batches within the token and input limits."""
+        batches: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = 0
+        for chunk in chunks:
+            tokens = self._count_tokens(chunk)
+            if current and (
+                current_tokens + tokens > self.max_batch_tokens
+                or len(current) >= self.max_batch_size
+            ):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(chunk)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        """One batch embedding call, retried with jittered exponential backoff."""
+        attempt = 0
+        while True:
+            try:
+                with self._semaphore:
+                    return self.emb.embed_documents(texts)
+            except (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = min(2**attempt, 30) + random.uniform(0, 1)
+                logger.warning(
+                    f"Embedding batch of {len(texts)} failed ({e.__class__.__name__}), "
+                    f"retrying in {delay:.1f}s"
+                )
+                time.sleep(delay)
+                attempt += 1
 
 
 class OpenAIChat(IChatLLM):
@@ -21,10 +96,45 @@ class OpenAIChat(IChatLLM):
         self.llm = ChatOpenAI(model=model)
 
     def answer(self, hits: List[Dict[str, Any]], question: str, rag_only: bool = False) -> str:
-        ctx = [f"[{i + 1}] {h['text']} (src: {h.get('source', '')})" for i, h in enumerate(hits)]
-        sys = "You are the Organizational Twin. Always cite snippets like [1], [2]."
-        user = "Context:\n" + "\n".join(ctx) + f"\n\nQuestion: {question}\nAnswer:"
         if rag_only:
-            return "RAG_ONLY mode: returning top snippets only.\n" + "\n".join(ctx[:3])
-        r = self.llm.invoke([{"role": "system", "content": sys}, {"role": "user", "content": user}])
-        return r.content
+            return rag_only_answer(hits)
+        return self.chat(answer_messages(hits, question))
+
+    async def aanswer(
+        self, hits: List[Dict[str, Any]], question: str, rag_only: bool = False
+    ) -> str:
+        if rag_only:
+            return rag_only_answer(hits)
+        return await self.achat(answer_messages(hits, question))
+
+    async def astream_answer(
+        self, hits: List[Dict[str, Any]], question: str, rag_only: bool = False
+    ) -> AsyncIterator[str]:
+        if rag_only:
+            yield rag_only_answer(hits)
+            return
+        async for delta in self.astream_chat(answer_messages(hits, question)):
+            yield delta
+
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        return self.llm.invoke(messages).content
+
+    async def achat(self, messages: List[Dict[str, str]]) -> str:
+        return (await self.llm.ainvoke(messages)).content
+
+    def batch_chat(
+        self, conversations: List[List[Dict[str, str]]], max_concurrency: int = 4
+    ) -> List[str]:
+        replies = self.llm.batch(conversations, config={"max_concurrency": max_concurrency})
+        return [r.content for r in replies]
+
+    async def abatch_chat(
+        self, conversations: List[List[Dict[str, str]]], max_concurrency: int = 4
+    ) -> List[str]:
+        replies = await self.llm.abatch(conversations, config={"max_concurrency": max_concurrency})
+        return [r.content for r in replies]
+
+    async def astream_chat(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        async for chunk in self.llm.astream(messages):
+            if chunk.content:
+                yield chunk.content
@@ -1,9 +1,14 @@
 """Redis cache adapter implementation."""
 
+import asyncio
 import hashlib
 import json
 import logging
-from typing import Any, Dict, List, Optional
+import struct
+import threading
+import weakref
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 from contextlib import asynccontextmanager
 import numpy as np
 import redis.asyncio as redis
@@ -16,7 +21,11 @@ logger = logging.getLogger(__name__)
 
 
 class RedisConnectionPool:
-    """Redis connection pool manager."""
+    """Redis connection pool manager.
+
+    redis.asyncio connections are bound to the event loop that opened them, so one
+    pool is kept per loop; the API loop and background loops never share sockets.
+    """
 
     def __init__(
         self,
@@ -25,8 +34,8 @@ class RedisConnectionPool:
         decode_responses: bool = False,
     ):
         """Initialize Redis connection pool."""
-        self.pool = ConnectionPool.from_url(
-            redis_url,
+        self.redis_url = redis_url
+        self._pool_kwargs = dict(
             max_connections=max_connections,
             decode_responses=decode_responses,
             socket_keepalive=True,
@@ -36,19 +45,26 @@ class RedisConnectionPool:
                 3: 3,  # TCP_KEEPCNT
             },
         )
-        self._client = None
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, redis.Redis]" = (
+            weakref.WeakKeyDictionary()
+        )
 
     async def get_client(self) -> redis.Redis:
-        """Get Redis client with connection pooling."""
-        if not self._client:
-            self._client = redis.Redis(connection_pool=self.pool)
-        return self._client
+        """Get Redis client with connection pooling for the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            pool = ConnectionPool.from_url(self.redis_url, **self._pool_kwargs)
+            client = redis.Redis(connection_pool=pool)
+            self._clients[loop] = client
+        return client
 
     async def close(self):
-        """Close all connections in the pool."""
-        if self._client:
-            await self._client.close()
-        await self.pool.disconnect()
+        """Close all connections opened on the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client:
+            await client.close()
+            await client.connection_pool.disconnect()
 
 
 class RedisCache(ICache):
@@ -135,105 +151,265 @@ class RedisCache(ICache):
             return 0
 
 
+# Binary vector encoding -------------------------------------------------------
+#
+# Header: magic(4) | dtype code(1) | reserved(1) | dim(uint32) | model length(uint16),
+# then the UTF-8 model name padded to 4 bytes, then little-endian vector data.  The
+# padding keeps the data 4-byte aligned so np.frombuffer views it without copying.
+
+_VECTOR_MAGIC = b"LTV1"
+_VECTOR_HEADER = struct.Struct("<4sBBIH")
+_VECTOR_DTYPES = {"float32": (1, np.dtype("<f4")), "float16": (2, np.dtype("<f2"))}
+_VECTOR_CODES = {code: dtype for code, dtype in _VECTOR_DTYPES.values()}
+
+
+def encode_vector(vector: Any, dtype: str = "float32", model: str = "") -> bytes:
+    """Encode a vector as compact little-endian bytes with a small header."""
+    code, np_dtype = _VECTOR_DTYPES[dtype]
+    data = np.asarray(vector, dtype=np_dtype).ravel()
+    model_bytes = model.encode("utf-8")
+    padding = b"\0" * (-(_VECTOR_HEADER.size + len(model_bytes)) % 4)
+    header = _VECTOR_HEADER.pack(_VECTOR_MAGIC, code, 0, data.shape[0], len(model_bytes))
+    return header + model_bytes + padding + data.tobytes()
+
+
+def decode_vector(blob: bytes) -> Tuple[np.ndarray, str]:
+    """Decode bytes from ``encode_vector`` into a read-only float32/16 view and model."""
+    magic, code, _, dim, model_len = _VECTOR_HEADER.unpack_from(blob)
+    if magic != _VECTOR_MAGIC:
+        raise ValueError("Not an encoded vector")
+    offset = _VECTOR_HEADER.size + model_len
+    model = bytes(blob[_VECTOR_HEADER.size : offset]).decode("utf-8")
+    offset += -offset % 4
+    return np.frombuffer(blob, dtype=_VECTOR_CODES[code], count=dim, offset=offset), model
+
+
+class _SemanticPartition:
+    """Process-local copy of one tenant's cached query embeddings."""
+
+    def __init__(self):
+        self.version: Optional[bytes] = None
+        self.keys: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.lock = threading.Lock()
+
+    def apply(self, version: Optional[bytes], removed: set, added: Dict[str, np.ndarray]) -> None:
+        """Drop ``removed`` keys and append ``added`` (already normalised) vectors."""
+        with self.lock:
+            if removed:
+                keep = [i for i, key in enumerate(self.keys) if key not in removed]
+                self.keys = [self.keys[i] for i in keep]
+                self.matrix = self.matrix[keep]
+            added = {k: v for k, v in added.items() if k not in removed and k not in self.rows}
+            if added:
+                dim = self.matrix.shape[1] if len(self.keys) else None
+                if dim is not None:
+                    added = {k: v for k, v in added.items() if v.shape[0] == dim}
+                if added:
+                    new = np.stack(list(added.values()))
+                    self.matrix = np.vstack([self.matrix, new]) if len(self.keys) else new
+                    self.keys.extend(added)
+            self.rows = {key: i for i, key in enumerate(self.keys)}
+            self.version = version
+
+    def search(self, query: np.ndarray, threshold: float, limit: int) -> List[Tuple[str, float]]:
+        """Keys scoring at least ``threshold``, best first."""
+        with self.lock:
+            keys, matrix = self.keys, self.matrix
+        if not keys or matrix.shape[1] != query.shape[0]:
+            return []
+        scores = matrix @ query
+        order = np.argsort(-scores)[:limit]
+        return [(keys[i], float(scores[i])) for i in order if scores[i] >= threshold]
+
+
 class SemanticCache(ISemanticCache):
-    """Semantic cache for RAG queries using Redis."""
+    """Semantic cache for RAG queries using Redis.
 
-    def __init__(self, pool: RedisConnectionPool, embedding_dimensions: int = 1536):
+    Entries are Redis hashes holding the binary-encoded query embedding next to the
+    response and metadata, partitioned by tenant.  Each tenant has a key set and a
+    version counter; every process keeps a normalised NumPy matrix of the tenant's
+    embeddings and only re-syncs it (fetching just the new vectors) when the
+    version changes.  A lookup is one vectorised similarity computation plus one
+    fetch for the winner.
+    """
+
+    def __init__(
+        self,
+        pool: RedisConnectionPool,
+        embedding_dimensions: int = 1536,
+        vector_dtype: str = "float32",
+    ):
         """Initialize semantic cache."""
         self.pool = pool
         self.embedding_dimensions = embedding_dimensions
-        self._cache_prefix = "semantic:"
+        self.vector_dtype = vector_dtype
+        self._hash_prefix = "semantic:v2:"
         self._index_prefix = "semantic_idx:"
+        self._version_prefix = "semantic_ver:"
         self._ttl = 3600 * 24  # 24 hours for semantic cache
-
-    def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors."""
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        return dot_product / (norm1 * norm2)
+        self._partitions: Dict[str, _SemanticPartition] = {}
+        self._partitions_lock = threading.Lock()
+
+    @staticmethod
+    def _partition_name(tenant_id: Optional[str]) -> str:
+        return tenant_id or "_global"
+
+    def _entry_key(self, partition: str, query: str) -> str:
+        query_hash = hashlib.md5(query.encode()).hexdigest()
+        return f"{self._hash_prefix}{partition}:{query_hash}"
+
+    def _partition(self, name: str) -> _SemanticPartition:
+        with self._partitions_lock:
+            partition = self._partitions.get(name)
+            if partition is None:
+                partition = self._partitions[name] = _SemanticPartition()
+            return partition
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> Optional[np.ndarray]:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    async def _sync(self, client, name: str) -> _SemanticPartition:
+        """Bring the local partition up to date with Redis if its version moved."""
+        partition = self._partition(name)
+        version = await client.get(f"{self._version_prefix}{name}")
+        if partition.version is not None and version == partition.version:
+            return partition
+
+        members = {
+            m.decode() if isinstance(m, bytes) else m
+            for m in await client.smembers(f"{self._index_prefix}{name}")
+        }
+        removed = set(partition.rows) - members
+        new_keys = [key for key in members if key not in partition.rows]
+
+        # Fetch only the vectors we have not seen; legacy JSON entries are plain strings
+        added: Dict[str, np.ndarray] = {}
+        if new_keys:
+            pipe = client.pipeline()
+            for key in new_keys:
+                if key.startswith(self._hash_prefix):
+                    pipe.hget(key, "vec")
+                else:
+                    pipe.get(key)
+            for key, raw in zip(new_keys, await pipe.execute()):
+                if not raw:
+                    removed.add(key)
+                    continue
+                try:
+                    if key.startswith(self._hash_prefix):
+                        vector = decode_vector(raw)[0]
+                    else:
+                        vector = np.asarray(json.loads(raw)["embedding"], dtype=np.float32)
+                except (ValueError, KeyError, TypeError, struct.error) as e:
+                    logger.error(f"Skipping unreadable semantic cache entry {key}: {e}")
+                    continue
+                unit = self._unit(vector)
+                if unit is not None:
+                    added[key] = unit
+
+        partition.apply(version, removed, added)
+        return partition
 
     async def get_similar(
-        self, query_embedding: np.ndarray, threshold: float = 0.95
+        self,
+        query_embedding: np.ndarray,
+        threshold: float = 0.95,
+        tenant_id: Optional[str] = None,
     ) -> Optional[Dict[str, Any]]:
         """Get cached response for semantically similar query."""
+        query = self._unit(query_embedding)
+        if query is None:
+            return None
+        name = self._partition_name(tenant_id)
         try:
             client = await self.pool.get_client()
-            
-            # Get all semantic cache keys
-            keys = []
-            async for key in client.scan_iter(match=f"{self._cache_prefix}*"):
-                keys.append(key)
-            
-            # Check similarity for each cached query
-            for key in keys:
-                cached_data = await client.get(key)
-                if cached_data:
-                    try:
-                        data = json.loads(cached_data)
-                        cached_embedding = np.array(data.get("embedding", []))
-                        
-                        if cached_embedding.shape[0] == query_embedding.shape[0]:
-                            similarity = self._cosine_similarity(query_embedding, cached_embedding)
-                            
-                            if similarity >= threshold:
-                                # Update hit count and last access time
-                                data["hits"] = data.get("hits", 0) + 1
-                                data["last_accessed"] = json.dumps(
-                                    {"timestamp": np.datetime64("now").item()}
-                                )
-                                await client.setex(key, self._ttl, json.dumps(data))
-                                
-                                return {
-                                    "response": data.get("response"),
-                                    "similarity": similarity,
-                                    "metadata": data.get("metadata", {}),
-                                    "hits": data["hits"],
-                                }
-                    except (json.JSONDecodeError, KeyError, ValueError) as e:
-                        logger.error(f"Error processing cached data: {e}")
-                        continue
-            
+            partition = await self._sync(client, name)
+
+            # Entries can expire between syncs; fall through to the next best match
+            for key, similarity in partition.search(query, threshold, limit=3):
+                cached = await self._fetch(client, name, key)
+                if cached is None:
+                    partition.apply(partition.version, {key}, {})
+                    continue
+                cached["similarity"] = similarity
+                return cached
             return None
-            
+
         except RedisError as e:
             logger.error(f"Redis error in get_similar: {e}")
             return None
 
+    async def _fetch(self, client, name: str, key: str) -> Optional[Dict[str, Any]]:
+        """Read the winning entry and bump its hit count."""
+        if not key.startswith(self._hash_prefix):
+            raw = await client.get(key)
+            if not raw:
+                await client.srem(f"{self._index_prefix}{name}", key)
+                return None
+            data = json.loads(raw)
+            data["hits"] = data.get("hits", 0) + 1
+            await client.setex(key, self._ttl, json.dumps(data))
+            return {
+                "response": data.get("response"),
+                "metadata": data.get("metadata", {}),
+                "hits": data["hits"],
+            }
+
+        pipe = client.pipeline()
+        pipe.hmget(key, "response", "metadata")
+        pipe.hincrby(key, "hits", 1)
+        pipe.expire(key, self._ttl)
+        (response, metadata), hits, _ = await pipe.execute()
+        if response is None:
+            # Expired: HINCRBY just recreated a stub hash, remove it
+            pipe = client.pipeline()
+            pipe.delete(key)
+            pipe.srem(f"{self._index_prefix}{name}", key)
+            await pipe.execute()
+            return None
+        return {
+            "response": response.decode() if isinstance(response, bytes) else response,
+            "metadata": json.loads(metadata) if metadata else {},
+            "hits": hits,
+        }
+
     async def store(
         self, query: str, query_embedding: np.ndarray, response: str, metadata: Dict[str, Any]
     ) -> bool:
         """Store query and response with embedding."""
         try:
             client = await self.pool.get_client()
-            
-            # Generate cache key from query hash
-            query_hash = hashlib.md5(query.encode()).hexdigest()
-            cache_key = f"{self._cache_prefix}{query_hash}"
-            
-            # Prepare data for storage
-            cache_data = {
-                "query": query,
-                "embedding": query_embedding.tolist(),
-                "response": response,
-                "metadata": metadata,
-                "hits": 0,
-                "created_at": json.dumps({"timestamp": np.datetime64("now").item()}),
-            }
-            
-            # Store in Redis with TTL
-            result = await client.setex(cache_key, self._ttl, json.dumps(cache_data))
-            
-            # Also store in index for tenant-based clearing
-            if metadata.get("tenant_id"):
-                index_key = f"{self._index_prefix}{metadata['tenant_id']}"
-                await client.sadd(index_key, cache_key)
-                await client.expire(index_key, self._ttl)
-            
-            return result
-            
+
+            name = self._partition_name(metadata.get("tenant_id"))
+            cache_key = self._entry_key(name, query)
+            index_key = f"{self._index_prefix}{name}"
+            version_key = f"{self._version_prefix}{name}"
+
+            pipe = client.pipeline()
+            pipe.hset(
+                cache_key,
+                mapping={
+                    "vec": encode_vector(query_embedding, self.vector_dtype),
+                    "query": query,
+                    "response": response,
+                    "metadata": json.dumps(metadata),
+                    "hits": 0,
+                    "created_at": datetime.utcnow().isoformat(),
+                },
+            )
+            pipe.expire(cache_key, self._ttl)
+            pipe.sadd(index_key, cache_key)
+            pipe.expire(index_key, self._ttl)
+            pipe.incr(version_key)
+            pipe.expire(version_key, self._ttl)
+            await pipe.execute()
+            return True
+
         except RedisError as e:
             logger.error(f"Redis error in store: {e}")
             return False
@@ -242,112 +418,142 @@ class SemanticCache(ISemanticCache):
         """Clear all cache entries for a tenant."""
         try:
             client = await self.pool.get_client()
-            
+            name = self._partition_name(tenant_id)
+
             # Get tenant index key
-            index_key = f"{self._index_prefix}{tenant_id}"
-            
+            index_key = f"{self._index_prefix}{name}"
+
             # Get all cache keys for this tenant
             cache_keys = await client.smembers(index_key)
-            
+
             deleted_count = 0
             if cache_keys:
                 # Delete all cache entries
                 deleted_count = await client.delete(*cache_keys)
-                
+
                 # Delete the index key itself
                 await client.delete(index_key)
-            
+
+            # Bump the version so every process drops its local copy
+            await client.incr(f"{self._version_prefix}{name}")
+            self._partition(name).apply(None, set(self._partition(name).rows), {})
             return deleted_count
-            
+
         except RedisError as e:
             logger.error(f"Redis error in clear_tenant_cache: {e}")
             return 0
 
 
 class VectorCache(IVectorCache):
-    """Vector cache for embeddings using Redis."""
+    """Vector cache for embeddings using Redis.
 
-    def __init__(self, pool: RedisConnectionPool):
-        """Initialize vector cache."""
+    Embeddings are stored as binary-encoded vectors in Redis hashes
+    (``vector:<namespace>:v2:<hash>``).  Legacy JSON entries are read transparently
+    and rewritten in the binary format on first hit.
+    """
+
+    def __init__(self, pool: RedisConnectionPool, namespace: str = "", dtype: str = "float32"):
+        """Initialize vector cache.
+
+        ``namespace`` (typically the embedding model name) scopes keys so vectors
+        from different models never collide.  ``dtype`` is ``float32`` or ``float16``
+        (half the memory, ~3 significant digits).
+        """
         self.pool = pool
-        self._cache_prefix = "vector:"
+        self.namespace = namespace
+        self.dtype = dtype
+        self._cache_prefix = f"vector:{namespace}:" if namespace else "vector:"
         self._ttl = 3600 * 24 * 7  # 7 days for vector cache
 
     def _get_cache_key(self, text: str) -> str:
-        """Generate cache key for text."""
+        """Generate legacy (JSON) cache key for text."""
         text_hash = hashlib.md5(text.encode()).hexdigest()
         return f"{self._cache_prefix}{text_hash}"
 
+    def _get_hash_key(self, text: str) -> str:
+        """Generate cache key for the binary hash entry."""
+        text_hash = hashlib.md5(text.encode()).hexdigest()
+        return f"{self._cache_prefix}v2:{text_hash}"
+
+    def _queue_store(self, pipe, text: str, embedding: Any) -> None:
+        key = self._get_hash_key(text)
+        pipe.hset(
+            key,
+            mapping={
+                "vec": encode_vector(embedding, self.dtype, self.namespace),
+                "text": text[:200],  # Store first 200 chars for reference
+                "hits": 0,
+                "created_at": datetime.utcnow().isoformat(),
+            },
+        )
+        pipe.expire(key, self._ttl)
+
     async def get_embedding(self, text: str) -> Optional[List[float]]:
         """Get cached embedding for text."""
+        found = await self.get_batch_arrays([text])
+        vector = found.get(text)
+        if vector is None:
+            return None
         try:
             client = await self.pool.get_client()
-            cache_key = self._get_cache_key(text)
-            
-            cached_data = await client.get(cache_key)
-            if cached_data:
-                data = json.loads(cached_data)
-                # Update hit count
-                data["hits"] = data.get("hits", 0) + 1
-                await client.setex(cache_key, self._ttl, json.dumps(data))
-                return data.get("embedding")
-            
-            return None
-            
+            await client.hincrby(self._get_hash_key(text), "hits", 1)
         except RedisError as e:
             logger.error(f"Redis error in get_embedding: {e}")
-            return None
+        return vector.tolist()
 
     async def store_embedding(self, text: str, embedding: List[float]) -> bool:
         """Store text embedding in cache."""
-        try:
-            client = await self.pool.get_client()
-            cache_key = self._get_cache_key(text)
-            
-            cache_data = {
-                "text": text[:200],  # Store first 200 chars for reference
-                "embedding": embedding,
-                "hits": 0,
-                "created_at": json.dumps({"timestamp": np.datetime64("now").item()}),
-            }
-            
-            return await client.setex(cache_key, self._ttl, json.dumps(cache_data))
-            
-        except RedisError as e:
-            logger.error(f"Redis error in store_embedding: {e}")
-            return False
+        return await self.store_batch_embeddings({text: embedding})
 
-    async def get_batch_embeddings(self, texts: List[str]) -> Dict[str, List[float]]:
-        """Get cached embeddings for multiple texts."""
+    async def get_batch_arrays(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Get cached embeddings as zero-copy NumPy views keyed by text."""
         try:
             client = await self.pool.get_client()
-            
-            # Prepare cache keys
-            cache_keys = [self._get_cache_key(text) for text in texts]
-            
-            # Get all values in a pipeline for efficiency
+
+            # Binary entries first, all in one pipeline
             pipe = client.pipeline()
-            for key in cache_keys:
-                pipe.get(key)
-            
+            for text in texts:
+                pipe.hget(self._get_hash_key(text), "vec")
             results = await pipe.execute()
-            
-            # Build response dictionary
-            embeddings = {}
-            for text, result in zip(texts, results):
-                if result:
+
+            embeddings: Dict[str, np.ndarray] = {}
+            for text, blob in zip(texts, results):
+                if blob:
+                    embeddings[text] = decode_vector(blob)[0]
+
+            # Fall back to legacy JSON entries for the misses and migrate them
+            missing = [t for t in texts if t not in embeddings]
+            if missing:
+                pipe = client.pipeline()
+                for text in missing:
+                    pipe.get(self._get_cache_key(text))
+                legacy = await pipe.execute()
+                migrate = client.pipeline()
+                for text, raw in zip(missing, legacy):
+                    if not raw:
+                        continue
                     try:
-                        data = json.loads(result)
-                        embeddings[text] = data.get("embedding")
-                    except json.JSONDecodeError:
+                        vector = json.loads(raw).get("embedding")
+                    except (json.JSONDecodeError, AttributeError):
                         continue
-            
+                    if vector:
+                        embeddings[text] = np.asarray(vector, dtype=np.float32)
+                        self._queue_store(migrate, text, vector)
+                        migrate.delete(self._get_cache_key(text))
+                if len(migrate):
+                    await migrate.execute()
+
             return embeddings
-            
+
         except RedisError as e:
             logger.error(f"Redis error in get_batch_embeddings: {e}")
             return {}
 
+    async def get_batch_embeddings(self, texts: List[str]) -> Dict[str, List[float]]:
+        """Get cached embeddings for multiple texts."""
+        arrays = await self.get_batch_arrays(texts)
+        return {text: vector.tolist() for text, vector in arrays.items()}
+
     async def store_batch_embeddings(self, embeddings: Dict[str, List[float]]) -> bool:
         """Store multiple text embeddings in cache."""
         try:
@@ -355,19 +561,11 @@ class VectorCache(IVectorCache):
             
             # Use pipeline for batch operations
             pipe = client.pipeline()
-            
             for text, embedding in embeddings.items():
-                cache_key = self._get_cache_key(text)
-                cache_data = {
-                    "text": text[:200],
-                    "embedding": embedding,
-                    "hits": 0,
-                    "created_at": json.dumps({"timestamp": np.datetime64("now").item()}),
-                }
-                pipe.setex(cache_key, self._ttl, json.dumps(cache_data))
-            
-            results = await pipe.execute()
-            return all(results)
+                self._queue_store(pipe, text, embedding)
+
+            await pipe.execute()
+            return True
             
         except RedisError as e:
             logger.error(f"Redis error in store_batch_embeddings: {e}")
@@ -1,3 +1,4 @@
+import asyncio
 from typing import List
 
 from sentence_transformers import SentenceTransformer
@@ -12,5 +13,9 @@ class LocalEmbedder(IEmbedder):
     def embed_query(self, text: str) -> list[float]:
         return self.model.encode([text])[0].tolist()
 
+    async def aembed_query(self, text: str) -> list[float]:
+        # Encoding is CPU-bound; keep it off the event loop
+        return await asyncio.to_thread(self.embed_query, text)
+
     def embed_batch(self, chunks: List[str]) -> List[list[float]]:
         return self.model.encode(chunks).tolist()
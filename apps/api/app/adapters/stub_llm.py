@@ -1,6 +1,6 @@
 """Stub LLM adapter for testing."""
 
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List
 
 
 class StubChat:
@@ -44,6 +44,22 @@ class StubChat:
         else:
             return f"This is a stub response to: {last_message[:50]}..."
 
+    async def achat(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """Async variant of ``chat``."""
+        return self.chat(messages, **kwargs)
+
+    def batch_chat(
+        self, conversations: List[List[Dict[str, str]]], max_concurrency: int = 4
+    ) -> List[str]:
+        """Reply to each conversation in order."""
+        return [self.chat(messages) for messages in conversations]
+
+    async def abatch_chat(
+        self, conversations: List[List[Dict[str, str]]], max_concurrency: int = 4
+    ) -> List[str]:
+        """Async variant of ``batch_chat``."""
+        return self.batch_chat(conversations, max_concurrency)
+
     def answer(self, hits: List[Dict[str, Any]], query: str, rag_only: bool = False) -> str:
         """Return a stub answer based on the query and retrieved hits."""
         if not hits:
@@ -70,6 +86,22 @@ class StubChat:
                 "actual retrieved content."
             )
 
+    async def aanswer(self, hits: List[Dict[str, Any]], query: str, rag_only: bool = False) -> str:
+        """Async variant of ``answer``."""
+        return self.answer(hits, query, rag_only)
+
+    async def astream_answer(
+        self, hits: List[Dict[str, Any]], query: str, rag_only: bool = False
+    ) -> AsyncIterator[str]:
+        """Stream the stub answer word by word."""
+        for i, word in enumerate(self.answer(hits, query, rag_only).split(" ")):
+            yield word if i == 0 else " " + word
+
+    async def astream_chat(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream the stub chat reply word by word."""
+        for i, word in enumerate(self.chat(messages).split(" ")):
+            yield word if i == 0 else " " + word
+
 
 class StubEmbedder:
     """Stub embedder for testing."""
@@ -95,3 +127,7 @@ class StubEmbedder:
         """Return a stub embedding for a query."""
         # Alias for embed_single method to match interface
         return self.embed_single(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """Async variant of ``embed_query``."""
+        return self.embed_query(query)
@@ -0,0 +1,340 @@
+"""In-process vector indexes for local/offline deployments.
+
+Vectors are L2-normalised on insert so inner products are cosine similarities.
+Each index persists to its own directory as an append-only float32 matrix plus
+an id log, which is memory-mapped on load so large tenants start instantly.
+Removed ids are tombstoned, and re-adding an id supersedes its earlier row.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_VECTORS_FILE = "vectors.f32"
+_IDS_FILE = "ids.jsonl"
+_META_FILE = "meta.json"
+_CENTROIDS_FILE = "ivf_centroids.npy"
+_ASSIGN_FILE = "ivf_assign.i32"
+_TOMBSTONES_FILE = "tombstones.txt"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Return row-normalised float32 vectors (zero rows stay zero)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class FlatIndex:
+    """Exact cosine index over a (memory-mapped) NumPy matrix."""
+
+    kind = "flat"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dim: Optional[int] = None
+        self._ids: List[str] = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        # Live row of each id and the mask of superseded/removed rows, built on first use
+        self._live: Optional[Dict[str, int]] = None
+        self._dead = np.zeros(0, dtype=bool)
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._live_rows())
+
+    def __contains__(self, item_id: str) -> bool:
+        with self._lock:
+            return item_id in self._live_rows()
+
+    def _live_rows(self) -> Dict[str, int]:
+        """Map of id to its latest row, less tombstoned rows."""
+        if self._live is None:
+            live = {item_id: row for row, item_id in enumerate(self._ids)}
+            for row in self._tombstones():
+                if row < len(self._ids) and live.get(self._ids[row]) == row:
+                    del live[self._ids[row]]
+            self._dead = np.ones(len(self._ids), dtype=bool)
+            self._dead[list(live.values())] = False
+            self._live = live
+        return self._live
+
+    # Persistence -----------------------------------------------------------
+
+    def _meta(self) -> Dict[str, object]:
+        return {"kind": self.kind, "dim": self.dim, "count": len(self._ids)}
+
+    def _load(self) -> None:
+        """Memory-map persisted vectors and ids if present."""
+        meta_path = os.path.join(self.path, _META_FILE)
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        self.dim = meta.get("dim")
+        with open(os.path.join(self.path, _IDS_FILE), "r") as f:
+            ids = [json.loads(line) for line in f if line.strip()]
+        vectors_path = os.path.join(self.path, _VECTORS_FILE)
+        count = min(len(ids), meta.get("count", len(ids)))
+        if not self.dim or count == 0:
+            return
+        # Ignore a torn trailing write: trust only rows covered by both files.
+        rows = min(count, os.path.getsize(vectors_path) // (4 * self.dim))
+        self._ids = ids[:rows]
+        if rows != len(ids) or os.path.getsize(vectors_path) != rows * 4 * self.dim:
+            self._truncate(rows)
+        if rows == 0:
+            return
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def _truncate(self, rows: int) -> None:
+        """Cut both logs back to the last fully written row."""
+        logger.warning(f"Repairing vector index at {self.path}: keeping {rows} rows")
+        with open(os.path.join(self.path, _VECTORS_FILE), "r+b") as f:
+            f.truncate(rows * 4 * self.dim)
+        with open(os.path.join(self.path, _IDS_FILE), "w") as f:
+            f.writelines(json.dumps(i) + "\n" for i in self._ids)
+
+    def _tombstones(self) -> List[int]:
+        path = os.path.join(self.path, _TOMBSTONES_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r") as f:
+            return [int(line) for line in f if line.strip().isdigit()]
+
+    def _append_files(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        with open(os.path.join(self.path, _VECTORS_FILE), "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype="<f4").tobytes())
+        with open(os.path.join(self.path, _IDS_FILE), "a") as f:
+            f.writelines(json.dumps(i) + "\n" for i in ids)
+        tmp = os.path.join(self.path, _META_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._meta(), f)
+        os.replace(tmp, os.path.join(self.path, _META_FILE))
+
+    def _remap(self) -> None:
+        rows = len(self._ids)
+        self._vectors = np.memmap(
+            os.path.join(self.path, _VECTORS_FILE),
+            dtype=np.float32,
+            mode="r",
+            shape=(rows, self.dim),
+        )
+
+    # Index API -------------------------------------------------------------
+
+    def add(self, ids: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Append vectors to the index and persist them incrementally."""
+        if not ids:
+            return
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(matrix.shape[1])
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(
+                    f"Embedding dimension {matrix.shape[1]} does not match index dimension "
+                    f"{self.dim}"
+                )
+            live = self._live_rows()
+            start = len(self._ids)
+            self._ids.extend(ids)
+            self._dead = np.concatenate([self._dead, np.zeros(len(ids), dtype=bool)])
+            for row, item_id in enumerate(ids, start):
+                previous = live.get(item_id)
+                if previous is not None:
+                    self._dead[previous] = True  # Superseded by the new vector
+                live[item_id] = row
+            self._append_files(ids, matrix)
+            self._remap()
+            self._on_added(len(self._ids) - len(ids), matrix)
+
+    def remove(self, ids: Sequence[str]) -> int:
+        """Tombstone ids so searches skip them; returns how many were present."""
+        with self._lock:
+            live = self._live_rows()
+            rows = [live.pop(item_id) for item_id in ids if item_id in live]
+            if rows:
+                self._dead[rows] = True
+                with open(os.path.join(self.path, _TOMBSTONES_FILE), "a") as f:
+                    f.writelines(f"{row}\n" for row in rows)
+            return len(rows)
+
+    def _on_added(self, start_row: int, matrix: np.ndarray) -> None:
+        """Hook for subclasses maintaining auxiliary structures."""
+
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Rows to score for a query; None means score every row."""
+        return None
+
+    def search(self, query_vector: Sequence[float], k: int = 5) -> List[Tuple[str, float]]:
+        """Return up to k (id, cosine score) pairs, best first."""
+        with self._lock:
+            if not self._live_rows() or self.dim is None:
+                return []
+            query = _normalize(np.asarray(query_vector, dtype=np.float32))[0]
+            if query.shape[0] != self.dim:
+                raise ValueError(
+                    f"Query dimension {query.shape[0]} does not match index dimension {self.dim}"
+                )
+            rows = self._candidate_rows(query)
+            matrix = self._vectors if rows is None else self._vectors[rows]
+            if matrix.shape[0] == 0:
+                return []
+            scores = matrix @ query
+            dead = self._dead if rows is None else self._dead[rows]
+            k = min(k, scores.shape[0] - int(dead.sum()))
+            if k <= 0:
+                return []
+            scores[dead] = -np.inf  # Superseded and removed rows never rank
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            if rows is not None:
+                return [(self._ids[rows[i]], float(scores[i])) for i in top]
+            return [(self._ids[i], float(scores[i])) for i in top]
+
+
+class IVFFlatIndex(FlatIndex):
+    """Inverted-file index: k-means coarse quantiser over exact flat lists.
+
+    Searches score only the ``nprobe`` closest lists.  Until the index holds
+    enough vectors to train ``nlist`` centroids it behaves like ``FlatIndex``.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, path: str, nlist: int = 256, nprobe: int = 8, train_size: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        # Need a reasonable number of points per centroid before training.
+        self.train_size = train_size or nlist * 39
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._lists: Dict[int, np.ndarray] = {}
+        super().__init__(path)
+
+    def _load(self) -> None:
+        super()._load()
+        centroids_path = os.path.join(self.path, _CENTROIDS_FILE)
+        assign_path = os.path.join(self.path, _ASSIGN_FILE)
+        if os.path.exists(centroids_path) and os.path.exists(assign_path):
+            self._centroids = np.load(centroids_path)
+            assign = np.fromfile(assign_path, dtype="<i4")
+            if assign.shape[0] >= len(self._ids):
+                self._assign = assign[: len(self._ids)]
+                self._rebuild_lists()
+            else:
+                # Assignment log lags the vectors (crash mid-write); retrain.
+                self._centroids = None
+
+    def _rebuild_lists(self) -> None:
+        order = np.argsort(self._assign, kind="stable")
+        bounds = np.searchsorted(self._assign[order], np.arange(len(self._centroids) + 1))
+        self._lists = {
+            c: order[bounds[c] : bounds[c + 1]]
+            for c in range(len(self._centroids))
+            if bounds[c + 1] > bounds[c]
+        }
+
+    def _assign_rows(self, matrix: np.ndarray) -> np.ndarray:
+        return np.argmax(matrix @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _train(self, iterations: int = 10) -> None:
+        rng = np.random.default_rng(0)
+        total = len(self._ids)
+        sample_size = min(total, self.nlist * 256)
+        sample = np.asarray(self._vectors[rng.choice(total, sample_size, replace=False)])
+        centroids = sample[rng.choice(sample_size, self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(self.nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        self._centroids = centroids
+        np.save(os.path.join(self.path, _CENTROIDS_FILE), centroids)
+        self._assign = np.concatenate(
+            [
+                self._assign_rows(np.asarray(self._vectors[i : i + 65536]))
+                for i in range(0, total, 65536)
+            ]
+        )
+        self._assign.astype("<i4").tofile(os.path.join(self.path, _ASSIGN_FILE))
+        self._rebuild_lists()
+        logger.info(f"Trained IVF index at {self.path}: {total} vectors, {self.nlist} lists")
+
+    def _on_added(self, start_row: int, matrix: np.ndarray) -> None:
+        if self._centroids is None:
+            if len(self._ids) >= self.train_size:
+                self._train()
+            return
+        labels = self._assign_rows(matrix)
+        with open(os.path.join(self.path, _ASSIGN_FILE), "ab") as f:
+            f.write(labels.astype("<i4").tobytes())
+        self._assign = np.concatenate([self._assign, labels])
+        rows = np.arange(start_row, start_row + len(labels))
+        for c in np.unique(labels):
+            existing = self._lists.get(int(c), np.zeros(0, dtype=np.int64))
+            self._lists[int(c)] = np.concatenate([existing, rows[labels == c]])
+
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        if self._centroids is None:
+            return None
+        probes = np.argsort(-(self._centroids @ query))[: self.nprobe]
+        lists = [self._lists[int(c)] for c in probes if int(c) in self._lists]
+        if not lists:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate(lists))
+
+
+class TenantVectorIndexes:
+    """Registry holding one lazily-loaded vector index per tenant."""
+
+    def __init__(self, base_dir: str, index_type: str = "flat", nlist: int = 256, nprobe: int = 8):
+        self.base_dir = base_dir
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._indexes: Dict[str, FlatIndex] = {}
+        self._lock = threading.Lock()
+
+    def _tenant_path(self, tenant_id: str) -> str:
+        # Sanitising is lossy ("a/b" and "a_b"), so a hash of the raw id keeps paths distinct
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", tenant_id) or "_"
+        digest = hashlib.sha1(tenant_id.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.base_dir, f"{safe}-{digest}")
+
+    def exists(self, tenant_id: str) -> bool:
+        """Whether the tenant has a persisted index."""
+        index = self._indexes.get(tenant_id)
+        if index is not None and len(index):
+            return True
+        return os.path.exists(os.path.join(self._tenant_path(tenant_id), _META_FILE))
+
+    def get(self, tenant_id: str) -> FlatIndex:
+        """Get (loading or creating) the tenant's index."""
+        with self._lock:
+            index = self._indexes.get(tenant_id)
+            if index is None:
+                path = self._tenant_path(tenant_id)
+                if self.index_type == "ivf":
+                    index = IVFFlatIndex(path, nlist=self.nlist, nprobe=self.nprobe)
+                else:
+                    index = FlatIndex(path)
+                self._indexes[tenant_id] = index
+            return index
@@ -1,8 +1,8 @@
 """Configuration settings for the Living Twin API."""
 
 import os
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 
 from pydantic_settings import BaseSettings
 
@@ -111,6 +111,11 @@ class Neo4jCfg:
     password: str
     database: str
     vector_index: str
+    max_connections: int = 50
+    write_batch_size: int = 500  # chunks per UNWIND statement on ingest
+    search_growth_factor: int = 4  # over-fetch multiplier per tenant-filtered search round
+    search_max_candidates: int = 1000
+    fulltext_index: str = "doc_text"  # full-text index over Doc.text for hybrid search
 
 
 @dataclass
@@ -118,6 +123,9 @@ class OpenAICfg:
     chat_model: str
     embedding_model: str
     embedding_dimensions: int
+    embed_batch_tokens: int = 100_000  # token budget per embeddings request
+    embed_batch_size: int = 512  # max inputs per embeddings request
+    embed_concurrency: int = 4  # concurrent embeddings requests
 
 
 @dataclass
@@ -147,6 +155,74 @@ class AppCfg:
     embedding_dimensions: int
     async_ingest: bool
 
+    # Ollama runtime: keep the model resident and match the server's parallelism
+    ollama_num_ctx: Optional[int] = None  # model default when unset
+    ollama_keep_alive: str = "30m"
+    ollama_num_parallel: int = 4  # should equal the server's OLLAMA_NUM_PARALLEL
+    ollama_timeout: float = 120.0
+
+    # Local vector index for the mock store: "flat" (exact) | "ivf" (approximate)
+    local_vector_index: str = "flat"
+    local_ivf_nlist: int = 256
+    local_ivf_nprobe: int = 8
+
+    # Redis (optional) and the read-through embedding cache
+    redis_url: Optional[str] = None
+    redis_max_connections: int = 50
+    embedding_cache: bool = False
+    embedding_cache_size: int = 10_000  # in-process LRU entries
+    answer_cache: bool = False  # semantic answer cache (requires Redis)
+    answer_cache_threshold: float = 0.95  # min cosine similarity to reuse an answer
+
+    # Retrieval: "hybrid" fuses keyword (BM25/full-text) and vector rankings
+    retrieval_mode: str = "hybrid"  # "hybrid" | "vector"
+    hybrid_rrf_k: int = 60
+    hybrid_keyword_weight: float = 1.0  # keyword ranking weight relative to vector
+    reranker_model: Optional[str] = None  # cross-encoder; reranking is off when unset
+    rerank_candidates: int = 20  # hits fetched for the reranker to choose the best k from
+    rerank_batch_size: int = 32
+
+    # Prompt context: retrieved passages are merged, de-duplicated and packed into
+    # a token budget, which can be overridden per chat model
+    context_max_tokens: int = 3000
+    context_model_budgets: Dict[str, int] = field(default_factory=dict)
+
+    def context_budget(self, model: Optional[str]) -> int:
+        """Token budget for retrieved context sent to ``model``."""
+        return self.context_model_budgets.get(model or "", self.context_max_tokens)
+
+    # Conversations: persist each turn in the background after responding, and fold
+    # older messages into a rolling summary every few turns (opt-in; 0 disables summaries)
+    defer_conversation_writes: bool = False
+    conversation_summary_turns: int = 0
+    conversation_recent_messages: int = 4  # kept verbatim next to the summary
+    conversation_summary_tokens: int = 200
+    conversation_message_tokens: int = 256  # per history message in query and prompt
+    # Follow-ups are retrieved with a standalone rewrite of the question
+    query_rewrite: str = "heuristic"  # "llm" | "heuristic" | "off"
+    query_rewrite_cache_size: int = 10_000
+
+    # Ingest chunking, sized in embedding-model tokens
+    chunk_tokens: int = 256
+    chunk_overlap_tokens: int = 32
+    ingest_window_chunks: int = 256  # chunks embedded and stored per round trip
+    extract_workers: int = 2  # processes extracting text from large PDFs
+    extract_parallel_pages: int = 32  # PDFs with fewer pages are extracted in-process
+
+    # Pipelined batch ingest of server-side document trees
+    batch_ingest_root: Optional[str] = None  # /query/ingest/batch is disabled when unset
+    batch_ingest_workers: int = 2  # threads per pipeline stage
+    batch_ingest_max_running: int = 2
+
+    # Async ingest worker pool (used when async_ingest is enabled)
+    ingest_workers: int = 4
+    ingest_queue_size: int = 1000  # pending jobs before ingest requests get 503
+    ingest_max_attempts: int = 3
+    ingest_lease_seconds: int = 60  # jobs whose worker stops renewing are re-run
+    # Queued ingest text is stored outside the job record: in this GCS bucket if set,
+    # otherwise under local_data_dir (durable job repo) or in memory
+    ingest_payload_bucket: Optional[str] = None
+
 
 def _env_bool(name: str, default: bool = False) -> bool:
     val = os.getenv(name)
@@ -155,6 +231,16 @@ def _env_bool(name: str, default: bool = False) -> bool:
     return val.lower() in ("1", "true", "yes", "on")
 
 
+def _env_budgets(name: str) -> Dict[str, int]:
+    """Parse ``model=tokens,model=tokens`` into a dict."""
+    budgets = {}
+    for item in os.getenv(name, "").split(","):
+        model, sep, tokens = item.partition("=")
+        if sep and model.strip() and tokens.strip().isdigit():
+            budgets[model.strip()] = int(tokens)
+    return budgets
+
+
 def load_config() -> AppCfg:
     """Build the application configuration expected by DI and FastAPI app."""
     # Use Settings for base values
@@ -166,12 +252,20 @@ def load_config() -> AppCfg:
         password=s.neo4j_password,
         database=s.neo4j_database,
         vector_index=s.vector_index_name,
+        max_connections=int(os.getenv("NEO4J_MAX_CONNECTIONS", "50")),
+        write_batch_size=int(os.getenv("NEO4J_WRITE_BATCH_SIZE", "500")),
+        search_growth_factor=int(os.getenv("NEO4J_SEARCH_GROWTH_FACTOR", "4")),
+        search_max_candidates=int(os.getenv("NEO4J_SEARCH_MAX_CANDIDATES", "1000")),
+        fulltext_index=os.getenv("NEO4J_FULLTEXT_INDEX", "doc_text"),
     )
 
     openai = OpenAICfg(
         chat_model=s.openai_model,
         embedding_model=s.openai_embedding_model,
         embedding_dimensions=int(os.getenv("OPENAI_EMBEDDING_DIMENSIONS", "1536")),
+        embed_batch_tokens=int(os.getenv("OPENAI_EMBED_BATCH_TOKENS", "100000")),
+        embed_batch_size=int(os.getenv("OPENAI_EMBED_BATCH_SIZE", "512")),
+        embed_concurrency=int(os.getenv("OPENAI_EMBED_CONCURRENCY", "4")),
     )
 
     local = LocalCfg(
@@ -208,4 +302,45 @@ def load_config() -> AppCfg:
         ollama_model=s.ollama_model,
         embedding_dimensions=active_dims,
         async_ingest=async_ingest,
+        ollama_num_ctx=int(os.getenv("OLLAMA_NUM_CTX", "0")) or None,
+        ollama_keep_alive=os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+        ollama_num_parallel=int(os.getenv("OLLAMA_NUM_PARALLEL", "4")),
+        ollama_timeout=float(os.getenv("OLLAMA_TIMEOUT", "120")),
+        local_vector_index=os.getenv("LOCAL_VECTOR_INDEX", "flat").lower(),
+        local_ivf_nlist=int(os.getenv("LOCAL_IVF_NLIST", "256")),
+        local_ivf_nprobe=int(os.getenv("LOCAL_IVF_NPROBE", "8")),
+        redis_url=os.getenv("REDIS_URL") or None,
+        redis_max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+        embedding_cache=_env_bool("EMBEDDING_CACHE", default=False),
+        embedding_cache_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+        answer_cache=_env_bool("ANSWER_CACHE", default=False),
+        answer_cache_threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+        retrieval_mode=os.getenv("RETRIEVAL_MODE", "hybrid").lower(),
+        hybrid_rrf_k=int(os.getenv("HYBRID_RRF_K", "60")),
+        hybrid_keyword_weight=float(os.getenv("HYBRID_KEYWORD_WEIGHT", "1.0")),
+        reranker_model=os.getenv("RERANKER_MODEL") or None,
+        rerank_candidates=int(os.getenv("RERANK_CANDIDATES", "20")),
+        rerank_batch_size=int(os.getenv("RERANK_BATCH_SIZE", "32")),
+        context_max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "3000")),
+        context_model_budgets=_env_budgets("CONTEXT_MODEL_BUDGETS"),
+        defer_conversation_writes=_env_bool("DEFER_CONVERSATION_WRITES", default=False),
+        conversation_summary_turns=int(os.getenv("CONVERSATION_SUMMARY_TURNS", "0")),
+        conversation_recent_messages=int(os.getenv("CONVERSATION_RECENT_MESSAGES", "4")),
+        conversation_summary_tokens=int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "200")),
+        conversation_message_tokens=int(os.getenv("CONVERSATION_MESSAGE_TOKENS", "256")),
+        query_rewrite=os.getenv("QUERY_REWRITE", "heuristic").lower(),
+        query_rewrite_cache_size=int(os.getenv("QUERY_REWRITE_CACHE_SIZE", "10000")),
+        chunk_tokens=int(os.getenv("CHUNK_TOKENS", "256")),
+        chunk_overlap_tokens=int(os.getenv("CHUNK_OVERLAP_TOKENS", "32")),
+        ingest_window_chunks=int(os.getenv("INGEST_WINDOW_CHUNKS", "256")),
+        extract_workers=int(os.getenv("EXTRACT_WORKERS", "2")),
+        extract_parallel_pages=int(os.getenv("EXTRACT_PARALLEL_PAGES", "32")),
+        batch_ingest_root=os.getenv("BATCH_INGEST_ROOT") or None,
+        batch_ingest_workers=int(os.getenv("BATCH_INGEST_WORKERS", "2")),
+        batch_ingest_max_running=int(os.getenv("BATCH_INGEST_MAX_RUNNING", "2")),
+        ingest_workers=int(os.getenv("INGEST_WORKERS", "4")),
+        ingest_queue_size=int(os.getenv("INGEST_QUEUE_SIZE", "1000")),
+        ingest_max_attempts=int(os.getenv("INGEST_MAX_ATTEMPTS", "3")),
+        ingest_lease_seconds=int(os.getenv("INGEST_LEASE_SECONDS", "60")),
+        ingest_payload_bucket=os.getenv("INGEST_PAYLOAD_BUCKET") or None,
     )
@@ -1,16 +1,33 @@
+import logging
+
+from .adapters.answer_cache import SemanticAnswerCache
+from .adapters.background_loop import BackgroundLoop
+from .adapters.batch_ingest import BatchIngestPipeline
+from .adapters.caching_embedder import CachingEmbedder
+from .adapters.document_extractor import DocumentExtractor
 from .adapters.firebase_auth import FirebaseAuth, SimpleAuthorizer
 from .adapters.ingest_job_repo import FirestoreIngestJobRepo, InMemoryIngestJobRepo
+from .adapters.ingest_payloads import GCSIngestPayloadStore
+from .adapters.ingest_queue import IngestWorkerPool
 from .adapters.mock_store import MockConversationStore, MockStore
 from .adapters.neo4j_conversation_store import Neo4jConversationStore
+from .adapters.neo4j_pool import Neo4jConnectionPool
 from .adapters.neo4j_store import Neo4jStore
 from .adapters.ollama_llm import OllamaChat
 from .adapters.openai_llm import OpenAIChat, OpenAIEmbedder
 from .adapters.pubsub_bus import PubSubBusAdapter
+from .adapters.redis_cache import RedisConnectionPool, SemanticCache, VectorCache
 from .adapters.sbert_embedder import LocalEmbedder
 from .adapters.stub_llm import StubChat, StubEmbedder
 from .config import AppCfg
+from .domain.chunking import TokenChunker
+from .domain.context_builder import ContextBuilder
 from .domain.conversational_service import ConversationalRagService
+from .domain.query_rewriter import QueryRewriter
 from .domain.services import DocumentService, RagService, TenantService
+from .domain.summarizer import ConversationSummarizer
+
+logger = logging.getLogger(__name__)
 
 
 class Container:
@@ -23,19 +40,67 @@ class Container:
 
         # Store selection based on configuration
         if cfg.use_local_mock:
-            self.store = MockStore(cfg.local_data_dir)
+            self.store = MockStore(
+                cfg.local_data_dir,
+                index_type=cfg.local_vector_index,
+                ivf_nlist=cfg.local_ivf_nlist,
+                ivf_nprobe=cfg.local_ivf_nprobe,
+                rrf_k=cfg.hybrid_rrf_k,
+                keyword_weight=cfg.hybrid_keyword_weight,
+            )
             self.conversation_store = MockConversationStore(cfg.local_data_dir)
         else:
-            self.store = Neo4jStore(cfg.neo4j)
-            self.conversation_store = Neo4jConversationStore(cfg.neo4j)
+            self.neo4j_pool = Neo4jConnectionPool(
+                cfg.neo4j.uri,
+                cfg.neo4j.user,
+                cfg.neo4j.password,
+                database=cfg.neo4j.database,
+                max_connections=cfg.neo4j.max_connections,
+            )
+            self.store = Neo4jStore(
+                cfg.neo4j,
+                pool=self.neo4j_pool,
+                rrf_k=cfg.hybrid_rrf_k,
+                keyword_weight=cfg.hybrid_keyword_weight,
+            )
+            self.conversation_store = Neo4jConversationStore(cfg.neo4j, driver=self.store.driver)
+
+        # Redis (optional): shared by caches; sync callers reach it via cache_loop
+        if cfg.redis_url:
+            self.redis_pool = RedisConnectionPool(
+                cfg.redis_url, max_connections=cfg.redis_max_connections
+            )
+            self.cache_loop = BackgroundLoop("cache-loop")
 
         # Embedder selection
         if cfg.llm_provider == "stub":
             self.embedder = StubEmbedder("stub")
+            embedding_model = "stub"
         elif cfg.local_embeddings:
             self.embedder = LocalEmbedder(cfg.local.model)
+            embedding_model = cfg.local.model
         else:
-            self.embedder = OpenAIEmbedder(cfg.openai.embedding_model)
+            embedding_model = cfg.openai.embedding_model
+            self.embedder = OpenAIEmbedder(
+                cfg.openai.embedding_model,
+                max_batch_tokens=cfg.openai.embed_batch_tokens,
+                max_batch_size=cfg.openai.embed_batch_size,
+                max_concurrency=cfg.openai.embed_concurrency,
+            )
+
+        # Read-through embedding cache (in-process LRU, then Redis if configured)
+        if cfg.embedding_cache:
+            self.embedder = CachingEmbedder(
+                self.embedder,
+                embedding_model,
+                vector_cache=(
+                    VectorCache(self.redis_pool, namespace=embedding_model)
+                    if cfg.redis_url
+                    else None
+                ),
+                loop=getattr(self, "cache_loop", None),
+                max_entries=cfg.embedding_cache_size,
+            )
 
         # Jobs repository (durable if FIREBASE_PROJECT_ID provided)
         import os
@@ -48,12 +113,20 @@ class Container:
         # LLM selection
         if cfg.llm_provider == "stub":
             self.llm = StubChat("stub")
-        elif cfg.llm_provider == "openai":
-            self.llm = OpenAIChat(cfg.openai.chat_model)
+            chat_model = "stub"
         elif cfg.llm_provider == "ollama":
-            self.llm = OllamaChat(cfg.ollama_base, cfg.ollama_model)
+            self.llm = OllamaChat(
+                cfg.ollama_base,
+                cfg.ollama_model,
+                num_ctx=cfg.ollama_num_ctx,
+                keep_alive=cfg.ollama_keep_alive,
+                max_parallel=cfg.ollama_num_parallel,
+                timeout=cfg.ollama_timeout,
+            )
+            chat_model = cfg.ollama_model
         else:
             self.llm = OpenAIChat(cfg.openai.chat_model)
+            chat_model = cfg.openai.chat_model
 
         # Domain services (pure business logic)
         # Ensure vector index at startup if requested (only for Neo4j)
@@ -70,21 +143,123 @@ class Container:
                     dimensions=cfg.embedding_dimensions,
                     similarity="cosine",
                 )
+                if cfg.retrieval_mode == "hybrid":
+                    self.store.ensure_fulltext_index(label="Doc", property_name="text")
+                self.conversation_store.ensure_indexes()
             except Exception:
                 # Do not block startup on index ensure
                 pass
 
+        # Semantic answer cache (opt-in, Redis-backed)
+        self.answer_cache = None
+        if cfg.answer_cache:
+            if cfg.redis_url:
+                self.answer_cache = SemanticAnswerCache(
+                    SemanticCache(self.redis_pool, embedding_dimensions=cfg.embedding_dimensions),
+                    self.cache_loop,
+                    threshold=cfg.answer_cache_threshold,
+                )
+            else:
+                logger.warning("ANSWER_CACHE is enabled but REDIS_URL is not set; disabling it")
+
+        # Cross-encoder reranking (opt-in); the model loads once at startup
+        self.reranker = None
+        if cfg.reranker_model:
+            try:
+                from .adapters.cross_encoder_reranker import CrossEncoderReranker
+
+                self.reranker = CrossEncoderReranker(
+                    cfg.reranker_model, batch_size=cfg.rerank_batch_size
+                )
+            except Exception as e:
+                logger.warning(f"Failed to load reranker {cfg.reranker_model}; disabling it: {e}")
+
+        self.extractor = DocumentExtractor(
+            max_workers=cfg.extract_workers, parallel_min_pages=cfg.extract_parallel_pages
+        )
+        # Retrieved passages are packed into the chat model's context budget
+        self.context_builder = ContextBuilder(cfg.context_budget(chat_model), chat_model)
         self.rag = RagService(
-            self.store, self.llm, self.embedder, rag_only=cfg.rag_only or cfg.llm_provider == "stub"
+            self.store,
+            self.llm,
+            self.embedder,
+            rag_only=cfg.rag_only or cfg.llm_provider == "stub",
+            answer_cache=self.answer_cache,
+            chunker=TokenChunker(cfg.chunk_tokens, cfg.chunk_overlap_tokens, embedding_model),
+            ingest_window=cfg.ingest_window_chunks,
+            extractor=self.extractor,
+            hybrid=cfg.retrieval_mode == "hybrid",
+            reranker=self.reranker,
+            rerank_candidates=cfg.rerank_candidates,
+            context_builder=self.context_builder,
         )
+        # Rolling conversation summaries need a real LLM
+        conversation_rag_only = cfg.rag_only or cfg.llm_provider == "stub"
+        self.summarizer = None
+        if cfg.conversation_summary_turns > 0 and not conversation_rag_only:
+            self.summarizer = ConversationSummarizer(
+                self.llm,
+                every_n_turns=cfg.conversation_summary_turns,
+                keep_recent_messages=cfg.conversation_recent_messages,
+                max_tokens=cfg.conversation_summary_tokens,
+                model=chat_model,
+            )
+        self.query_rewriter = None
+        if cfg.query_rewrite in ("llm", "heuristic"):
+            self.query_rewriter = QueryRewriter(
+                None if conversation_rag_only else self.llm,
+                mode=cfg.query_rewrite,
+                max_entries=cfg.query_rewrite_cache_size,
+            )
         self.conversational_rag = ConversationalRagService(
             self.store,
             self.llm,
             self.embedder,
             self.conversation_store,
-            rag_only=cfg.rag_only or cfg.llm_provider == "stub",
+            rag_only=conversation_rag_only,
+            answer_cache=self.answer_cache,
+            hybrid=cfg.retrieval_mode == "hybrid",
+            reranker=self.reranker,
+            rerank_candidates=cfg.rerank_candidates,
+            context_builder=self.context_builder,
+            defer_persistence=cfg.defer_conversation_writes,
+            summarizer=self.summarizer,
+            history_message_tokens=cfg.conversation_message_tokens,
+            rewriter=self.query_rewriter,
         )
         self.document_service = DocumentService(self.store)
+        self.batch_ingest = BatchIngestPipeline(
+            self.rag,
+            self.jobs,
+            workers=cfg.batch_ingest_workers,
+            max_running=cfg.batch_ingest_max_running,
+        )
+
+        # Firestore jobs are shared by every instance, so their queued text must be too (GCS)
+        ingest_payloads = None  # in memory: lost on restart, like the in-memory jobs
+        if cfg.ingest_payload_bucket:
+            ingest_payloads = GCSIngestPayloadStore(cfg.ingest_payload_bucket)
+        elif project_id:
+            logger.error(
+                "INGEST_PAYLOAD_BUCKET is not set; queued ingest text is kept in memory "
+                "and jobs re-queued after a restart will fail"
+            )
+
+        # Bounded ingest worker pool; started/stopped with the application
+        self.ingest_pool = (
+            IngestWorkerPool(
+                self.jobs,
+                self.rag,
+                event_bus=self.event_bus,
+                workers=cfg.ingest_workers,
+                max_queue_size=cfg.ingest_queue_size,
+                max_attempts=cfg.ingest_max_attempts,
+                lease_seconds=cfg.ingest_lease_seconds,
+                payloads=ingest_payloads,
+            )
+            if cfg.async_ingest
+            else None
+        )
         self.tenant_service = TenantService()
 
 
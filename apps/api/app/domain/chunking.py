@@ -0,0 +1,133 @@
+"""Streaming, sentence-aware text chunking sized in tokens.
+
+Shared by the API ingest path and the CLI ingest script.  Text is consumed as an
+iterable of pieces (e.g. file blocks) and chunks are yielded as soon as they are
+complete, so memory stays proportional to one chunk rather than the whole document.
+"""
+
+import hashlib
+import re
+import unicodedata
+from collections import deque
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+from .tokens import CHARS_PER_TOKEN, get_token_counter, split_by_tokens
+
+# A segment ends after sentence punctuation (plus closing quotes/brackets) followed
+# by whitespace, or at a paragraph break.
+_BOUNDARY = re.compile(r"[.!?][\"')\]]*\s+|\n\s*\n\s*")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for content hashes (Unicode NFC, collapsed whitespace)."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def chunk_id(tenant_id: str, text: str) -> str:
+    """Content-addressed chunk id: identical text in a tenant always maps to one chunk."""
+    return hashlib.sha256(f"{tenant_id}\0{normalize_text(text)}".encode()).hexdigest()
+
+
+def iter_file_text(path: str, block_size: int = 1 << 20, encoding: str = "utf-8") -> Iterator[str]:
+    """Yield a text file in blocks of ``block_size`` characters."""
+    with open(path, "r", encoding=encoding, errors="replace") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+class TokenChunker:
+    """Packs whole sentences into chunks of at most ``max_tokens`` tokens.
+
+    Consecutive chunks share up to ``overlap_tokens`` of trailing sentences.  A
+    sentence longer than ``max_tokens`` on its own is hard-split on token
+    boundaries.  Tokens are counted with the tokenizer for ``model`` when available,
+    otherwise estimated from character counts.
+    """
+
+    def __init__(
+        self, max_tokens: int = 256, overlap_tokens: int = 32, model: Optional[str] = None
+    ):
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        if not 0 <= overlap_tokens < max_tokens:
+            raise ValueError("overlap_tokens must be >= 0 and smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.model = model
+        self.count = get_token_counter(model)
+        # Flush unterminated text past this size so a boundary-free stream stays bounded
+        self._max_pending_chars = max_tokens * CHARS_PER_TOKEN * 4
+
+    def chunk(self, text: str) -> List[str]:
+        """Chunk a complete text."""
+        return list(self.chunk_stream([text]))
+
+    def chunk_stream(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Lazily chunk text arriving as consecutive ``pieces``."""
+        return (text for text, _, _ in self.chunk_spans(pieces))
+
+    def chunk_spans(self, pieces: Iterable[str]) -> Iterator[Tuple[str, int, int]]:
+        """Like ``chunk_stream``, with each chunk's [start, end) offsets in the stream."""
+        return self._pack(self._segments(pieces))
+
+    def _segments(self, pieces: Iterable[str]) -> Iterator[Tuple[str, int]]:
+        """Yield (segment, offset) pairs, buffering only the unterminated tail."""
+        pending = ""
+        offset = 0  # Stream offset of pending[0]
+        for piece in pieces:
+            pending += piece
+            start = 0
+            for match in _BOUNDARY.finditer(pending):
+                if match.end() == len(pending):
+                    break  # The boundary may continue in the next piece
+                yield pending[start : match.end()], offset + start
+                start = match.end()
+            while len(pending) - start > self._max_pending_chars:
+                limit = start + self._max_pending_chars
+                cut = pending.rfind(" ", start, limit) + 1 or limit
+                yield pending[start:cut], offset + start
+                start = cut
+            pending = pending[start:]
+            offset += start
+        if pending:
+            yield pending, offset
+
+    def _split_long(self, segment: str, offset: int) -> Iterator[Tuple[str, int, int]]:
+        n = self.count(segment)
+        if n <= self.max_tokens:
+            yield segment, n, offset
+            return
+        for part in split_by_tokens(segment, self.max_tokens, self.model):
+            yield part, min(self.count(part), self.max_tokens), offset
+            offset += len(part)
+
+    def _pack(self, segments: Iterable[Tuple[str, int]]) -> Iterator[Tuple[str, int, int]]:
+        window: Deque[Tuple[str, int, int]] = deque()
+        total = 0
+        fresh = False  # Whether the window holds text not yet emitted
+        for segment, offset in segments:
+            if not segment.strip():
+                continue
+            for text, n, start in self._split_long(segment, offset):
+                if window and total + n > self.max_tokens:
+                    if fresh:
+                        yield self._join(window)
+                        fresh = False
+                    # Keep trailing segments as overlap, as long as the next one still fits
+                    while window and (total > self.overlap_tokens or total + n > self.max_tokens):
+                        total -= window.popleft()[1]
+                window.append((text, n, start))
+                total += n
+                fresh = True
+        if fresh:
+            yield self._join(window)
+
+    @staticmethod
+    def _join(window: Deque[Tuple[str, int, int]]) -> Tuple[str, int, int]:
+        raw = "".join(text for text, _, _ in window)
+        text = raw.strip()
+        start = window[0][2] + len(raw) - len(raw.lstrip())
+        return text, start, start + len(text)
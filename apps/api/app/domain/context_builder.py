@@ -0,0 +1,178 @@
+"""Prompt context assembly: merge overlapping chunks, drop duplicates, pack to a budget."""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from .chunking import normalize_text
+from .tokens import get_token_counter, split_by_tokens
+
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s")
+
+
+@dataclass
+class PromptContext:
+    """Hits to put in the prompt, with what was merged or dropped along the way."""
+
+    hits: List[Dict[str, Any]]
+    tokens: int
+    budget: int
+    dropped: List[Dict[str, Any]] = field(default_factory=list)  # {"id", "reason", ...}
+
+    def debug_info(self) -> Dict[str, Any]:
+        return {"tokens": self.tokens, "budget": self.budget, "dropped": self.dropped}
+
+
+class ContextBuilder:
+    """Turns ranked search hits into a token-budgeted prompt context.
+
+    1. Chunks from the same source whose text overlaps (consecutive chunks share
+       their chunker overlap) are merged into one passage, so it is sent once.
+    2. Near-duplicates (contained in, or ``duplicate_threshold`` Jaccard-similar
+       to, a better-ranked passage) are dropped.
+    3. Passages are packed in rank order into ``max_tokens``.  One that does not
+       fit is cut at a sentence boundary if at least ``min_fragment_tokens``
+       remain; otherwise it is dropped.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 3000,
+        model: Optional[str] = None,
+        duplicate_threshold: float = 0.85,
+        min_overlap_chars: int = 20,
+        min_fragment_tokens: int = 48,
+    ):
+        self.max_tokens = max_tokens
+        self.model = model
+        self.duplicate_threshold = duplicate_threshold
+        self.min_overlap_chars = min_overlap_chars
+        self.min_fragment_tokens = min_fragment_tokens
+        self.count = get_token_counter(model)
+
+    def build(self, hits: List[Dict[str, Any]]) -> PromptContext:
+        dropped: List[Dict[str, Any]] = []
+        passages = self._dedupe(self._merge_overlaps(hits, dropped), dropped)
+        return self._pack(passages, dropped)
+
+    # Merging -----------------------------------------------------------------
+
+    def _merge_overlaps(
+        self, hits: List[Dict[str, Any]], dropped: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        passages: List[Dict[str, Any]] = []
+        for hit in hits:
+            text = hit.get("text", "").strip()
+            for passage in passages:
+                if passage.get("source") != hit.get("source"):
+                    continue
+                merged = self._join_overlapping(passage["text"], text)
+                if merged is None:
+                    continue
+                passage["text"] = merged
+                passage.setdefault("merged_ids", []).append(hit.get("id"))
+                self._widen_pages(passage, hit)
+                dropped.append({"id": hit.get("id"), "reason": "merged", "into": passage["id"]})
+                break
+            else:
+                passages.append({**hit, "text": text})
+        return passages
+
+    def _join_overlapping(self, a: str, b: str) -> Optional[str]:
+        """``a`` and ``b`` joined on their shared edge, or None if they do not overlap."""
+        for first, second in ((a, b), (b, a)):
+            overlap = self._overlap(first, second)
+            if overlap:
+                return first + second[overlap:]
+        return None
+
+    def _overlap(self, first: str, second: str) -> int:
+        """Length of the longest suffix of ``first`` that is a prefix of ``second``."""
+        if len(second) < self.min_overlap_chars:
+            return 0
+        probe = second[: self.min_overlap_chars]
+        start = first.find(probe)
+        while start != -1:
+            if second.startswith(first[start:]):
+                return len(first) - start
+            start = first.find(probe, start + 1)
+        return 0
+
+    @staticmethod
+    def _widen_pages(passage: Dict[str, Any], hit: Dict[str, Any]) -> None:
+        if passage.get("page_start") is None or hit.get("page_start") is None:
+            return
+        passage["page_start"] = min(passage["page_start"], hit["page_start"])
+        passage["page_end"] = max(
+            passage.get("page_end") or passage["page_start"],
+            hit.get("page_end") or hit["page_start"],
+        )
+
+    # Deduplication -----------------------------------------------------------
+
+    def _dedupe(
+        self, passages: List[Dict[str, Any]], dropped: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        kept: List[Dict[str, Any]] = []
+        seen: List[tuple] = []  # (normalised text, shingles) of kept passages
+        for passage in passages:
+            normalized = normalize_text(passage["text"]).lower()
+            shingles = self._shingles(normalized)
+            duplicate_of = None
+            for (other_text, other_shingles), other in zip(seen, kept):
+                similarity = self._jaccard(shingles, other_shingles)
+                if normalized in other_text or similarity >= self.duplicate_threshold:
+                    duplicate_of = other
+                    break
+            if duplicate_of is not None:
+                dropped.append(
+                    {"id": passage.get("id"), "reason": "duplicate", "of": duplicate_of.get("id")}
+                )
+                continue
+            kept.append(passage)
+            seen.append((normalized, shingles))
+        return kept
+
+    @staticmethod
+    def _shingles(normalized: str, size: int = 3) -> Set[tuple]:
+        words = normalized.split()
+        if len(words) <= size:
+            return {tuple(words)}
+        return {tuple(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+    @staticmethod
+    def _jaccard(a: Set[tuple], b: Set[tuple]) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+    # Packing -----------------------------------------------------------------
+
+    def _pack(self, passages: List[Dict[str, Any]], dropped: List[Dict[str, Any]]) -> PromptContext:
+        packed: List[Dict[str, Any]] = []
+        used = 0
+        for passage in passages:
+            # Citation marker and source label cost a few tokens per passage
+            overhead = self.count(f"[{len(packed) + 1}]  (src: {passage.get('source', '')})")
+            cost = self.count(passage["text"]) + overhead
+            remaining = self.max_tokens - used
+            if cost <= remaining:
+                packed.append(passage)
+                used += cost
+                continue
+            if remaining - overhead >= self.min_fragment_tokens:
+                text = self._truncate(passage["text"], remaining - overhead)
+                packed.append({**passage, "text": text, "truncated": True})
+                used += self.count(text) + overhead
+                dropped.append({"id": passage.get("id"), "reason": "truncated"})
+            else:
+                dropped.append({"id": passage.get("id"), "reason": "budget"})
+        return PromptContext(hits=packed, tokens=used, budget=self.max_tokens, dropped=dropped)
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """The first ``max_tokens`` of ``text``, cut back to a sentence end if one is near."""
+        head = split_by_tokens(text, max_tokens, self.model)[0]
+        ends = [m.end() for m in _SENTENCE_END.finditer(head)]
+        if ends and ends[-1] >= len(head) // 2:
+            head = head[: ends[-1]]
+        return head.rstrip()
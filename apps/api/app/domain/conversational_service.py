@@ -1,15 +1,51 @@
+import asyncio
+import logging
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
+from ..ports.cache import IAnswerCache
 from ..ports.conversation_store import IConversationStore
 from ..ports.llm import IChatLLM, IEmbedder
+from ..ports.reranker import IReranker
 from ..ports.vector_store import IVectorStore
-from .models import ConversationalQueryRequest, ConversationMessage, Document, QueryResponse
+from .context_builder import ContextBuilder
+from .models import (
+    ConversationalQueryRequest,
+    ConversationMessage,
+    ConversationSummary,
+    Document,
+    QueryResponse,
+)
+from .prompts import conversation_messages, rag_only_answer
+from .query_rewriter import QueryRewriter
+from .retrieval import aretrieve, retrieve
+from .services import document_metadata
+from .summarizer import ConversationSummarizer
+from .tokens import truncate_tokens
+
+logger = logging.getLogger(__name__)
 
 
 class ConversationalRagService:
-    """RAG service with conversation memory capabilities."""
+    """RAG service with conversation memory capabilities.
+
+    Each turn is persisted with one ``record_turn`` write; a new conversation is
+    created by its first turn.  With ``defer_persistence`` the write happens on a
+    background thread after the answer is returned.  Turns still being written are
+    kept in memory and merged into the history of the next question, so a quick
+    follow-up still sees them.
+
+    With a ``summarizer``, older messages are folded into a rolling summary in the
+    background.  The retrieval query and the prompt then use that summary plus the
+    messages it does not cover yet, each clipped to ``history_message_tokens``, so
+    per-turn cost stays flat however long a thread gets.
+
+    With a ``rewriter``, retrieval embeds the follow-up rewritten as a standalone
+    question instead of the question concatenated with the conversation.
+    """
 
     def __init__(
         self,
@@ -18,47 +54,264 @@ class ConversationalRagService:
         embed: IEmbedder,
         conversation_store: IConversationStore,
         rag_only: bool = False,
+        answer_cache: Optional[IAnswerCache] = None,
+        hybrid: bool = False,
+        reranker: Optional[IReranker] = None,
+        rerank_candidates: int = 20,
+        context_builder: Optional[ContextBuilder] = None,
+        defer_persistence: bool = False,
+        summarizer: Optional[ConversationSummarizer] = None,
+        history_message_tokens: int = 256,
+        rewriter: Optional[QueryRewriter] = None,
     ):
         self.store = store
         self.llm = llm
         self.embed = embed
         self.conversation_store = conversation_store
         self.rag_only = rag_only
+        self.answer_cache = None if rag_only else answer_cache
+        self.hybrid = hybrid
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+        self.context_builder = context_builder or ContextBuilder()
+        self.defer_persistence = defer_persistence
+        self.summarizer = summarizer
+        self.history_message_tokens = history_message_tokens
+        self.rewriter = rewriter
+        # Single background thread: a conversation's turns are stored in order, and
+        # summary updates run after the turns they summarise
+        self._background = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-background")
+            if defer_persistence or summarizer
+            else None
+        )
+        self._pending: Dict[str, List[ConversationMessage]] = {}  # conversation id -> unsaved
+        self._pending_lock = threading.Lock()
+
+    def close(self) -> None:
+        """Wait for deferred conversation writes and summary updates to finish."""
+        if self._background:
+            self._background.shutdown(wait=True)
 
     def conversational_query(self, request: ConversationalQueryRequest) -> QueryResponse:
         """Execute a conversational RAG query with memory."""
 
         # Get or create conversation
-        if request.conversation_id:
-            conversation_history = self.conversation_store.get_conversation_history(
-                request.conversation_id, limit=request.memory_window or 10
+        summary, conversation_history = self._load_memory(request)
+
+        # Build contextual query considering conversation history
+        if self.rewriter:
+            contextual_query = self.rewriter.rewrite(
+                request.conversation_id, request.query, conversation_history, summary
             )
         else:
-            # Create new conversation
-            title = self._generate_conversation_title(request.query)
-            conversation_id = self.conversation_store.create_conversation(
-                request.tenant_id, request.user_id, title
+            contextual_query = self._build_contextual_query(
+                request.query, conversation_history, summary
             )
-            conversation_history = []
-            request.conversation_id = conversation_id
-
-        # Build contextual query considering conversation history
-        contextual_query = self._build_contextual_query(request.query, conversation_history)
 
         # Generate query embedding (could be enhanced with conversation context)
         query_vector = self.embed.embed_query(contextual_query)
 
-        # Search with tenant isolation
-        hits = self.store.search(
-            tenant_id=request.tenant_id, query_vector=query_vector, k=request.context_limit or 5
-        )
+        k = request.context_limit or 5
 
-        # Generate conversational answer
-        answer = self._generate_conversational_answer(
-            hits, request.query, conversation_history, rag_only=self.rag_only
-        )
+        # Only opening questions are cacheable; follow-ups depend on the history
+        answer_cache = self.answer_cache if not conversation_history else None
+        cached = answer_cache.lookup(request.tenant_id, query_vector, k) if answer_cache else None
+        if cached:
+            hits = cached["hits"][:k]
+            answer = cached["answer"]
+        else:
+            # Search with tenant isolation
+            hits = retrieve(
+                self.store,
+                request.tenant_id,
+                contextual_query,
+                query_vector,
+                k,
+                self.hybrid,
+                self.reranker,
+                self.rerank_candidates,
+            )
+            hits = self.context_builder.build(hits).hits
+
+            # Generate conversational answer
+            answer = self._generate_conversational_answer(
+                hits, request.query, conversation_history, rag_only=self.rag_only, summary=summary
+            )
+            if answer_cache:
+                answer_cache.store(request.tenant_id, request.query, query_vector, answer, hits, k)
+
+        self._save_exchange(request, answer, hits)
+        self._schedule_summary(request.conversation_id, len(conversation_history) + 2)
+        return self._query_response(request, hits, answer)
+
+    async def aconversational_query(self, request: ConversationalQueryRequest) -> QueryResponse:
+        """Async ``conversational_query``: awaits the embedder, store and LLM ports."""
+        summary, conversation_history = await asyncio.to_thread(self._load_memory, request)
+        contextual_query = await self._acontextual_query(request, conversation_history, summary)
+        query_vector = await self.embed.aembed_query(contextual_query)
+
+        k = request.context_limit or 5
 
-        # Save user message
+        answer_cache = self.answer_cache if not conversation_history else None
+        cached = (
+            await answer_cache.alookup(request.tenant_id, query_vector, k) if answer_cache else None
+        )
+        if cached:
+            hits = cached["hits"][:k]
+            answer = cached["answer"]
+        else:
+            hits = await aretrieve(
+                self.store,
+                request.tenant_id,
+                contextual_query,
+                query_vector,
+                k,
+                self.hybrid,
+                self.reranker,
+                self.rerank_candidates,
+            )
+            hits = self.context_builder.build(hits).hits
+            if self.rag_only:
+                answer = rag_only_answer(hits)
+            else:
+                answer = await self.llm.achat(
+                    self._conversation_messages(hits, request.query, conversation_history, summary)
+                )
+            if answer_cache:
+                answer_cache.store(request.tenant_id, request.query, query_vector, answer, hits, k)
+
+        await asyncio.to_thread(self._save_exchange, request, answer, hits)
+        self._schedule_summary(request.conversation_id, len(conversation_history) + 2)
+        return self._query_response(request, hits, answer)
+
+    async def astream_conversational_query(
+        self, request: ConversationalQueryRequest
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Streaming ``conversational_query``.
+
+        Yields ``("sources", List[Document])``, then ``("delta", str)`` answer
+        fragments, then ``("done", QueryResponse)``.  The exchange is persisted only
+        once the answer has been generated in full.
+        """
+        summary, conversation_history = await asyncio.to_thread(self._load_memory, request)
+        contextual_query = await self._acontextual_query(request, conversation_history, summary)
+        query_vector = await self.embed.aembed_query(contextual_query)
+
+        k = request.context_limit or 5
+
+        answer_cache = self.answer_cache if not conversation_history else None
+        cached = (
+            await answer_cache.alookup(request.tenant_id, query_vector, k) if answer_cache else None
+        )
+        if cached:
+            hits = cached["hits"][:k]
+            answer = cached["answer"]
+            yield "sources", self._to_documents(hits, request.tenant_id)
+            yield "delta", answer
+        else:
+            hits = await aretrieve(
+                self.store,
+                request.tenant_id,
+                contextual_query,
+                query_vector,
+                k,
+                self.hybrid,
+                self.reranker,
+                self.rerank_candidates,
+            )
+            hits = self.context_builder.build(hits).hits
+            yield "sources", self._to_documents(hits, request.tenant_id)
+
+            if self.rag_only:
+                answer = rag_only_answer(hits)
+                yield "delta", answer
+            else:
+                parts = []
+                messages = self._conversation_messages(
+                    hits, request.query, conversation_history, summary
+                )
+                async for delta in self.llm.astream_chat(messages):
+                    parts.append(delta)
+                    yield "delta", delta
+                answer = "".join(parts)
+            if answer_cache:
+                answer_cache.store(request.tenant_id, request.query, query_vector, answer, hits, k)
+
+        await asyncio.to_thread(self._save_exchange, request, answer, hits)
+        self._schedule_summary(request.conversation_id, len(conversation_history) + 2)
+        yield "done", self._query_response(request, hits, answer)
+
+    async def _acontextual_query(
+        self,
+        request: ConversationalQueryRequest,
+        history: List[ConversationMessage],
+        summary: Optional[ConversationSummary],
+    ) -> str:
+        if self.rewriter:
+            return await self.rewriter.arewrite(
+                request.conversation_id, request.query, history, summary
+            )
+        return self._build_contextual_query(request.query, history, summary)
+
+    def _load_history(self, request: ConversationalQueryRequest) -> List[ConversationMessage]:
+        """Load the conversation's recent history; a new conversation just gets an id."""
+        if not request.conversation_id:
+            # Created together with its first turn in _save_exchange
+            request.conversation_id = str(uuid.uuid4())
+            return []
+
+        limit = request.memory_window or 10
+        if self.summarizer:
+            # Enough messages to tell when the next summary update is due
+            limit = max(limit, self.summarizer.trigger_messages)
+        # Snapshot unsaved messages before reading, so one written in between is
+        # found in the store or in the snapshot (or both), never in neither
+        with self._pending_lock:
+            pending = list(self._pending.get(request.conversation_id, []))
+        history = self.conversation_store.get_conversation_history(
+            request.conversation_id, limit=limit
+        )
+        if pending:
+            stored = {m.id for m in history}
+            history = (history + [m for m in pending if m.id not in stored])[-limit:]
+        return history
+
+    def _load_memory(
+        self, request: ConversationalQueryRequest
+    ) -> Tuple[Optional[ConversationSummary], List[ConversationMessage]]:
+        """The conversation's summary (if any) and the messages it does not cover yet."""
+        is_new = not request.conversation_id
+        history = self._load_history(request)
+        if is_new or not self.summarizer:
+            return None, history
+        summary = self.conversation_store.get_summary(request.conversation_id)
+        if summary:
+            # Unsaved messages (seq None) are always newer than the summary
+            history = [m for m in history if m.seq is None or m.seq > summary.through_seq]
+        return summary, history
+
+    def _schedule_summary(self, conversation_id: str, unsummarized: int) -> None:
+        """Queue a summary update once enough messages are outside the summary."""
+        if self.summarizer and unsummarized >= self.summarizer.trigger_messages:
+            self._background.submit(self._update_summary, conversation_id)
+
+    def _update_summary(self, conversation_id: str) -> None:
+        try:
+            summary = self.conversation_store.get_summary(conversation_id)
+            messages = self.conversation_store.get_conversation_history(
+                conversation_id, limit=2 * self.summarizer.trigger_messages
+            )
+            updated = self.summarizer.update(summary, messages)
+            if updated:
+                self.conversation_store.save_summary(conversation_id, updated)
+        except Exception as e:
+            logger.warning(f"Summary update failed for conversation {conversation_id}: {e}")
+
+    def _save_exchange(
+        self, request: ConversationalQueryRequest, answer: str, hits: List[Dict[str, Any]]
+    ) -> None:
+        """Persist the user question and the assistant answer as one turn."""
         user_message = ConversationMessage(
             id=str(uuid.uuid4()),
             conversation_id=request.conversation_id,
@@ -67,9 +320,6 @@ class ConversationalRagService:
             timestamp=datetime.utcnow(),
             metadata={},
         )
-        self.conversation_store.add_message(request.conversation_id, user_message)
-
-        # Save assistant response
         assistant_message = ConversationMessage(
             id=str(uuid.uuid4()),
             conversation_id=request.conversation_id,
@@ -82,25 +332,67 @@ class ConversationalRagService:
                 "context_used": len(hits),
             },
         )
-        self.conversation_store.add_message(request.conversation_id, assistant_message)
+        turn = (
+            request.conversation_id,
+            request.tenant_id,
+            request.user_id,
+            self._generate_conversation_title(request.query),  # used if the turn is the first
+            [user_message, assistant_message],
+        )
+        if not self.defer_persistence:
+            self.conversation_store.record_turn(*turn)
+            return
+
+        with self._pending_lock:
+            self._pending.setdefault(request.conversation_id, []).extend(turn[-1])
+        self._background.submit(self._record_deferred, *turn)
 
-        # Convert hits to domain documents
-        source_documents = [
+    def _record_deferred(
+        self,
+        conversation_id: str,
+        tenant_id: str,
+        user_id: str,
+        title: str,
+        messages: List[ConversationMessage],
+    ) -> None:
+        try:
+            self.conversation_store.record_turn(
+                conversation_id, tenant_id, user_id, title, messages
+            )
+        except Exception as e:
+            logger.error(f"Failed to persist turn for conversation {conversation_id}: {e}")
+        finally:
+            written = {m.id for m in messages}
+            with self._pending_lock:
+                remaining = [
+                    m for m in self._pending.get(conversation_id, []) if m.id not in written
+                ]
+                if remaining:
+                    self._pending[conversation_id] = remaining
+                else:
+                    self._pending.pop(conversation_id, None)
+
+    def _to_documents(self, hits: List[Dict[str, Any]], tenant_id: str) -> List[Document]:
+        """Convert hits to domain documents."""
+        return [
             Document(
                 id=hit.get("id", ""),
                 title=hit.get("source", "Unknown"),
                 content=hit.get("text", ""),
                 source=hit.get("source", ""),
-                metadata={"score": hit.get("score", 0.0)},
-                tenant_id=request.tenant_id,
+                metadata=document_metadata(hit),
+                tenant_id=tenant_id,
                 created_at=datetime.utcnow(),
             )
             for hit in hits
         ]
 
+    def _query_response(
+        self, request: ConversationalQueryRequest, hits: List[Dict[str, Any]], answer: str
+    ) -> QueryResponse:
         return QueryResponse(
             answer=answer,
-            sources=source_documents,
+            sources=self._to_documents(hits, request.tenant_id),
             confidence=self._calculate_confidence(hits),
             query_id=str(uuid.uuid4()),
             tenant_id=request.tenant_id,
@@ -108,23 +400,27 @@ class ConversationalRagService:
         )
 
     def _build_contextual_query(
-        self, current_query: str, history: List[ConversationMessage]
+        self,
+        current_query: str,
+        history: List[ConversationMessage],
+        summary: Optional[ConversationSummary] = None,
     ) -> str:
-        """Enhance current query with conversation context."""
-        if not history:
+        """Enhance current query with conversation context.
+
+        The question comes first, so embedders that truncate long inputs drop
+        context rather than the question itself.
+        """
+        if not history and not summary:
             return current_query
 
-        # Take last few exchanges for context
-        recent_context = []
-        for msg in history[-6:]:  # Last 3 exchanges (user + assistant)
+        context = [f"Summary: {summary.text}"] if summary else []
+        # The summary covers earlier turns; otherwise use the last 3 exchanges
+        for msg in history[-2:] if summary else history[-6:]:
             role_prefix = "User" if msg.role == "user" else "Assistant"
-            recent_context.append(f"{role_prefix}: {msg.content}")
-
-        if recent_context:
-            context_str = "\n".join(recent_context)
-            return f"Previous conversation:\n{context_str}\n\nCurrent question: {current_query}"
+            context.append(f"{role_prefix}: {self._clip(msg.content)}")
 
-        return current_query
+        context_str = "\n".join(context)
+        return f"{current_query}\n\nPrevious conversation:\n{context_str}"
 
     def _generate_conversational_answer(
         self,
@@ -132,57 +428,32 @@ class ConversationalRagService:
         current_query: str,
         history: List[ConversationMessage],
         rag_only: bool = False,
+        summary: Optional[ConversationSummary] = None,
     ) -> str:
         """Generate answer considering conversation context."""
-
-        # Format retrieved context
-        ctx = [f"[{i + 1}] {h['text']} (src: {h.get('source', '')})" for i, h in enumerate(hits)]
-
         if rag_only:
-            return "RAG_ONLY mode: returning top snippets only.\n" + "\n".join(ctx[:3])
-
-        # Build conversation-aware system prompt
-        sys_prompt = (
-            "You are the Organizational Twin, an AI assistant that helps users "
-            "understand their organization through documents and data.\n\n"
-            "Key behaviors:\n"
-            "- Always cite sources using [1], [2], [3] format\n"
-            "- Maintain conversation context and refer to previous exchanges when relevant\n"
-            "- If the user asks follow-up questions, connect them to the previous discussion\n"
-            "- Be conversational but professional\n"
-            "- If you don't have enough information, say so clearly"
-        )
-
-        # Build conversation context for the LLM
-        conversation_context = ""
-        if history:
-            recent_exchanges = []
-            for msg in history[-4:]:  # Last 2 exchanges
-                role = "Human" if msg.role == "user" else "Assistant"
-                recent_exchanges.append(f"{role}: {msg.content}")
-
-            if recent_exchanges:
-                conversation_context = (
-                    "\nRecent conversation:\n" + "\n".join(recent_exchanges) + "\n"
-                )
-
-        # Build user message with context and retrieved documents
-        user_message = f"""{conversation_context}
-Retrieved documents:
-{chr(10).join(ctx)}
-
-Current question: {current_query}
+            return rag_only_answer(hits)
 
-Please provide a helpful answer using the retrieved documents and conversation context."""
+        messages = self._conversation_messages(hits, current_query, history, summary)
+        return self.llm.chat(messages)
 
-        # Use LangChain for response generation
-        messages = [
-            {"role": "system", "content": sys_prompt},
-            {"role": "user", "content": user_message},
-        ]
-
-        response = self.llm.llm.invoke(messages)
-        return response.content
+    def _conversation_messages(
+        self,
+        hits: List[Dict[str, Any]],
+        current_query: str,
+        history: List[ConversationMessage],
+        summary: Optional[ConversationSummary] = None,
+    ) -> List[Dict[str, str]]:
+        """Build the chat messages for a conversation-aware answer."""
+        # The summary stands in for older turns, so only the newest messages go in
+        # verbatim; otherwise the last 2 exchanges
+        keep = self.summarizer.keep_recent_messages if self.summarizer else 4
+        window = history[-keep:] if keep else []
+        recent = [{"role": m.role, "content": self._clip(m.content)} for m in window]
+        return conversation_messages(hits, current_query, recent, summary.text if summary else None)
+
+    def _clip(self, text: str) -> str:
+        return truncate_tokens(text, self.history_message_tokens)
 
     def _generate_conversation_title(self, first_query: str) -> str:
         """Generate a title for the conversation based on the first query."""
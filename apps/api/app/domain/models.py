@@ -98,6 +98,15 @@ class ConversationMessage(BaseModel):
     content: str
     timestamp: datetime
     metadata: Dict[str, Any] = {}
+    seq: Optional[int] = None  # position in the conversation (1-based) once stored
+
+
+class ConversationSummary(BaseModel):
+    """Rolling summary of a conversation's older messages."""
+
+    text: str
+    through_seq: int  # messages up to and including this sequence number are covered
+    updated_at: Optional[datetime] = None
 
 
 class Conversation(BaseModel):
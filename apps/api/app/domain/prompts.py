@@ -0,0 +1,115 @@
+"""Prompt construction shared by every chat adapter and RAG service."""
+
+from typing import Any, Dict, List, Optional
+
+ANSWER_SYSTEM_PROMPT = "You are the Organizational Twin. Always cite snippets like [1], [2]."
+
+CONVERSATION_SYSTEM_PROMPT = (
+    "You are the Organizational Twin, an AI assistant that helps users "
+    "understand their organization through documents and data.\n\n"
+    "Key behaviors:\n"
+    "- Always cite sources using [1], [2], [3] format\n"
+    "- Maintain conversation context and refer to previous exchanges when relevant\n"
+    "- If the user asks follow-up questions, connect them to the previous discussion\n"
+    "- Be conversational but professional\n"
+    "- If you don't have enough information, say so clearly"
+)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a user and the "
+    "Organizational Twin. Merge the new messages into the existing summary. Keep "
+    "facts, decisions, names, figures and open questions; drop pleasantries and "
+    "citation markers. Write plain prose of at most {max_words} words."
+)
+
+REWRITE_SYSTEM_PROMPT = (
+    "Rewrite the user's latest question as a standalone search query that can be "
+    "understood without the conversation: resolve pronouns and references such as "
+    "'it', 'they' or 'that project' to what they refer to. Keep the user's wording "
+    "otherwise. Reply with the rewritten question only."
+)
+
+
+def format_context(hits: List[Dict[str, Any]]) -> List[str]:
+    """Numbered context lines; the numbers are what answers cite."""
+    return [f"[{i + 1}] {h['text']} (src: {h.get('source', '')})" for i, h in enumerate(hits)]
+
+
+def rag_only_answer(hits: List[Dict[str, Any]]) -> str:
+    """The answer in RAG_ONLY mode: the top snippets, no LLM call."""
+    return "RAG_ONLY mode: returning top snippets only.\n" + "\n".join(format_context(hits)[:3])
+
+
+def answer_messages(hits: List[Dict[str, Any]], question: str) -> List[Dict[str, str]]:
+    """Chat messages for a single-turn answer grounded in ``hits``."""
+    user = "Context:\n" + "\n".join(format_context(hits)) + f"\n\nQuestion: {question}\nAnswer:"
+    return [
+        {"role": "system", "content": ANSWER_SYSTEM_PROMPT},
+        {"role": "user", "content": user},
+    ]
+
+
+def _speaker(role: str) -> str:
+    return "Human" if role == "user" else "Assistant"
+
+
+def conversation_messages(
+    hits: List[Dict[str, Any]],
+    question: str,
+    history: List[Dict[str, str]],
+    summary: Optional[str] = None,
+) -> List[Dict[str, str]]:
+    """Chat messages for a follow-up answer.
+
+    ``history`` is the recent role/content turns; ``summary`` covers older ones.
+    """
+    conversation_context = ""
+    if summary:
+        conversation_context = f"\nSummary of the earlier conversation:\n{summary}\n"
+    if history:
+        exchanges = [f"{_speaker(msg['role'])}: {msg['content']}" for msg in history]
+        conversation_context += "\nRecent conversation:\n" + "\n".join(exchanges) + "\n"
+
+    user_message = f"""{conversation_context}
+Retrieved documents:
+{chr(10).join(format_context(hits))}
+
+Current question: {question}
+
+Please provide a helpful answer using the retrieved documents and conversation context."""
+
+    return [
+        {"role": "system", "content": CONVERSATION_SYSTEM_PROMPT},
+        {"role": "user", "content": user_message},
+    ]
+
+
+def summary_messages(
+    previous: Optional[str], history: List[Dict[str, str]], max_words: int
+) -> List[Dict[str, str]]:
+    """Chat messages asking the LLM to fold ``history`` into the ``previous`` summary."""
+    exchanges = "\n".join(f"{_speaker(msg['role'])}: {msg['content']}" for msg in history)
+    user = (
+        f"Existing summary:\n{previous or '(none yet)'}\n\n"
+        f"New messages:\n{exchanges}\n\nUpdated summary:"
+    )
+    return [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT.format(max_words=max_words)},
+        {"role": "user", "content": user},
+    ]
+
+
+def rewrite_messages(
+    question: str, history: List[Dict[str, str]], summary: Optional[str] = None
+) -> List[Dict[str, str]]:
+    """Chat messages asking the LLM to make ``question`` standalone."""
+    context = f"Summary of the earlier conversation:\n{summary}\n\n" if summary else ""
+    exchanges = "\n".join(f"{_speaker(msg['role'])}: {msg['content']}" for msg in history)
+    user = (
+        f"{context}Conversation:\n{exchanges}\n\n"
+        f"Latest question: {question}\n\nStandalone question:"
+    )
+    return [
+        {"role": "system", "content": REWRITE_SYSTEM_PROMPT},
+        {"role": "user", "content": user},
+    ]
@@ -0,0 +1,185 @@
+"""Standalone-question rewriting for conversational retrieval."""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ..ports.llm import IChatLLM
+from .chunking import normalize_text
+from .models import ConversationMessage, ConversationSummary
+from .prompts import rewrite_messages
+from .tokens import truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Words that make a question lean on the conversation ("what does it cost?"),
+# unless the question names what they refer to first
+_REFERENCES = frozenset(
+    "it its they them their theirs this that these those he him his she her hers "
+    "same former latter".split()
+)
+# Question words, auxiliaries and other words that name nothing: a question made
+# only of these ("why?", "how so?") or a reference preceded only by these
+# ("what does it cost?") has no antecedent of its own
+_FUNCTION_WORDS = _REFERENCES | frozenset(
+    "what which who whom whose when where why how is are was were be been do does did "
+    "can could should would will shall may might must has have had a an the of in on "
+    "for to at by with from about else more so then there not no yes ok okay tell explain "
+    "please i we you me us my our your one ones".split()
+)
+_FOLLOW_UP_OPENERS = ("and ", "but ", "also ", "what about ", "how about ", "why not ")
+_WORD = re.compile(r"\w+")
+
+
+class QueryRewriter:
+    """Turns a follow-up question into a standalone retrieval query.
+
+    Modes:
+    - "llm": the chat LLM rewrites the question from the recent messages and the
+      summary.  The heuristic is the fallback when the call fails.
+    - "heuristic": a self-contained question is kept as is.  A follow-up ("and
+      its cost?") is prefixed with the previous user question.
+
+    Rewrites are cached per (conversation, turn, question), so retries and the
+    streaming path reuse them.  Only the rewritten question is embedded, so a
+    question that recurs across conversations hits the embedding cache.
+    """
+
+    def __init__(
+        self,
+        llm: Optional[IChatLLM] = None,
+        mode: str = "heuristic",
+        max_entries: int = 10_000,
+        history_messages: int = 4,
+        message_tokens: int = 128,
+        max_tokens: int = 64,
+    ):
+        self.llm = llm
+        self.mode = mode if llm is not None else "heuristic"
+        self.max_entries = max_entries
+        self.history_messages = history_messages
+        self.message_tokens = message_tokens
+        self.max_tokens = max_tokens
+        self._cache: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def rewrite(
+        self,
+        conversation_id: str,
+        question: str,
+        history: List[ConversationMessage],
+        summary: Optional[ConversationSummary] = None,
+    ) -> str:
+        """The standalone form of ``question`` given the conversation so far."""
+        if not history and not summary:
+            return question
+        key = self._key(conversation_id, question, history)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        rewritten = None
+        if self.mode == "llm":
+            try:
+                rewritten = self._clean(self.llm.chat(self._messages(question, history, summary)))
+            except Exception as e:
+                logger.warning(f"Query rewrite failed, using heuristic: {e}")
+        return self._put(key, rewritten or self._heuristic(question, history))
+
+    async def arewrite(
+        self,
+        conversation_id: str,
+        question: str,
+        history: List[ConversationMessage],
+        summary: Optional[ConversationSummary] = None,
+    ) -> str:
+        """Async ``rewrite``."""
+        if not history and not summary:
+            return question
+        key = self._key(conversation_id, question, history)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        rewritten = None
+        if self.mode == "llm":
+            try:
+                messages = self._messages(question, history, summary)
+                rewritten = self._clean(await self.llm.achat(messages))
+            except Exception as e:
+                logger.warning(f"Query rewrite failed, using heuristic: {e}")
+        return self._put(key, rewritten or self._heuristic(question, history))
+
+    def _messages(
+        self,
+        question: str,
+        history: List[ConversationMessage],
+        summary: Optional[ConversationSummary],
+    ) -> List[Dict[str, str]]:
+        recent = [
+            {"role": m.role, "content": truncate_tokens(m.content, self.message_tokens)}
+            for m in history[-self.history_messages :]
+        ]
+        return rewrite_messages(question, recent, summary.text if summary else None)
+
+    def _clean(self, text: str) -> str:
+        lines = [line for line in (text or "").strip().splitlines() if line.strip()]
+        if not lines:
+            return ""
+        return truncate_tokens(lines[0].strip().strip("\"'"), self.max_tokens)
+
+    def _heuristic(self, question: str, history: List[ConversationMessage]) -> str:
+        if not self.is_follow_up(question):
+            return question
+        previous = next((m.content for m in reversed(history) if m.role == "user"), "")
+        if not previous:
+            return question
+        return f"{truncate_tokens(previous, self.message_tokens)} {question}"
+
+    @staticmethod
+    def is_follow_up(question: str) -> bool:
+        """Whether ``question`` probably needs the conversation to be understood.
+
+        True for a follow-up opener ("and the price?"), a question that names
+        nothing ("why?"), or a reference word with no content word before it
+        ("what does it cost?", but not "does the policy cover its holidays?").
+        """
+        lowered = normalize_text(question).lower()
+        if lowered.startswith(_FOLLOW_UP_OPENERS):
+            return True
+        words = _WORD.findall(lowered)
+        for word in words:
+            if word in _REFERENCES:
+                return True
+            if word not in _FUNCTION_WORDS:
+                return False  # names its subject before any reference
+        return True  # nothing but function words
+
+    # Cache --------------------------------------------------------------------
+
+    @staticmethod
+    def _key(
+        conversation_id: str, question: str, history: List[ConversationMessage]
+    ) -> Tuple[str, str, str]:
+        # The newest message identifies the turn, including not-yet-stored ones
+        turn = history[-1].id if history else ""
+        return (conversation_id or "", turn, normalize_text(question).lower())
+
+    def _get(self, key: Tuple[str, str, str]) -> Optional[str]:
+        with self._lock:
+            rewritten = self._cache.get(key)
+            if rewritten is None:
+                self.stats["misses"] += 1
+                return None
+            self._cache.move_to_end(key)
+            self.stats["hits"] += 1
+            return rewritten
+
+    def _put(self, key: Tuple[str, str, str], rewritten: str) -> str:
+        with self._lock:
+            self._cache[key] = rewritten
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return rewritten
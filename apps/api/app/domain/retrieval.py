@@ -0,0 +1,117 @@
+"""Retrieval helpers shared by the RAG services: hybrid search, fusion, reranking."""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..ports.reranker import IReranker
+from ..ports.vector_store import IVectorStore
+
+logger = logging.getLogger(__name__)
+
+RRF_K = 60  # Damps the weight of top ranks; 60 is the value from the original RRF paper
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[List[Dict[str, Any]]],
+    k: int,
+    rrf_k: int = RRF_K,
+    weights: Optional[Sequence[float]] = None,
+) -> List[Dict[str, Any]]:
+    """Fuse ranked hit lists by (weighted) reciprocal rank; returns the top k.
+
+    Each hit contributes ``weight / (rrf_k + rank)`` per list it appears in, so a
+    chunk ranked well by both retrievers beats one ranked first by only one.
+    Hits are matched by ``id``; the first list's copy of a hit wins, gaining any
+    fields only later lists carry plus an ``rrf_score``.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[str, Dict[str, Any]] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, hit in enumerate(ranking, start=1):
+            entry = fused.get(hit["id"])
+            if entry is None:
+                entry = fused[hit["id"]] = {**hit, "rrf_score": 0.0}
+            else:
+                for key, value in hit.items():
+                    entry.setdefault(key, value)
+            entry["rrf_score"] += weight / (rrf_k + rank)
+    return sorted(fused.values(), key=lambda h: h["rrf_score"], reverse=True)[:k]
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def retrieve(
+    store: IVectorStore,
+    tenant_id: str,
+    query: str,
+    query_vector: List[float],
+    k: int,
+    hybrid: bool = False,
+    reranker: Optional[IReranker] = None,
+    rerank_candidates: int = 20,
+    timings: Optional[Dict[str, float]] = None,
+) -> List[Dict[str, Any]]:
+    """Search the store and return the k best hits.
+
+    With ``hybrid``, keyword and vector results are fused (stores without a
+    ``search_hybrid`` method fall back to vector search).  With a ``reranker``,
+    ``rerank_candidates`` hits are fetched and the reranker keeps the best k.
+    Per-stage durations (ms) are recorded in ``timings`` when given.
+    """
+    fetch = max(k, rerank_candidates) if reranker else k
+    start = time.perf_counter()
+    if hybrid and hasattr(store, "search_hybrid"):
+        hits = store.search_hybrid(tenant_id, query, query_vector, fetch)
+    else:
+        hits = store.search(tenant_id=tenant_id, query_vector=query_vector, k=fetch)
+    if timings is not None:
+        timings["search"] = _elapsed_ms(start)
+    if not reranker:
+        return hits
+
+    start = time.perf_counter()
+    try:
+        hits = reranker.rerank(query, hits, k)
+    except Exception as e:
+        logger.warning(f"Reranking failed, using search order: {e}")
+        hits = hits[:k]
+    if timings is not None:
+        timings["rerank"] = _elapsed_ms(start)
+    return hits
+
+
+async def aretrieve(
+    store: IVectorStore,
+    tenant_id: str,
+    query: str,
+    query_vector: List[float],
+    k: int,
+    hybrid: bool = False,
+    reranker: Optional[IReranker] = None,
+    rerank_candidates: int = 20,
+    timings: Optional[Dict[str, float]] = None,
+) -> List[Dict[str, Any]]:
+    """Async ``retrieve``."""
+    fetch = max(k, rerank_candidates) if reranker else k
+    start = time.perf_counter()
+    if hybrid and hasattr(store, "asearch_hybrid"):
+        hits = await store.asearch_hybrid(tenant_id, query, query_vector, fetch)
+    else:
+        hits = await store.asearch(tenant_id=tenant_id, query_vector=query_vector, k=fetch)
+    if timings is not None:
+        timings["search"] = _elapsed_ms(start)
+    if not reranker:
+        return hits
+
+    start = time.perf_counter()
+    try:
+        hits = await reranker.arerank(query, hits, k)
+    except Exception as e:
+        logger.warning(f"Reranking failed, using search order: {e}")
+        hits = hits[:k]
+    if timings is not None:
+        timings["rerank"] = _elapsed_ms(start)
+    return hits
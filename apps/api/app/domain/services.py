@@ -1,84 +1,414 @@
+import bisect
+import itertools
+import time
 import uuid
 from datetime import datetime
-from typing import Any, Dict, List, Optional
-
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from ..ports.cache import IAnswerCache
+from ..ports.document_extractor import IDocumentExtractor
 from ..ports.llm import IChatLLM, IEmbedder
+from ..ports.reranker import IReranker
 from ..ports.vector_store import IVectorStore
+from .chunking import TokenChunker, chunk_id, iter_file_text
+from .context_builder import ContextBuilder
 from .models import Document, QueryRequest, QueryResponse
+from .retrieval import aretrieve, retrieve
+
+
+def stable_source_id(tenant_id: str, title: str) -> str:
+    """Source id for incremental ingest: one source per (tenant, title)."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"source:{tenant_id}/{title}"))
+
+
+def document_metadata(hit: Dict[str, Any]) -> Dict[str, Any]:
+    """Document metadata for a search hit: its score and, when known, its pages."""
+    metadata = {"score": hit.get("score", 0.0)}
+    if hit.get("page_start") is not None:
+        metadata["page_start"] = hit["page_start"]
+        metadata["page_end"] = hit.get("page_end", hit["page_start"])
+    return metadata
 
 
 class RagService:
     """Pure domain service orchestrating RAG operations."""
 
     def __init__(
-        self, store: IVectorStore, llm: IChatLLM, embed: IEmbedder, rag_only: bool = False
+        self,
+        store: IVectorStore,
+        llm: IChatLLM,
+        embed: IEmbedder,
+        rag_only: bool = False,
+        answer_cache: Optional[IAnswerCache] = None,
+        chunker: Optional[TokenChunker] = None,
+        ingest_window: int = 256,
+        extractor: Optional[IDocumentExtractor] = None,
+        hybrid: bool = False,
+        reranker: Optional[IReranker] = None,
+        rerank_candidates: int = 20,
+        context_builder: Optional[ContextBuilder] = None,
     ):
         self.store = store
         self.llm = llm
         self.embed = embed
         self.rag_only = rag_only
+        # RAG_ONLY answers cost no LLM call, so there is nothing worth caching
+        self.answer_cache = None if rag_only else answer_cache
+        self.chunker = chunker or TokenChunker()
+        self.ingest_window = ingest_window  # chunks embedded and stored per round trip
+        self.extractor = extractor
+        self.hybrid = hybrid  # fuse keyword and vector rankings when the store supports it
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates  # hits fetched for the reranker to choose from
+        self.context_builder = context_builder or ContextBuilder()
 
     def query_documents(self, request: QueryRequest) -> QueryResponse:
         """Execute a RAG query with business logic isolated from infrastructure."""
         # Business rule: Generate query embedding
         query_vector = self.embed.embed_query(request.query)
 
-        # Business rule: Search with tenant isolation
-        hits = self.store.search(
-            tenant_id=request.tenant_id, query_vector=query_vector, k=request.context_limit or 5
+        k = request.context_limit or 5
+
+        # Business rule: Reuse the answer to a semantically equivalent question
+        cached = (
+            self.answer_cache.lookup(request.tenant_id, query_vector, k)
+            if self.answer_cache
+            else None
+        )
+        if cached:
+            hits = cached["hits"][:k]
+            answer = cached["answer"]
+        else:
+            # Business rule: Search with tenant isolation
+            hits = self._retrieve(request.tenant_id, request.query, query_vector, k)
+
+            # Business rule: Send each passage once, within the model's context budget
+            hits = self.context_builder.build(hits).hits
+
+            # Business rule: Generate answer using retrieved context
+            answer = self.llm.answer(hits, request.query, rag_only=self.rag_only)
+            if self.answer_cache:
+                self.answer_cache.store(
+                    request.tenant_id, request.query, query_vector, answer, hits, k
+                )
+
+        return self._query_response(request, hits, answer)
+
+    async def aquery_documents(self, request: QueryRequest) -> QueryResponse:
+        """Async ``query_documents``: awaits the embedder, store and LLM ports."""
+        query_vector = await self.embed.aembed_query(request.query)
+
+        k = request.context_limit or 5
+
+        cached = (
+            await self.answer_cache.alookup(request.tenant_id, query_vector, k)
+            if self.answer_cache
+            else None
+        )
+        if cached:
+            hits = cached["hits"][:k]
+            answer = cached["answer"]
+        else:
+            hits = await self._aretrieve(request.tenant_id, request.query, query_vector, k)
+            hits = self.context_builder.build(hits).hits
+            answer = await self.llm.aanswer(hits, request.query, rag_only=self.rag_only)
+            if self.answer_cache:
+                self.answer_cache.store(
+                    request.tenant_id, request.query, query_vector, answer, hits, k
+                )
+
+        return self._query_response(request, hits, answer)
+
+    async def astream_query(self, request: QueryRequest) -> AsyncIterator[Tuple[str, Any]]:
+        """Streaming ``aquery_documents``.
+
+        Yields ``("sources", List[Document])`` as soon as retrieval finishes, then
+        ``("delta", str)`` answer fragments, then ``("done", QueryResponse)``.
+        """
+        query_vector = await self.embed.aembed_query(request.query)
+
+        k = request.context_limit or 5
+
+        cached = (
+            await self.answer_cache.alookup(request.tenant_id, query_vector, k)
+            if self.answer_cache
+            else None
+        )
+        if cached:
+            hits = cached["hits"][:k]
+            answer = cached["answer"]
+            yield "sources", self._to_documents(hits, request.tenant_id)
+            yield "delta", answer
+        else:
+            hits = await self._aretrieve(request.tenant_id, request.query, query_vector, k)
+            hits = self.context_builder.build(hits).hits
+            yield "sources", self._to_documents(hits, request.tenant_id)
+
+            parts = []
+            async for delta in self.llm.astream_answer(hits, request.query, rag_only=self.rag_only):
+                parts.append(delta)
+                yield "delta", delta
+            answer = "".join(parts)
+            if self.answer_cache:
+                self.answer_cache.store(
+                    request.tenant_id, request.query, query_vector, answer, hits, k
+                )
+
+        yield "done", self._query_response(request, hits, answer)
+
+    def _retrieve(
+        self,
+        tenant_id: str,
+        query: str,
+        query_vector: List[float],
+        k: int,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> List[Dict[str, Any]]:
+        return retrieve(
+            self.store,
+            tenant_id,
+            query,
+            query_vector,
+            k,
+            self.hybrid,
+            self.reranker,
+            self.rerank_candidates,
+            timings,
         )
 
-        # Business rule: Generate answer using retrieved context
-        answer = self.llm.answer(hits, request.query, rag_only=self.rag_only)
+    async def _aretrieve(
+        self,
+        tenant_id: str,
+        query: str,
+        query_vector: List[float],
+        k: int,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> List[Dict[str, Any]]:
+        return await aretrieve(
+            self.store,
+            tenant_id,
+            query,
+            query_vector,
+            k,
+            self.hybrid,
+            self.reranker,
+            self.rerank_candidates,
+            timings,
+        )
 
+    def _to_documents(self, hits: List[Dict[str, Any]], tenant_id: str) -> List[Document]:
         # Business rule: Convert hits to domain documents
-        source_documents = [
+        return [
             Document(
                 id=hit.get("id", ""),
                 title=hit.get("source", "Unknown"),
                 content=hit.get("text", ""),
                 source=hit.get("source", ""),
-                metadata={"score": hit.get("score", 0.0)},
-                tenant_id=request.tenant_id,
+                metadata=document_metadata(hit),
+                tenant_id=tenant_id,
                 created_at=datetime.utcnow(),
             )
             for hit in hits
         ]
 
+    def _query_response(
+        self, request: QueryRequest, hits: List[Dict[str, Any]], answer: str
+    ) -> QueryResponse:
         return QueryResponse(
             answer=answer,
-            sources=source_documents,
+            sources=self._to_documents(hits, request.tenant_id),
             confidence=self._calculate_confidence(hits),
             query_id=str(uuid.uuid4()),
             tenant_id=request.tenant_id,
         )
 
     def ingest_text(
-        self, title: str, text: str, tenant_id: str, chunk_size: int = 800, overlap: int = 120
+        self,
+        title: str,
+        text: str,
+        tenant_id: str,
+        chunk_size: Optional[int] = None,
+        overlap: Optional[int] = None,
+        incremental: bool = False,
+    ) -> Dict[str, Any]:
+        """Ingest text with business logic for chunking and embedding.
+
+        ``chunk_size`` and ``overlap`` are in tokens and default to the service chunker.
+        With ``incremental``, the document replaces the tenant's previous version with
+        the same title, embedding only chunks that changed.
+        """
+        chunker = self.chunker
+        if chunk_size is not None or overlap is not None:
+            chunker = TokenChunker(
+                chunk_size or chunker.max_tokens,
+                chunker.overlap_tokens if overlap is None else overlap,
+                chunker.model,
+            )
+        return self.ingest_stream(title, [text], tenant_id, chunker, incremental)
+
+    def ingest_stream(
+        self,
+        title: str,
+        pieces: Iterable[str],
+        tenant_id: str,
+        chunker: Optional[TokenChunker] = None,
+        incremental: bool = False,
+    ) -> Dict[str, Any]:
+        """Ingest text arriving as consecutive pieces (e.g. file blocks).
+
+        Chunks are embedded and stored ``ingest_window`` at a time, so memory stays
+        flat regardless of document size.
+        """
+        # Business rule: Sentence-aware chunks sized to the embedding model's tokens
+        spans = (chunker or self.chunker).chunk_spans(pieces)
+        return self._ingest_spans(title, spans, tenant_id, incremental=incremental)
+
+    def ingest_pages(
+        self,
+        title: str,
+        pages: Iterable[Tuple[Optional[int], str]],
+        tenant_id: str,
+        incremental: bool = False,
     ) -> Dict[str, Any]:
-        """Ingest text with business logic for chunking and embedding."""
-        # Business rule: Text chunking strategy
-        chunks = self._chunk_text(text, chunk_size, overlap)
+        """Ingest extracted (page number, text) pairs, recording each chunk's pages."""
+        spans, locate = self.page_spans(pages)
+        return self._ingest_spans(title, spans, tenant_id, locate, incremental)
+
+    def page_spans(
+        self, pages: Iterable[Tuple[Optional[int], str]]
+    ) -> Tuple[Iterator[Tuple[str, int, int]], Callable[[int, int], Dict[str, Any]]]:
+        """Chunk spans over extracted pages, plus a function mapping a span to its pages."""
+        starts: List[int] = []
+        numbers: List[Optional[int]] = []
+
+        def pieces():
+            offset = 0
+            for number, text in pages:
+                if number is not None:
+                    starts.append(offset)
+                    numbers.append(number)
+                text = text if text.endswith("\n") else text + "\n"
+                offset += len(text)
+                yield text
+
+        def locate(start: int, end: int) -> Dict[str, Any]:
+            # Chunks are produced after the pages they span have been read
+            if not starts or start < starts[0]:
+                return {}
+            first = bisect.bisect_right(starts, start) - 1
+            last = bisect.bisect_right(starts, max(start, end - 1)) - 1
+            return {"page_start": numbers[first], "page_end": numbers[last]}
+
+        return self.chunker.chunk_spans(pieces()), locate
+
+    def file_spans(
+        self, file_path: str
+    ) -> Tuple[Iterator[Tuple[str, int, int]], Optional[Callable[[int, int], Dict[str, Any]]]]:
+        """Chunk spans of a file (and a page locator for paged formats), read lazily."""
+        import os
 
-        # Business rule: Generate embeddings for all chunks
-        embeddings = self.embed.embed_batch(chunks)
+        # Business rule: Extract text based on file type, streaming it into the chunker
+        file_ext = os.path.splitext(file_path.lower())[1]
+        if file_ext == ".txt" or file_ext == ".md":
+            return self.chunker.chunk_spans(iter_file_text(file_path)), None
+        if file_ext in [".pdf", ".docx", ".doc"]:
+            if self.extractor is None:
+                raise ValueError(f"No document extractor configured for {file_ext} files")
+            return self.page_spans(self.extractor.iter_pages(file_path, file_ext))
+        raise ValueError(f"Unsupported file type: {file_ext}")
+
+    def _ingest_spans(
+        self,
+        title: str,
+        spans: Iterable[Tuple[str, int, int]],
+        tenant_id: str,
+        locate: Optional[Callable[[int, int], Dict[str, Any]]] = None,
+        incremental: bool = False,
+    ) -> Dict[str, Any]:
+        spans = iter(spans)
+        source_id = None
+        manifest: Set[str] = set()
+        seen: Set[str] = set()
+        if incremental:
+            # Business rule: A re-ingested document keeps its source and only new or
+            # changed chunks are embedded and written; missing ones are removed
+            source_id = stable_source_id(tenant_id, title)
+            manifest = set(self.store.get_source_manifest(tenant_id, source_id) or ())
+
+        chunk_count = 0
+        unchanged = 0
+        while True:
+            batch = list(itertools.islice(spans, self.ingest_window))
+            window = batch
+            if incremental:
+                window = []
+                for span in batch:
+                    cid = chunk_id(tenant_id, span[0])
+                    if cid in seen:
+                        continue
+                    seen.add(cid)
+                    if cid in manifest:
+                        unchanged += 1
+                    else:
+                        window.append(span)
+
+            if window or source_id is None:
+                chunks = [text for text, _, _ in window]
+
+                # Business rule: Generate embeddings for the window's chunks
+                embeddings = self.embed.embed_batch(chunks) if chunks else []
+
+                # Business rule: Store with tenant isolation, later windows extend the source
+                extra: Dict[str, Any] = {}
+                if source_id is not None:
+                    extra["source_id"] = source_id
+                if locate is not None:
+                    extra["metadata"] = [locate(start, end) for _, start, end in window]
+                stored_id = self.store.upsert_chunks(
+                    tenant_id=tenant_id, title=title, chunks=chunks, embeddings=embeddings, **extra
+                )
+                source_id = source_id or stored_id
+                chunk_count += len(chunks)
+            if len(batch) < self.ingest_window:
+                break
 
-        # Business rule: Store with tenant isolation
-        source_id = self.store.upsert_chunks(
-            tenant_id=tenant_id, title=title, chunks=chunks, embeddings=embeddings
-        )
+        removed = sorted(manifest - seen)
+        if removed:
+            self.store.remove_chunks(tenant_id, source_id, removed)
+
+        # Business rule: New documents can change answers, drop the tenant's cached ones
+        if self.answer_cache and (chunk_count or removed or not incremental):
+            self.answer_cache.invalidate_tenant(tenant_id)
 
         return {
             "success": True,
             "source_id": source_id,
-            "chunks_created": len(chunks),
+            "chunks_created": chunk_count,
+            "chunks_unchanged": unchanged,
+            "chunks_removed": len(removed),
             "title": title,
             "tenant_id": tenant_id,
             "embedding_provider": self.embed.__class__.__name__,
         }
 
     def ingest_file(
-        self, file_path: str, title: str, tenant_id: str, original_filename: str = None
+        self,
+        file_path: str,
+        title: str,
+        tenant_id: str,
+        original_filename: str = None,
+        incremental: bool = False,
     ) -> Dict[str, Any]:
         """Ingest a file with business logic for file processing."""
         import os
@@ -87,17 +417,8 @@ class RagService:
         file_ext = os.path.splitext(file_path.lower())[1]
 
         try:
-            # Business rule: Extract text based on file type
-            if file_ext == ".txt" or file_ext == ".md":
-                with open(file_path, "r", encoding="utf-8") as f:
-                    text = f.read()
-            elif file_ext in [".pdf", ".docx", ".doc"]:
-                text = self._extract_document_text(file_path, file_ext)
-            else:
-                raise ValueError(f"Unsupported file type: {file_ext}")
-
-            # Business rule: Use existing text ingestion logic
-            result = self.ingest_text(title, text, tenant_id)
+            spans, locate = self.file_spans(file_path)
+            result = self._ingest_spans(title, spans, tenant_id, locate, incremental)
             result["file_type"] = file_ext
             result["original_filename"] = original_filename
 
@@ -117,13 +438,34 @@ class RagService:
         return self.store.get_recent_sources(tenant_id=tenant_id, limit=limit)
 
     def debug_query(self, query: str, tenant_id: str, k: int = 5) -> Dict[str, Any]:
-        """Debug RAG query with detailed retrieval information."""
+        """Debug RAG query with detailed retrieval information and per-stage timings."""
+        start = time.perf_counter()
         # Business rule: Generate query embedding
         query_vector = self.embed.embed_query(query)
+        timings = {"embed": round((time.perf_counter() - start) * 1000, 1)}
 
         # Business rule: Search with detailed scoring
-        hits = self.store.search(tenant_id=tenant_id, query_vector=query_vector, k=k)
-
+        hits = self._retrieve(tenant_id, query, query_vector, k, timings)
+
+        timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+        return self._debug_info(query, tenant_id, hits, timings)
+
+    async def adebug_query(self, query: str, tenant_id: str, k: int = 5) -> Dict[str, Any]:
+        """Async ``debug_query``."""
+        start = time.perf_counter()
+        query_vector = await self.embed.aembed_query(query)
+        timings = {"embed": round((time.perf_counter() - start) * 1000, 1)}
+        hits = await self._aretrieve(tenant_id, query, query_vector, k, timings)
+        timings["total"] = round((time.perf_counter() - start) * 1000, 1)
+        return self._debug_info(query, tenant_id, hits, timings)
+
+    def _debug_info(
+        self,
+        query: str,
+        tenant_id: str,
+        hits: List[Dict[str, Any]],
+        timings: Dict[str, float],
+    ) -> Dict[str, Any]:
         # Business rule: Return debug information
         return {
             "query": query,
@@ -139,68 +481,22 @@ class RagService:
                         else hit.get("text", "")
                     ),
                     "score": hit.get("score", 0.0),
+                    "rrf_score": hit.get("rrf_score"),
+                    "text_score": hit.get("text_score"),
+                    "rerank_score": hit.get("rerank_score"),
                     "metadata": hit.get("metadata", {}),
                 }
                 for hit in hits
             ],
             "total_results": len(hits),
+            "retrieval_mode": "hybrid" if self.hybrid else "vector",
+            "reranker": self.reranker.__class__.__name__ if self.reranker else None,
+            "timings_ms": timings,
+            "context": self.context_builder.build(hits).debug_info(),
             "llm_model": self.llm.__class__.__name__,
             "rag_only_mode": self.rag_only,
         }
 
-    def _extract_document_text(self, file_path: str, file_ext: str) -> str:
-        """Business logic for extracting text from different document types."""
-        try:
-            if file_ext == ".pdf":
-                # Try to import and use PyPDF2 or similar
-                try:
-                    import PyPDF2
-
-                    with open(file_path, "rb") as file:
-                        reader = PyPDF2.PdfReader(file)
-                        text = ""
-                        for page in reader.pages:
-                            text += page.extract_text() + "\n"
-                        return text
-                except ImportError:
-                    raise ValueError("PyPDF2 not installed. Cannot process PDF files.")
-
-            elif file_ext in [".docx", ".doc"]:
-                # Try to import and use python-docx
-                try:
-                    from docx import Document
-
-                    doc = Document(file_path)
-                    text = ""
-                    for paragraph in doc.paragraphs:
-                        text += paragraph.text + "\n"
-                    return text
-                except ImportError:
-                    raise ValueError("python-docx not installed. Cannot process DOCX files.")
-
-            else:
-                raise ValueError(f"Unsupported document type: {file_ext}")
-
-        except Exception as e:
-            # Fallback: try to read as plain text
-            try:
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                    return f.read()
-            except Exception:
-                raise ValueError(f"Failed to extract text from {file_ext} file: {str(e)}")
-
-    def _chunk_text(self, text: str, chunk_size: int, overlap: int) -> List[str]:
-        """Business logic for text chunking."""
-        chunks = []
-        i = 0
-        while i < len(text):
-            chunk_end = min(i + chunk_size, len(text))
-            chunks.append(text[i:chunk_end])
-            i += chunk_size - overlap
-            if i >= len(text):
-                break
-        return chunks
-
     def _calculate_confidence(self, hits: List[Dict[str, Any]]) -> Optional[float]:
         """Business logic for confidence calculation."""
         if not hits:
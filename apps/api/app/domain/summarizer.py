@@ -0,0 +1,67 @@
+"""Rolling conversation summaries, so long threads cost the same per turn as short ones."""
+
+from datetime import datetime
+from typing import List, Optional
+
+from ..ports.llm import IChatLLM
+from .models import ConversationMessage, ConversationSummary
+from .prompts import summary_messages
+from .tokens import truncate_tokens
+
+
+class ConversationSummarizer:
+    """Folds older conversation messages into a compact running summary.
+
+    The newest ``keep_recent_messages`` stay verbatim.  Once ``every_n_turns``
+    further turns have piled up behind them, those are merged into the summary
+    with a single LLM call.  The summary is capped at ``max_tokens`` and each
+    folded message at ``message_tokens``, so an update costs the same however
+    long the thread is.
+    """
+
+    def __init__(
+        self,
+        llm: IChatLLM,
+        every_n_turns: int = 3,
+        keep_recent_messages: int = 4,
+        max_tokens: int = 200,
+        message_tokens: int = 512,
+        model: Optional[str] = None,
+    ):
+        self.llm = llm
+        self.every_n_turns = max(1, every_n_turns)
+        self.keep_recent_messages = keep_recent_messages
+        self.max_tokens = max_tokens
+        self.message_tokens = message_tokens
+        self.model = model
+
+    @property
+    def trigger_messages(self) -> int:
+        """Unsummarised messages at which an update is due."""
+        return self.keep_recent_messages + 2 * self.every_n_turns
+
+    def update(
+        self, summary: Optional[ConversationSummary], messages: List[ConversationMessage]
+    ) -> Optional[ConversationSummary]:
+        """The summary with all but the newest stored messages folded in, or None if not due.
+
+        ``messages`` is the stored tail of the conversation, oldest first.
+        """
+        through = summary.through_seq if summary else 0
+        newer = [m for m in messages if m.seq is not None and m.seq > through]
+        if len(newer) < self.trigger_messages:
+            return None
+        fold = newer[: len(newer) - self.keep_recent_messages]
+        history = [
+            {"role": m.role, "content": truncate_tokens(m.content, self.message_tokens, self.model)}
+            for m in fold
+        ]
+        max_words = max(20, self.max_tokens * 3 // 4)
+        text = self.llm.chat(
+            summary_messages(summary.text if summary else None, history, max_words)
+        )
+        return ConversationSummary(
+            text=truncate_tokens(text.strip(), self.max_tokens, self.model),
+            through_seq=fold[-1].seq,
+            updated_at=datetime.utcnow(),
+        )
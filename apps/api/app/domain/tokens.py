@@ -0,0 +1,74 @@
+"""Token counting shared by chunking, embedding and prompt assembly."""
+
+import logging
+from functools import lru_cache
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rough average for English text with BPE tokenizers.
+CHARS_PER_TOKEN = 4
+
+
+def approximate_token_count(text: str) -> int:
+    """Fast token estimate used when no tokenizer is available."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@lru_cache(maxsize=16)
+def _get_encoding(model: Optional[str]) -> Optional[Any]:
+    """Load a tiktoken encoding, or None if tiktoken/its BPE files are unavailable."""
+    try:
+        import tiktoken
+
+        if model:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Offline deployments cannot download BPE files; fall back to estimates.
+        logger.warning(f"Tokenizer unavailable for {model or 'default'}, using estimate: {e}")
+        return None
+
+
+def get_token_counter(model: Optional[str] = None) -> Callable[[str], int]:
+    """Return a function counting tokens for ``model`` (approximate if no tokenizer)."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return approximate_token_count
+
+    def count(text: str) -> int:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return count
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens in ``text`` for ``model``."""
+    return get_token_counter(model)(text)
+
+
+def split_by_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> List[str]:
+    """Split ``text`` into consecutive pieces of at most ``max_tokens`` tokens each."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        size = max_tokens * CHARS_PER_TOKEN
+        parts = []
+        while len(text) > size:
+            # Prefer a word boundary so estimated splits do not cut words in half
+            cut = text.rfind(" ", 0, size) + 1 or size
+            parts.append(text[:cut])
+            text = text[cut:]
+        return parts + [text] if text else parts
+    ids = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(ids[i : i + max_tokens]) for i in range(0, len(ids), max_tokens)]
+
+
+def truncate_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """``text`` cut to at most ``max_tokens`` tokens; a cut is marked with "..."."""
+    parts = split_by_tokens(text, max_tokens, model)
+    if len(parts) <= 1:
+        return text
+    return parts[0].rstrip() + " ..."
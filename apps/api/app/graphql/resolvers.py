@@ -250,7 +250,7 @@ class Query:
             context_limit=input.k
         )
         
-        response = di.container.rag.query_documents(domain_request)
+        response = await di.container.rag.aquery_documents(domain_request)
         
         return QueryResult(
             answer=response.answer,
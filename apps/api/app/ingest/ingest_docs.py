@@ -1,56 +1,66 @@
-import glob
+"""Batch-ingest a directory tree of documents for a tenant.
+
+    python -m app.ingest.ingest_docs corpus --pattern "**/*.txt" --tenant acme
+    python -m app.ingest.ingest_docs --resume <job-id>
+
+Uses the configured store and embedder (see .env) and the pipelined batch
+ingester.  Progress is checkpointed to the ingest job repository (Firestore when
+FIREBASE_PROJECT_ID is set, otherwise a JSON file under LOCAL_DATA_DIR), so an
+interrupted run can be resumed.
+"""
+
+import argparse
 import os
-import uuid
-
-from langchain_openai import OpenAIEmbeddings
-from neo4j import GraphDatabase
-
-NEO4J_URI = os.getenv("NEO4J_URI", "neo4j://localhost:7687")
-NEO4J_USERNAME = os.getenv("NEO4J_USERNAME", "neo4j")
-NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
-NEO4J_DB = os.getenv("NEO4J_DB", "neo4j")
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Set OPENAI_API_KEY.")
-
-emb = OpenAIEmbeddings(model="text-embedding-3-small")
-driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
-
-
-def chunk_text(text: str, chunk_size=800, overlap=120):
-    chunks, i = [], 0
-    while i < len(text):
-        chunks.append(text[i : i + chunk_size])
-        i += chunk_size - overlap
-    return chunks
-
-
-def upsert_chunk(tx, text: str, source: str, vec):
-    tx.run(
-        """
-        MERGE (d:Doc {id: $id})
-        SET d.text=$text, d.source=$source, d.embedding=$vec
-        """,
-        id=str(uuid.uuid4()),
-        text=text,
-        source=source,
-        vec=vec,
+import sys
+import time
+
+from app.adapters.batch_ingest import BatchIngestPipeline
+from app.adapters.ingest_job_repo import JsonFileIngestJobRepo
+from app.config import load_config
+from app.di import Container
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("root", nargs="?", default="corpus", help="directory to ingest")
+    parser.add_argument("--pattern", default="**/*", help="glob under root (default: **/*)")
+    parser.add_argument("--tenant", default="demo", help="target tenant id")
+    parser.add_argument("--user", default="cli", help="user id recorded on the job")
+    parser.add_argument("--resume", metavar="JOB_ID", help="resume an interrupted job")
+    parser.add_argument("--workers", type=int, help="threads per pipeline stage")
+    args = parser.parse_args(argv)
+
+    cfg = load_config()
+    container = Container(cfg)
+    jobs = container.jobs
+    if not os.getenv("FIREBASE_PROJECT_ID"):
+        os.makedirs(cfg.local_data_dir, exist_ok=True)
+        jobs = JsonFileIngestJobRepo(os.path.join(cfg.local_data_dir, "batch_jobs.json"))
+    pipeline = BatchIngestPipeline(
+        container.rag, jobs, workers=args.workers or cfg.batch_ingest_workers
     )
 
+    if args.resume:
+        job_id = args.resume
+    else:
+        job_id = pipeline.create_job(args.tenant, args.user, args.root, args.pattern)["jobId"]
+    print(f"Batch ingest job {job_id} (resume with --resume {job_id})")
 
-def ingest_path(path_glob: str):
-    files = glob.glob(path_glob, recursive=True)
-    print(f"Ingesting {len(files)} files...")
-    with driver.session(database=NEO4J_DB) as session:
-        for fp in files:
-            with open(fp, "r", encoding="utf-8", errors="ignore") as f:
-                raw = f.read()
-            for ch in chunk_text(raw):
-                vec = emb.embed_query(ch)
-                session.execute_write(upsert_chunk, ch, fp, vec)
-    print("Done.")
+    pipeline.start(job_id)
+    while True:
+        time.sleep(2)
+        job = jobs.get_job(job_id) or {}
+        print(
+            f"  {job.get('processed', 0)}/{job.get('total', 0)} documents, "
+            f"{job.get('chunksCreated', 0)} chunks written, {job.get('failed', 0)} failed"
+        )
+        if job.get("status") in ("completed", "failed"):
+            break
+    for error in job.get("errors", []):
+        print(f"  failed: {error['path']}: {error['error']}")
+    print(f"Done: {job.get('status')}")
+    return 0 if job.get("status") == "completed" and not job.get("failed") else 1
 
 
 if __name__ == "__main__":
-    ingest_path("corpus/**/*.txt")
+    sys.exit(main())
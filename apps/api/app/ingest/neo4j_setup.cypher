@@ -2,6 +2,13 @@
 CREATE CONSTRAINT doc_id IF NOT EXISTS
 FOR (d:Doc) REQUIRE d.id IS UNIQUE;
 
+CREATE CONSTRAINT source_id IF NOT EXISTS
+FOR (s:Source) REQUIRE s.id IS UNIQUE;
+
 CREATE VECTOR INDEX docEmbeddings IF NOT EXISTS
 FOR (d:Doc) ON (d.embedding)
 OPTIONS {indexConfig: { `vector.dimensions`: 1536, `vector.similarity_function`: 'cosine' }};
+
+// Keyword half of hybrid retrieval (RETRIEVAL_MODE=hybrid, NEO4J_FULLTEXT_INDEX)
+CREATE FULLTEXT INDEX doc_text IF NOT EXISTS
+FOR (d:Doc) ON EACH [d.text];
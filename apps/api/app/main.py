@@ -2,6 +2,7 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from strawberry.fastapi import GraphQLRouter
 
+from . import di
 from .config import load_config
 from .di import container, init_container
 from .routers import health, intelligence, rag, strategic_test
@@ -98,6 +99,27 @@ async def auth_middleware(request: Request, call_next):
         raise HTTPException(status_code=401, detail=str(e))
 
 
+@app.on_event("startup")
+async def start_background_workers():
+    if di.container.ingest_pool:
+        await di.container.ingest_pool.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    if di.container.ingest_pool:
+        await di.container.ingest_pool.stop()
+    di.container.extractor.close()
+    di.container.conversational_rag.close()
+    if hasattr(di.container.llm, "aclose"):  # pooled HTTP clients (Ollama)
+        await di.container.llm.aclose()
+        di.container.llm.close()
+    if hasattr(di.container.store, "close"):  # Neo4j driver and search threads
+        di.container.store.close()
+    if getattr(di.container, "neo4j_pool", None):
+        await di.container.neo4j_pool.close()
+
+
 # Include REST API routers
 app.include_router(health.router)
 app.include_router(rag.router)
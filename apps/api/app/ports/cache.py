@@ -44,9 +44,12 @@ class ISemanticCache(ABC):
 
     @abstractmethod
     async def get_similar(
-        self, query_embedding: np.ndarray, threshold: float = 0.95
+        self,
+        query_embedding: np.ndarray,
+        threshold: float = 0.95,
+        tenant_id: Optional[str] = None,
     ) -> Optional[Dict[str, Any]]:
-        """Get cached response for semantically similar query."""
+        """Get cached response for semantically similar query within a tenant."""
         pass
 
     @abstractmethod
@@ -84,3 +87,42 @@ class IVectorCache(ABC):
     async def store_batch_embeddings(self, embeddings: Dict[str, List[float]]) -> bool:
         """Store multiple text embeddings in cache."""
         pass
+
+
+class IAnswerCache(ABC):
+    """Synchronous answer cache consulted by the RAG services.
+
+    Lookups are keyed by query embedding and scoped to a tenant, so a cached answer
+    is reused for semantically equivalent questions within that tenant only.  An
+    answer is only reused for the same number of context hits ``k``.
+    """
+
+    @abstractmethod
+    def lookup(self, tenant_id: str, query_vector: List[float], k: int) -> Optional[Dict[str, Any]]:
+        """Return ``{"answer", "hits"}`` for a semantically similar cached query."""
+        pass
+
+    @abstractmethod
+    async def alookup(
+        self, tenant_id: str, query_vector: List[float], k: int
+    ) -> Optional[Dict[str, Any]]:
+        """Async variant of ``lookup`` for callers already on an event loop."""
+        pass
+
+    @abstractmethod
+    def store(
+        self,
+        tenant_id: str,
+        query: str,
+        query_vector: List[float],
+        answer: str,
+        hits: List[Dict[str, Any]],
+        k: int,
+    ) -> None:
+        """Cache a freshly generated answer, the hits it was grounded on and their ``k``."""
+        pass
+
+    @abstractmethod
+    def invalidate_tenant(self, tenant_id: str) -> None:
+        """Drop a tenant's cached answers (e.g. after new documents are ingested)."""
+        pass
@@ -1,6 +1,6 @@
 from typing import List, Optional, Protocol
 
-from ..domain.models import Conversation, ConversationMessage
+from ..domain.models import Conversation, ConversationMessage, ConversationSummary
 
 
 class IConversationStore(Protocol):
@@ -24,10 +24,29 @@ class IConversationStore(Protocol):
         """Add a message to an existing conversation."""
         ...
 
+    def record_turn(
+        self,
+        conversation_id: str,
+        tenant_id: str,
+        user_id: str,
+        title: str,
+        messages: List[ConversationMessage],
+    ) -> None:
+        """Append a turn's messages in one write, creating the conversation if new."""
+        ...
+
     def get_conversation_history(
         self, conversation_id: str, limit: int = 50
     ) -> List[ConversationMessage]:
-        """Get conversation messages ordered by timestamp."""
+        """Get the newest ``limit`` messages, oldest first."""
+        ...
+
+    def get_summary(self, conversation_id: str) -> Optional[ConversationSummary]:
+        """Get the conversation's rolling summary, if one has been written."""
+        ...
+
+    def save_summary(self, conversation_id: str, summary: ConversationSummary) -> None:
+        """Store a rolling summary unless a newer one is already stored."""
         ...
 
     def update_conversation_title(self, conversation_id: str, title: str) -> None:
@@ -0,0 +1,9 @@
+from typing import Iterator, Optional, Protocol, Tuple
+
+
+class IDocumentExtractor(Protocol):
+    """Port for extracting text from uploaded documents."""
+
+    def iter_pages(self, file_path: str, file_ext: str) -> Iterator[Tuple[Optional[int], str]]:
+        """Yield (page number, text) in document order; page is None for unpaged formats."""
+        ...
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Protocol
+from typing import Any, AsyncIterator, Dict, List, Protocol
 
 
 class IEmbedder(Protocol):
@@ -8,7 +8,41 @@ class IEmbedder(Protocol):
     def embed_batch(self, chunks: list[str]) -> list[list[float]]:
         ...
 
+    async def aembed_query(self, text: str) -> list[float]:
+        ...
+
 
 class IChatLLM(Protocol):
     def answer(self, hits: List[Dict[str, Any]], question: str, rag_only: bool = False) -> str:
         ...
+
+    async def aanswer(
+        self, hits: List[Dict[str, Any]], question: str, rag_only: bool = False
+    ) -> str:
+        ...
+
+    def astream_answer(
+        self, hits: List[Dict[str, Any]], question: str, rag_only: bool = False
+    ) -> AsyncIterator[str]:
+        ...
+
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        """Complete a conversation of ``{"role", "content"}`` messages."""
+        ...
+
+    async def achat(self, messages: List[Dict[str, str]]) -> str:
+        ...
+
+    def batch_chat(
+        self, conversations: List[List[Dict[str, str]]], max_concurrency: int = 4
+    ) -> List[str]:
+        """Complete several conversations concurrently; replies keep input order."""
+        ...
+
+    async def abatch_chat(
+        self, conversations: List[List[Dict[str, str]]], max_concurrency: int = 4
+    ) -> List[str]:
+        ...
+
+    def astream_chat(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        ...
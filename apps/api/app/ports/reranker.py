@@ -0,0 +1,13 @@
+from typing import Any, Dict, List, Protocol
+
+
+class IReranker(Protocol):
+    """Port for re-scoring retrieved hits against the query (e.g. a cross-encoder)."""
+
+    def rerank(self, query: str, hits: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        """Return the k best hits, best first, each with a ``rerank_score``."""
+        ...
+
+    async def arerank(self, query: str, hits: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        """``rerank`` without blocking the event loop."""
+        ...
@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Protocol
+from typing import Any, Dict, List, Optional, Protocol
 
 
 class IVectorStore(Protocol):
@@ -7,10 +7,48 @@ class IVectorStore(Protocol):
     ) -> List[Dict[str, Any]]:
         ...
 
+    async def asearch(
+        self, tenant_id: str, query_vector: list[float], k: int = 5
+    ) -> List[Dict[str, Any]]:
+        ...
+
     def upsert_chunks(
-        self, tenant_id: str, title: str, chunks: list[str], embeddings: list[list[float]]
+        self,
+        tenant_id: str,
+        title: str,
+        chunks: list[str],
+        embeddings: list[list[float]],
+        source_id: Optional[str] = None,
+        metadata: Optional[List[Dict[str, Any]]] = None,
     ) -> str:
+        """Store chunks under a new source, or append them to ``source_id``.
+
+        ``metadata`` optionally carries per-chunk citation fields (``page_start``,
+        ``page_end``), aligned with ``chunks``.
+        """
+        ...
+
+    def get_source_manifest(self, tenant_id: str, source_id: str) -> Optional[List[str]]:
+        """Content-addressed chunk ids of a source, or None if it does not exist."""
+        ...
+
+    def remove_chunks(self, tenant_id: str, source_id: str, chunk_ids: List[str]) -> int:
+        """Unlink chunks from a source, deleting chunks no other source uses."""
         ...
 
     def get_recent_sources(self, tenant_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         ...
+
+
+class IHybridSearch(Protocol):
+    """Optional store capability: keyword + vector search fused into one ranking."""
+
+    def search_hybrid(
+        self, tenant_id: str, query_text: str, query_vector: list[float], k: int = 5
+    ) -> List[Dict[str, Any]]:
+        ...
+
+    async def asearch_hybrid(
+        self, tenant_id: str, query_text: str, query_vector: list[float], k: int = 5
+    ) -> List[Dict[str, Any]]:
+        ...
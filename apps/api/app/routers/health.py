@@ -344,6 +344,16 @@ async def get_metrics():
     # Add Neo4j pool metrics if available
     if container and hasattr(container, 'neo4j_pool'):
         metrics["neo4j"] = await container.neo4j_pool.get_pool_metrics()
+
+    # Add tenant-filtered vector search over-fetch metrics if available
+    if container and hasattr(container.store, 'get_search_metrics'):
+        metrics["vector_search"] = container.store.get_search_metrics()
+
+    # Add ingest queue metrics if the worker pool is running
+    if container and getattr(container, 'ingest_pool', None):
+        metrics["ingest_queue"] = container.ingest_pool.metrics()
+    if container and getattr(container, 'batch_ingest', None):
+        metrics["batch_ingest"] = container.batch_ingest.metrics()
     
     # Add Redis metrics if available
     if container and hasattr(container, 'redis_pool'):
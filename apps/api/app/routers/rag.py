@@ -1,18 +1,27 @@
+import asyncio
+import json
+import logging
 import os
+import shutil
 import tempfile
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
 from .. import di
-from ..config import load_config
+from ..adapters.ingest_queue import IngestQueueFull
 from ..domain.models import (
     ConversationalQueryRequest,
     ConversationsResponseSchema,
     QueryRequest,
 )
 
+logger = logging.getLogger(__name__)
+
+UPLOAD_BLOCK_SIZE = 1 << 20  # bytes copied per read when saving uploads
+
 # All RAG-related routes are grouped under the /query prefix
 router = APIRouter(prefix="/query")
 
@@ -95,6 +104,13 @@ class IngestRequestSchema(BaseModel):
         description="Target tenant ID for document storage (defaults to user's tenant)",
         example="acme_corp"
     )
+    incremental: bool = Field(
+        False,
+        description=(
+            "Replace the tenant's previous version of this title, embedding only new or "
+            "changed chunks and removing chunks no longer present"
+        ),
+    )
 
     class Config:
         schema_extra = {
@@ -198,6 +214,24 @@ class IngestJobStatusSchema(BaseModel):
     error: str | None = None
     createdAt: int | None = None
     updatedAt: int | None = None
+    # Batch jobs
+    total: int | None = None
+    processed: int | None = None
+    failed: int | None = None
+    chunksCreated: int | None = None
+    errors: List[Dict[str, str]] | None = None
+
+
+class BatchIngestRequestSchema(BaseModel):
+    path: str = Field(
+        "",
+        description="Directory to ingest, relative to the server's BATCH_INGEST_ROOT",
+        example="acme_corp/onboarding",
+    )
+    pattern: str = Field(
+        "**/*", description="Glob of files to ingest under path", example="**/*.pdf"
+    )
+    tenantId: Optional[str] = Field(None, description="Target tenant (defaults to user's tenant)")
 
 
 @router.post(
@@ -224,7 +258,7 @@ class IngestJobStatusSchema(BaseModel):
     """,
     response_description="AI-generated answer with source citations and confidence score"
 )
-def query(q: QueryRequestSchema, request: Request):
+async def query(q: QueryRequestSchema, request: Request):
     """Query documents using semantic search and AI generation."""
     user = getattr(request.state, "user", {"tenantId": "demo", "role": "owner", "uid": "dev"})
     tenant = q.tenantId or user["tenantId"]
@@ -241,27 +275,19 @@ def query(q: QueryRequestSchema, request: Request):
     )
 
     # Delegate to domain service
-    response = di.container.rag.query_documents(domain_request)
+    response = await di.container.rag.aquery_documents(domain_request)
 
     # Convert domain response to HTTP response
     return QueryResponseSchema(
         answer=response.answer,
-        sources=[
-            {
-                "id": doc.id,
-                "title": doc.title,
-                "content": doc.content,
-                "score": doc.metadata.get("score", 0.0),
-            }
-            for doc in response.sources
-        ],
+        sources=[_source_dict(doc) for doc in response.sources],
         confidence=response.confidence,
         query_id=response.query_id,
     )
 
 
 @router.post("/ingest/text", response_model=IngestAcceptedResponseSchema | IngestResponseSchema)
-def ingest(payload: IngestRequestSchema, request: Request):
+async def ingest(payload: IngestRequestSchema, request: Request):
     """Ingest endpoint - thin HTTP layer delegating to domain service."""
     user = getattr(request.state, "user", {"tenantId": "demo", "role": "owner"})
     tenant = payload.tenantId or user["tenantId"]
@@ -272,77 +298,26 @@ def ingest(payload: IngestRequestSchema, request: Request):
     ):
         raise HTTPException(403, "Cross-tenant access denied")
 
-    # Delegate to domain service
-    cfg = di.container.cfg if hasattr(di.container, "cfg") else load_config()
-    if getattr(cfg, "async_ingest", False):
-        # Fire-and-forget pattern with job tracking
-        import threading
-        import time
-        import uuid
-
-        job_id = str(uuid.uuid4())
-        now_ms = int(time.time() * 1000)
-        di.container.jobs.create_job(
-            {
-                "jobId": job_id,
-                "tenantId": tenant,
-                "userId": user["uid"],
-                "title": payload.title,
-                "status": "queued",
-                "createdAt": now_ms,
-                "updatedAt": now_ms,
-            }
-        )
-
-        def _worker():
-            try:
-                di.container.jobs.update_job(
-                    job_id, {"status": "processing", "startedAt": int(time.time() * 1000)}
-                )
-                start = time.time()
-                result = di.container.rag.ingest_text(
-                    title=payload.title, text=payload.text, tenant_id=tenant
-                )
-                duration_ms = int((time.time() - start) * 1000)
-                di.container.jobs.update_job(
-                    job_id,
-                    {
-                        "status": "completed",
-                        "sourceId": result.get("source_id"),
-                        "chunkCount": result.get("chunks_created", 0),
-                        "durationMs": duration_ms,
-                        "updatedAt": int(time.time() * 1000),
-                    },
-                )
-                # Emit domain event if event bus available
-                try:
-                    if getattr(di.container, "event_bus", None):
-                        # Fire-and-forget; don't await in thread
-                        import asyncio
-
-                        asyncio.get_event_loop().create_task(
-                            di.container.event_bus.publish_document_ingested(
-                                document_id=result.get("source_id", ""),
-                                tenant_id=tenant,
-                            )
-                        )
-                except Exception:
-                    pass
-            except Exception as e:
-                di.container.jobs.update_job(
-                    job_id,
-                    {
-                        "status": "failed",
-                        "error": str(e),
-                        "updatedAt": int(time.time() * 1000),
-                    },
-                )
-
-        threading.Thread(target=_worker, daemon=True).start()
+    # Delegate to domain service: queue it when async ingest is enabled
+    if di.container.ingest_pool:
+        try:
+            job_id = await di.container.ingest_pool.submit(
+                tenant_id=tenant,
+                user_id=user.get("uid", "dev"),
+                title=payload.title,
+                text=payload.text,
+                incremental=payload.incremental,
+            )
+        except IngestQueueFull as e:
+            raise HTTPException(503, str(e), headers={"Retry-After": "30"})
         return IngestAcceptedResponseSchema(ok=True, jobId=job_id, status="queued")
     else:
-        result = di.container.rag.ingest_text(
-            title=payload.title, text=payload.text, tenant_id=tenant
+        result = await asyncio.to_thread(
+            di.container.rag.ingest_text,
+            title=payload.title,
+            text=payload.text,
+            tenant_id=tenant,
+            incremental=payload.incremental,
         )
         return IngestResponseSchema(
             ok=result["success"], sourceId=result["source_id"], chunks=result["chunks_created"]
@@ -355,6 +330,7 @@ async def upload_file(
     file: UploadFile = File(...),
     title: str = Form(...),
     tenantId: Optional[str] = Form(None),
+    incremental: bool = Form(False),
 ):
     """Upload and ingest a document file (PDF, DOCX, TXT, MD)."""
     user = getattr(request.state, "user", {"tenantId": "demo", "role": "owner"})
@@ -375,17 +351,26 @@ async def upload_file(
             400, f"Unsupported file type: {file_ext}. Allowed: {', '.join(allowed_extensions)}"
         )
 
-    # Save file temporarily
+    # Save file temporarily, streaming it to disk rather than buffering it in memory
     with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
         tmp_file_path = tmp_file.name
 
     try:
-        # Delegate to domain service for file processing
-        result = di.container.rag.ingest_file(
-            file_path=tmp_file_path, title=title, tenant_id=tenant, original_filename=file.filename
+        with open(tmp_file_path, "wb") as tmp_file:
+            await asyncio.to_thread(shutil.copyfileobj, file.file, tmp_file, UPLOAD_BLOCK_SIZE)
+
+        # Delegate to domain service for file processing, off the event loop
+        result = await asyncio.to_thread(
+            di.container.rag.ingest_file,
+            file_path=tmp_file_path,
+            title=title,
+            tenant_id=tenant,
+            original_filename=file.filename,
+            incremental=incremental,
         )
+        if not result["success"]:
+            logger.warning(f"Failed to ingest upload {file.filename!r}: {result['error']}")
+            raise HTTPException(422, "Could not process the uploaded file")
 
         return IngestResponseSchema(
             ok=result["success"], sourceId=result["source_id"], chunks=result["chunks_created"]
@@ -397,6 +382,60 @@ async def upload_file(
             os.unlink(tmp_file_path)
 
 
+@router.post("/ingest/batch", response_model=IngestAcceptedResponseSchema)
+async def ingest_batch(payload: BatchIngestRequestSchema, request: Request):
+    """Ingest a server-side document tree through the pipelined batch ingester.
+
+    Files are re-ingested incrementally (one source per relative path), so posting
+    the same tree again only embeds what changed.  Poll /query/ingest/status.
+    """
+    user = getattr(request.state, "user", {"tenantId": "demo", "role": "owner", "uid": "dev"})
+    tenant = payload.tenantId or user["tenantId"]
+    if not di.container.tenant_service.validate_cross_tenant_access(
+        user_role=user["role"], user_tenant=user["tenantId"], target_tenant=tenant
+    ):
+        raise HTTPException(403, "Cross-tenant access denied")
+
+    base = di.container.cfg.batch_ingest_root
+    if not base:
+        raise HTTPException(404, "Batch ingest is not enabled (BATCH_INGEST_ROOT is not set)")
+    base = os.path.realpath(base)
+    root = os.path.realpath(os.path.join(base, payload.path))
+    if root != base and not root.startswith(base + os.sep):
+        raise HTTPException(400, "path must stay within the batch ingest root")
+    if not os.path.isdir(root):
+        raise HTTPException(404, f"Directory not found: {payload.path}")
+
+    pipeline = di.container.batch_ingest
+    job = await asyncio.to_thread(
+        pipeline.create_job, tenant, user.get("uid", "dev"), root, payload.pattern
+    )
+    try:
+        pipeline.start(job["jobId"])
+    except IngestQueueFull as e:
+        await asyncio.to_thread(pipeline.reject, job["jobId"], str(e))
+        raise HTTPException(503, str(e), headers={"Retry-After": "60"})
+    return IngestAcceptedResponseSchema(ok=True, jobId=job["jobId"], status="running")
+
+
+@router.post("/ingest/batch/{job_id}/resume", response_model=IngestAcceptedResponseSchema)
+def resume_ingest_batch(job_id: str, request: Request):
+    """Resume an interrupted batch ingest job from its last checkpoint."""
+    user = getattr(request.state, "user", {"tenantId": "demo", "uid": "dev"})
+    job = di.container.jobs.get_job(job_id)
+    if not job or job.get("kind") != "batch":
+        raise HTTPException(404, "Job not found")
+    if job.get("tenantId") != user["tenantId"] or job.get("userId") != user["uid"]:
+        raise HTTPException(403, "Access denied")
+    if job.get("status") == "completed":
+        return IngestAcceptedResponseSchema(ok=True, jobId=job_id, status="completed")
+    try:
+        di.container.batch_ingest.start(job_id)
+    except IngestQueueFull as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "60"})
+    return IngestAcceptedResponseSchema(ok=True, jobId=job_id, status="running")
+
+
 @router.get("/ingest/recent", response_model=RecentDocumentsResponseSchema)
 def get_recent_documents(request: Request, tenantId: Optional[str] = None):
     """Get recently ingested documents."""
@@ -427,7 +466,7 @@ def get_recent_documents(request: Request, tenantId: Optional[str] = None):
 
 
 @router.post("/debug/rag", response_model=Dict[str, Any])
-def debug_rag(q: QueryRequestSchema, request: Request):
+async def debug_rag(q: QueryRequestSchema, request: Request):
     """Debug RAG pipeline - returns detailed retrieval information."""
     user = getattr(request.state, "user", {"tenantId": "demo", "role": "owner", "uid": "dev"})
     tenant = q.tenantId or user["tenantId"]
@@ -439,14 +478,14 @@ def debug_rag(q: QueryRequestSchema, request: Request):
         raise HTTPException(403, "Cross-tenant access denied")
 
     # Get debug information from domain service
-    debug_info = di.container.rag.debug_query(query=q.question, tenant_id=tenant, k=q.k)
+    debug_info = await di.container.rag.adebug_query(query=q.question, tenant_id=tenant, k=q.k)
 
     return debug_info
 
 
 # Conversational endpoints
 @router.post("/conversation/query", response_model=ConversationalQueryResponseSchema)
-def conversational_query(payload: ConversationalQueryRequestSchema, request: Request):
+async def conversational_query(payload: ConversationalQueryRequestSchema, request: Request):
     """Conversational query endpoint with memory."""
     user = getattr(request.state, "user", {"tenantId": "demo", "role": "owner", "uid": "dev"})
     tenant = payload.tenantId or user["tenantId"]
@@ -468,25 +507,122 @@ def conversational_query(payload: ConversationalQueryRequestSchema, request: Req
     )
 
     # Delegate to conversational service
-    response = di.container.conversational_rag.conversational_query(domain_request)
+    response = await di.container.conversational_rag.aconversational_query(domain_request)
 
     return ConversationalQueryResponseSchema(
         answer=response.answer,
-        sources=[
-            {
-                "id": doc.id,
-                "title": doc.title,
-                "content": doc.content,
-                "score": doc.metadata.get("score", 0.0),
-            }
-            for doc in response.sources
-        ],
+        sources=[_source_dict(doc) for doc in response.sources],
         confidence=response.confidence,
         conversationId=response.conversation_id,
         queryId=response.query_id,
     )
 
 
+# Streaming (Server-Sent Events) endpoints
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _source_dict(doc) -> Dict[str, Any]:
+    source = {
+        "id": doc.id,
+        "title": doc.title,
+        "content": doc.content,
+        "score": doc.metadata.get("score", 0.0),
+    }
+    if "page_start" in doc.metadata:
+        source["pageStart"] = doc.metadata["page_start"]
+        source["pageEnd"] = doc.metadata["page_end"]
+    return source
+
+
+async def _sse_events(stream: AsyncIterator[Tuple[str, Any]], domain_request) -> AsyncIterator[str]:
+    """Render a domain answer stream as SSE: ``sources``, ``delta``..., then ``done``."""
+    try:
+        async for event, payload in stream:
+            if event == "sources":
+                # Conversations get their id once history is loaded, before sources
+                data = {"sources": [_source_dict(doc) for doc in payload]}
+                conversation_id = getattr(domain_request, "conversation_id", None)
+                if conversation_id:
+                    data["conversationId"] = conversation_id
+                yield _sse("sources", data)
+            elif event == "delta":
+                yield _sse("delta", {"text": payload})
+            else:
+                yield _sse(
+                    "done",
+                    {
+                        "confidence": payload.confidence,
+                        "queryId": payload.query_id,
+                        "conversationId": payload.conversation_id,
+                    },
+                )
+    except Exception as e:
+        # Exception text can carry internal details (database errors, URIs); log it only
+        logger.error(f"Streaming query failed: {e}", exc_info=True)
+        yield _sse("error", {"detail": "The answer could not be generated. Please try again."})
+
+
+def _sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/stream")
+async def query_stream(q: QueryRequestSchema, request: Request):
+    """Stream a RAG answer as Server-Sent Events.
+
+    Emits one ``sources`` event with the retrieved chunks, ``delta`` events with
+    answer text as it is generated, and a final ``done`` event (or ``error``).
+    """
+    user = getattr(request.state, "user", {"tenantId": "demo", "role": "owner", "uid": "dev"})
+    tenant = q.tenantId or user["tenantId"]
+
+    # Authorization check
+    if not di.container.tenant_service.validate_cross_tenant_access(
+        user_role=user["role"], user_tenant=user["tenantId"], target_tenant=tenant
+    ):
+        raise HTTPException(403, "Cross-tenant access denied")
+
+    domain_request = QueryRequest(
+        query=q.question, tenant_id=tenant, user_id=user["uid"], context_limit=q.k
+    )
+    stream = di.container.rag.astream_query(domain_request)
+    return _sse_response(_sse_events(stream, domain_request))
+
+
+@router.post("/conversation/query/stream")
+async def conversational_query_stream(payload: ConversationalQueryRequestSchema, request: Request):
+    """Stream a conversational answer as Server-Sent Events.
+
+    Same events as ``/query/stream``; the exchange is saved to the conversation once
+    the answer completes.
+    """
+    user = getattr(request.state, "user", {"tenantId": "demo", "role": "owner", "uid": "dev"})
+    tenant = payload.tenantId or user["tenantId"]
+
+    # Authorization check
+    if not di.container.tenant_service.validate_cross_tenant_access(
+        user_role=user["role"], user_tenant=user["tenantId"], target_tenant=tenant
+    ):
+        raise HTTPException(403, "Cross-tenant access denied")
+
+    domain_request = ConversationalQueryRequest(
+        conversation_id=payload.conversationId,
+        query=payload.question,
+        tenant_id=tenant,
+        user_id=user["uid"],
+        context_limit=payload.k,
+        memory_window=payload.memoryWindow or 10,
+    )
+    stream = di.container.conversational_rag.astream_conversational_query(domain_request)
+    return _sse_response(_sse_events(stream, domain_request))
+
+
 @router.get("/conversations", response_model=ConversationsResponseSchema)
 def list_conversations(request: Request, limit: int = Query(20, ge=1, le=100)):
     """List user's conversations."""
@@ -0,0 +1,1183 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.adapters.mock_store import MockStore
+from app.adapters.vector_index import IVFFlatIndex, TenantVectorIndexes
+
+
+def test_mock_store_search_ranks_by_cosine(tmp_path):
+    store = MockStore(str(tmp_path))
+    store.upsert_chunks(
+        "demo", "Doc", ["alpha", "beta", "gamma"], [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]]
+    )
+
+    hits = store.search("demo", [0.0, 2.0], k=2)
+
+    assert [h["text"] for h in hits] == ["beta", "gamma"]
+    assert abs(hits[0]["score"] - 1.0) < 1e-5
+    assert store.search("other", [0.0, 1.0], k=2) == []
+
+
+def test_mock_store_index_persists_and_rebuilds(tmp_path):
+    MockStore(str(tmp_path)).upsert_chunks("demo", "Doc", ["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+
+    # Reopened store memory-maps the persisted index
+    assert MockStore(str(tmp_path)).search("demo", [1.0, 0.1], k=1)[0]["text"] == "a"
+
+    # Missing index files are rebuilt from the stored chunks
+    import shutil
+
+    shutil.rmtree(tmp_path / "vector_index")
+    assert MockStore(str(tmp_path)).search("demo", [0.1, 1.0], k=1)[0]["text"] == "b"
+
+
+def test_ivf_index_trains_and_searches(tmp_path):
+    import numpy as np
+
+    vectors = np.random.default_rng(0).normal(size=(400, 8))
+    index = IVFFlatIndex(str(tmp_path), nlist=4, nprobe=2, train_size=200)
+    index.add([str(i) for i in range(400)], vectors)
+
+    assert index._centroids is not None
+    assert index.search(vectors[123], k=1)[0][0] == "123"
+
+
+def test_tenant_indexes_keep_similar_tenant_ids_apart(tmp_path):
+    indexes = TenantVectorIndexes(str(tmp_path))
+    indexes.get("a/b").add(["x"], [[1.0, 0.0]])
+
+    assert indexes.exists("a/b")
+    assert not indexes.exists("a_b")
+    assert len(TenantVectorIndexes(str(tmp_path)).get("a_b")) == 0
+
+
+def test_mock_store_search_skips_removed_chunks(tmp_path):
+    store = MockStore(str(tmp_path))
+    source = store.upsert_chunks("demo", "Doc", ["a", "b", "c"], [[1, 0], [0.9, 0.1], [0, 1]])
+    store.remove_chunks("demo", source, store.get_source_manifest("demo", source)[:2])
+
+    assert [h["text"] for h in store.search("demo", [1.0, 0.0], k=2)] == ["c"]
+    assert [h["text"] for h in MockStore(str(tmp_path)).search("demo", [1.0, 0.0], k=2)] == ["c"]
+
+
+def test_mock_store_reingest_with_new_embedding_replaces_the_vector(tmp_path):
+    store = MockStore(str(tmp_path))
+    store.upsert_chunks("demo", "Doc", ["a"], [[1.0, 0.0]], source_id="s")
+    store.upsert_chunks("demo", "Doc", ["a"], [[0.0, 1.0]], source_id="s")
+
+    assert store.search("demo", [0.0, 1.0], k=5)[0]["score"] == pytest.approx(1.0)
+    assert len(store._tenant_index("demo")) == 1
+
+
+def test_flat_index_re_added_id_replaces_its_vector(tmp_path):
+    from app.adapters.vector_index import FlatIndex
+
+    index = FlatIndex(str(tmp_path))
+    index.add(["x", "y"], [[1.0, 0.0], [0.0, 1.0]])
+    index.remove(["x"])
+    index.add(["x"], [[0.0, 1.0]])
+
+    assert len(index) == 2
+    assert [i for i, _ in index.search([1.0, 0.0], k=5)] in (["x", "y"], ["y", "x"])
+    assert index.search([1.0, 0.0], k=1)[0][1] < 0.5  # the old [1, 0] vector is gone
+    assert len(FlatIndex(str(tmp_path)).search([1.0, 0.0], k=5)) == 2
+
+
+class FakeNeo4jSession:
+    """Vector index with 100 neighbours; only every 10th belongs to tenant 'small'.
+
+    Full-text queries return the keyword-only hit n90, or fail like a missing
+    index while ``fulltext_missing`` is set.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.keywords = None
+        self.fulltext_missing = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, candidates, tenant, k, **params):
+        if "q" in params:
+            return self._fulltext(params["q"])
+        self.calls.append(candidates)
+        returned = min(candidates, 100)
+        hits = [
+            {"id": f"n{i}", "text": f"n{i}", "source": "", "score": 1.0 - i / 100}
+            for i in range(returned)
+            if (i % 10 == 0) == (tenant == "small")
+        ]
+        record = {"candidates": returned, "matched": len(hits), "hits": hits[:k]}
+        return SimpleNamespace(single=lambda: record)
+
+    def _fulltext(self, keywords):
+        if self.fulltext_missing:
+            raise RuntimeError("There is no such fulltext schema index: doc_text")
+        self.keywords = keywords
+        hits = [{"id": "n90", "text": "n90", "source": "", "score": 0.1, "text_score": 3.0}]
+        return SimpleNamespace(single=lambda: {"candidates": 1, "matched": 1, "hits": hits})
+
+
+@pytest.fixture
+def neo4j_session():
+    return FakeNeo4jSession()
+
+
+def _neo4j_store(session, pool=None, **settings):
+    """A Neo4jStore whose driver sessions are ``session``."""
+    from app.adapters.neo4j_store import Neo4jStore
+
+    cfg = SimpleNamespace(
+        uri="bolt://localhost",
+        user="u",
+        password="p",
+        database="neo4j",
+        vector_index="idx",
+        **settings,
+    )
+    store = Neo4jStore(cfg, pool=pool)
+    store.driver = SimpleNamespace(session=lambda database: session)
+    return store
+
+
+def test_neo4j_search_overfetches_until_k_tenant_hits(neo4j_session):
+    store = _neo4j_store(neo4j_session, search_growth_factor=4, search_max_candidates=1000)
+
+    hits = store.search("small", [0.1], k=5)
+
+    assert len(hits) == 5
+    assert neo4j_session.calls == [5, 20, 80]
+    assert store.get_search_metrics()["overfetch_ratio"] == 16.0
+
+
+def test_neo4j_search_starts_at_the_learned_fetch_ratio(neo4j_session):
+    store = _neo4j_store(neo4j_session, search_growth_factor=4, search_max_candidates=1000)
+    store.search("small", [0.1], k=5)
+    neo4j_session.calls.clear()
+
+    store.search("small", [0.1], k=5)
+
+    # One in ten candidates matched, so the search starts at 10 per hit
+    assert neo4j_session.calls == [50]
+
+
+def test_neo4j_search_fetch_ratio_recovers_after_capped_search(neo4j_session):
+    store = _neo4j_store(neo4j_session, search_max_candidates=1000)
+    store._tenant_fetch_ratio["small"] = 200.0  # as if a search had hit the cap
+
+    for _ in range(10):
+        store.search("small", [0.1], k=5)
+
+    assert store._tenant_fetch_ratio["small"] < 20
+
+
+def test_neo4j_asearch_uses_pool_with_same_overfetch(neo4j_session):
+    class _FakePool:
+        async def execute_query(self, query, parameters, database=None):
+            return [neo4j_session.run(query, **parameters).single()]
+
+    store = _neo4j_store(neo4j_session, pool=_FakePool())
+    store.driver = None  # every query must go through the pool
+
+    hits = asyncio.run(store.asearch("small", [0.1], k=5))
+
+    assert [h["text"] for h in hits] == ["n0", "n10", "n20", "n30", "n40"]
+    assert neo4j_session.calls == [5, 20, 80]
+
+
+def test_neo4j_pool_leaves_tls_to_secure_uri_schemes():
+    from app.adapters.neo4j_pool import Neo4jConnectionPool
+
+    assert "encrypted" not in Neo4jConnectionPool("neo4j+s://db.example:7687", "u", "p")._config
+    assert "encrypted" not in Neo4jConnectionPool("bolt+ssc://db.example", "u", "p")._config
+    assert Neo4jConnectionPool("bolt://localhost:7687", "u", "p")._config["encrypted"] is False
+
+
+def test_neo4j_asearch_falls_back_to_sync_driver_when_pool_is_unusable(neo4j_session):
+    from neo4j.exceptions import ConfigurationError
+
+    class _BrokenPool:
+        async def execute_query(self, query, parameters, database=None):
+            raise ConfigurationError("encrypted is not allowed with neo4j+s://")
+
+    store = _neo4j_store(neo4j_session, pool=_BrokenPool())
+
+    hits = asyncio.run(store.asearch("small", [0.1], k=5))
+
+    assert len(hits) == 5
+    assert store.pool is None  # later searches skip the pool
+
+
+class FakeSemanticCache:
+    """Returns the most recently stored entry for any query."""
+
+    def __init__(self):
+        self.entry = None
+
+    async def get_similar(self, query_embedding, threshold=0.95, tenant_id=None):
+        return self.entry
+
+    async def store(self, query, query_embedding, response, metadata):
+        self.entry = {"response": response, "metadata": metadata, "similarity": 1.0}
+        return True
+
+
+@pytest.fixture
+def answer_cache():
+    from app.adapters.answer_cache import SemanticAnswerCache
+    from app.adapters.background_loop import BackgroundLoop
+
+    loop = BackgroundLoop()
+    cache = SemanticAnswerCache(FakeSemanticCache(), loop)
+    yield cache
+    loop.stop()
+
+
+def _store_and_wait(cache, hits, k):
+    cache.store("demo", "q", [1.0, 0.0], "answer", hits, k)
+    cache.loop.run(asyncio.sleep(0))  # stores are fire-and-forget on the loop
+
+
+def test_answer_cache_keeps_page_citations(answer_cache):
+    hit = {"id": "1", "text": "t", "source": "s", "score": 0.9, "page_start": 3, "page_end": 4}
+    _store_and_wait(answer_cache, [{**hit, "embedding": [0.1]}], k=5)
+
+    assert answer_cache.lookup("demo", [1.0, 0.0], k=5)["hits"] == [hit]
+
+
+def test_answer_cache_misses_for_a_different_k(answer_cache):
+    _store_and_wait(answer_cache, [], k=3)
+
+    assert answer_cache.lookup("demo", [1.0, 0.0], k=10) is None
+    assert answer_cache.lookup("demo", [1.0, 0.0], k=3)["answer"] == "answer"
+
+
+def test_openai_embed_batch_packs_by_tokens_and_preserves_order(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    from app.adapters.openai_llm import OpenAIEmbedder
+
+    embedder = OpenAIEmbedder("text-embedding-3-small", max_batch_tokens=50, max_concurrency=3)
+    embedder._count_tokens = len
+    calls = []
+
+    class _FakeEmbeddings:
+        def embed_documents(self, texts):
+            calls.append(list(texts))
+            return [[float(t)] for t in texts]
+
+    embedder.emb = _FakeEmbeddings()
+    chunks = [str(i).rjust(10, "0") for i in range(12)]
+
+    vectors = embedder.embed_batch(chunks)
+
+    assert vectors == [[float(c)] for c in chunks]
+    assert len(calls) == 3 and all(len(batch) <= 5 for batch in calls)
+
+
+class CountingEmbedder:
+    """Embeds a text as its length and records every text it embedded."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return [float(len(text))]
+
+    def embed_batch(self, chunks):
+        self.embedded.extend(chunks)
+        return [[float(len(c))] for c in chunks]
+
+
+class FakeVectorCache:
+    """Redis embedding tier holding one pre-cached text."""
+
+    def __init__(self):
+        self.data = {"from redis": [42.0]}
+
+    async def get_batch_embeddings(self, texts):
+        return {t: self.data[t] for t in texts if t in self.data}
+
+    async def store_batch_embeddings(self, embeddings):
+        self.data.update(embeddings)
+        return True
+
+
+@pytest.fixture
+def counting_embedder():
+    return CountingEmbedder()
+
+
+@pytest.fixture
+def vector_cache():
+    return FakeVectorCache()
+
+
+@pytest.fixture
+def caching_embedder(counting_embedder, vector_cache):
+    from app.adapters.caching_embedder import CachingEmbedder
+
+    embedder = CachingEmbedder(counting_embedder, "model", vector_cache=vector_cache)
+    yield embedder
+    embedder.loop.stop()
+
+
+def test_caching_embedder_embeds_normalised_duplicates_once(caching_embedder, counting_embedder):
+    vectors = caching_embedder.embed_batch(["hello  world", "from redis", "hello world", "new"])
+
+    assert vectors == [[12.0], [42.0], [12.0], [3.0]]
+    # Whitespace-normalised duplicates are embedded once; Redis hits not at all
+    assert counting_embedder.embedded == ["hello  world", "new"]
+
+
+def test_caching_embedder_serves_repeats_from_memory(caching_embedder, counting_embedder):
+    caching_embedder.embed_batch(["hello  world", "from redis", "new"])
+
+    assert caching_embedder.embed_query("new") == [3.0]
+    assert counting_embedder.embedded == ["hello  world", "new"]
+    assert caching_embedder.stats == {"memory_hits": 1, "redis_hits": 1, "misses": 2}
+
+
+def test_caching_embedder_backfills_misses_into_redis(caching_embedder, vector_cache):
+    caching_embedder.embed_batch(["hello  world"])
+
+    caching_embedder.loop.run(asyncio.sleep(0.01))  # backfill runs in the background
+    assert vector_cache.data["hello world"] == [12.0]
+
+
+def test_vector_codec_roundtrip_is_compact_and_zero_copy():
+    import json
+
+    import numpy as np
+
+    from app.adapters.redis_cache import decode_vector, encode_vector
+
+    vector = np.linspace(-1, 1, 1536, dtype=np.float32)
+    blob = encode_vector(vector, model="text-embedding-3-small")
+    decoded, model = decode_vector(blob)
+
+    assert model == "text-embedding-3-small"
+    assert decoded.dtype == np.float32 and not decoded.flags.owndata
+    np.testing.assert_array_equal(decoded, vector)
+    assert len(blob) < len(json.dumps(vector.tolist())) // 2
+
+
+def test_vector_codec_float16_roundtrip_is_close():
+    import numpy as np
+
+    from app.adapters.redis_cache import decode_vector, encode_vector
+
+    vector = np.linspace(-1, 1, 1536, dtype=np.float32)
+
+    half, _ = decode_vector(encode_vector(vector, dtype="float16", model="odd"))
+
+    assert half.dtype == np.float16
+    np.testing.assert_allclose(half, vector, atol=1e-3)
+
+
+class FakeRedisPipeline:
+    def __init__(self, client):
+        self.client, self.ops = client, []
+
+    def __len__(self):
+        return len(self.ops)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.ops.append((name, args, kwargs))
+
+    async def execute(self):
+        ops, self.ops = self.ops, []
+        return [await getattr(self.client, name)(*a, **kw) for name, a, kw in ops]
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio for the cache adapters (bytes in, bytes out)."""
+
+    def __init__(self):
+        self.data, self.calls = {}, []
+
+    @staticmethod
+    def _b(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def pipeline(self):
+        return FakeRedisPipeline(self)
+
+    async def get(self, key):
+        self.calls.append("get")
+        return self.data.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = self._b(value)
+
+    async def incr(self, key):
+        self.data[key] = self._b(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    async def delete(self, *keys):
+        keys = [k.decode() if isinstance(k, bytes) else k for k in keys]
+        return sum(self.data.pop(k, None) is not None for k in keys)
+
+    async def expire(self, key, ttl):
+        return key in self.data
+
+    async def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({f: self._b(v) for f, v in mapping.items()})
+
+    async def hget(self, key, field):
+        self.calls.append("hget")
+        return self.data.get(key, {}).get(field)
+
+    async def hmget(self, key, *fields):
+        return [self.data.get(key, {}).get(f) for f in fields]
+
+    async def hincrby(self, key, field, amount):
+        entry = self.data.setdefault(key, {})
+        entry[field] = self._b(int(entry.get(field, 0)) + amount)
+        return int(entry[field])
+
+    async def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(self._b(m) for m in members)
+
+    async def srem(self, key, *members):
+        self.data.get(key, set()).difference_update(self._b(m) for m in members)
+
+    async def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+
+class FakeRedisPool:
+    def __init__(self):
+        self.client = FakeRedis()
+
+    async def get_client(self):
+        return self.client
+
+
+@pytest.fixture
+def redis_pool():
+    return FakeRedisPool()
+
+
+@pytest.fixture
+def semantic_caches(redis_pool):
+    """A writer and a reader cache on one Redis, with three entries in two tenants."""
+    import numpy as np
+
+    from app.adapters.redis_cache import SemanticCache
+
+    writer, reader = SemanticCache(redis_pool), SemanticCache(redis_pool)
+
+    async def fill():
+        await writer.store("q1", np.array([1.0, 0, 0]), "a1", {"tenant_id": "acme"})
+        await writer.store("q2", np.array([0, 1.0, 0]), "a2", {"tenant_id": "acme"})
+        await writer.store("q1", np.array([1.0, 0, 0]), "b1", {"tenant_id": "other"})
+
+    asyncio.run(fill())
+    return writer, reader
+
+
+def test_semantic_cache_is_tenant_partitioned(semantic_caches):
+    import numpy as np
+
+    _, reader = semantic_caches
+
+    async def lookups():
+        return (
+            await reader.get_similar(np.array([0.99, 0.05, 0]), 0.9, tenant_id="acme"),
+            await reader.get_similar(np.array([1.0, 0, 0]), 0.9, tenant_id="other"),
+            await reader.get_similar(np.array([0, 0, 1.0]), 0.9, tenant_id="acme"),
+        )
+
+    acme, other, miss = asyncio.run(lookups())
+
+    assert acme["response"] == "a1" and acme["hits"] == 1
+    assert other["response"] == "b1"
+    assert miss is None
+
+
+def test_semantic_cache_syncs_only_new_entries(semantic_caches, redis_pool):
+    import numpy as np
+
+    writer, reader = semantic_caches
+    calls = redis_pool.client.calls
+
+    async def scenario():
+        await reader.get_similar(np.array([1.0, 0, 0]), 0.9, tenant_id="acme")
+        # Unchanged partitions are not re-fetched
+        calls.clear()
+        await reader.get_similar(np.array([0, 1.0, 0]), 0.9, tenant_id="acme")
+        assert calls == ["get"]
+        # A new entry fetches only its own vector
+        await writer.store("q3", np.array([0, 0, 1.0]), "a3", {"tenant_id": "acme"})
+        calls.clear()
+        hit = await reader.get_similar(np.array([0, 0, 1.0]), 0.9, tenant_id="acme")
+        assert hit["response"] == "a3" and calls.count("hget") == 1
+
+    asyncio.run(scenario())
+
+
+def test_semantic_cache_clear_tenant_removes_its_entries(semantic_caches):
+    import numpy as np
+
+    writer, reader = semantic_caches
+
+    async def scenario():
+        await reader.get_similar(np.array([1.0, 0, 0]), 0.9, tenant_id="acme")
+        cleared = await writer.clear_tenant_cache("acme")
+        return cleared, await reader.get_similar(np.array([1.0, 0, 0]), 0.9, tenant_id="acme")
+
+    assert asyncio.run(scenario()) == (2, None)
+
+
+class FakeIngestRag:
+    """Records ingested titles and texts; titles in ``failures`` fail once."""
+
+    def __init__(self, failures=()):
+        self.order, self.texts, self.failures = [], {}, set(failures)
+
+    def ingest_text(self, title, text, tenant_id, incremental=False):
+        if title in self.failures:
+            self.failures.discard(title)
+            raise RuntimeError("embedding API down")
+        self.order.append(title)
+        self.texts[title] = text
+        return {"source_id": f"src-{title}", "chunks_created": 1}
+
+
+@pytest.fixture
+def ingest_rag():
+    return FakeIngestRag()
+
+
+async def _wait_for_jobs(jobs, job_ids, status="completed"):
+    for _ in range(200):
+        if all(jobs.get_job(i)["status"] == status for i in job_ids):
+            return
+        await asyncio.sleep(0.01)
+
+
+def test_ingest_pool_round_robins_across_tenants(ingest_rag):
+    from app.adapters.ingest_job_repo import InMemoryIngestJobRepo
+    from app.adapters.ingest_queue import IngestWorkerPool
+
+    jobs = InMemoryIngestJobRepo()
+
+    async def scenario():
+        pool = IngestWorkerPool(jobs, ingest_rag, workers=1)
+        ids = [await pool.submit("bulk", "u", f"bulk{i}", "x") for i in range(3)]
+        ids += [await pool.submit("small", "u", f"small{i}", "x") for i in range(2)]
+        await pool.start()
+        await _wait_for_jobs(jobs, ids)
+        await pool.stop()
+
+    asyncio.run(scenario())
+
+    assert ingest_rag.order == ["bulk0", "small0", "bulk1", "small1", "bulk2"]
+
+
+def test_ingest_pool_rejects_jobs_beyond_the_queue_limit(ingest_rag):
+    from app.adapters.ingest_job_repo import InMemoryIngestJobRepo
+    from app.adapters.ingest_queue import IngestQueueFull, IngestWorkerPool
+
+    async def scenario():
+        pool = IngestWorkerPool(InMemoryIngestJobRepo(), ingest_rag, max_queue_size=2)
+        await pool.submit("t", "u", "first", "x")
+        await pool.submit("t", "u", "second", "x")
+        with pytest.raises(IngestQueueFull):
+            await pool.submit("t", "u", "overflow", "x")
+
+    asyncio.run(scenario())
+
+
+def test_ingest_pool_retries_a_failed_job(ingest_rag):
+    from app.adapters.ingest_job_repo import InMemoryIngestJobRepo
+    from app.adapters.ingest_queue import IngestWorkerPool
+
+    jobs = InMemoryIngestJobRepo()
+    ingest_rag.failures.add("flaky")
+
+    async def scenario():
+        pool = IngestWorkerPool(jobs, ingest_rag, workers=1, retry_base_seconds=0.01)
+        job_id = await pool.submit("t", "u", "flaky", "x")
+        await pool.start()
+        await _wait_for_jobs(jobs, [job_id])
+        await pool.stop()
+        return job_id
+
+    job = jobs.get_job(asyncio.run(scenario()))
+
+    assert job["status"] == "completed" and job["attempts"] == 2
+
+
+def test_ingest_pool_recovers_jobs_whose_lease_lapsed(ingest_rag):
+    from app.adapters.ingest_job_repo import InMemoryIngestJobRepo
+    from app.adapters.ingest_queue import IngestWorkerPool
+
+    jobs = InMemoryIngestJobRepo()
+    # Leased by a worker that died
+    jobs.create_job(
+        {
+            "jobId": "orphan",
+            "tenantId": "t",
+            "userId": "u",
+            "title": "orphan",
+            "text": "x",
+            "status": "processing",
+            "leaseOwner": "dead",
+            "leaseExpiresAt": 0,
+            "updatedAt": 0,
+        }
+    )
+
+    async def scenario():
+        pool = IngestWorkerPool(jobs, ingest_rag, workers=1)
+        await pool.start()
+        recovered = await pool.recover()
+        await _wait_for_jobs(jobs, ["orphan"])
+        await pool.stop()
+        return recovered
+
+    assert asyncio.run(scenario()) == 1
+    assert jobs.get_job("orphan")["sourceId"] == "src-orphan"
+
+
+def test_ingest_pool_keeps_payload_out_of_the_job_record(tmp_path, ingest_rag):
+    from app.adapters.ingest_job_repo import InMemoryIngestJobRepo
+    from app.adapters.ingest_payloads import LocalIngestPayloadStore
+    from app.adapters.ingest_queue import IngestWorkerPool
+
+    jobs, payloads = InMemoryIngestJobRepo(), LocalIngestPayloadStore(str(tmp_path))
+    text = "x" * 2_000_000  # more than a Firestore document may hold
+
+    async def scenario():
+        pool = IngestWorkerPool(jobs, ingest_rag, workers=1, payloads=payloads)
+        job_id = await pool.submit("t", "u", "Big", text)
+        queued = dict(jobs.get_job(job_id))
+        await pool.start()
+        await _wait_for_jobs(jobs, [job_id])
+        await pool.stop()
+        return queued
+
+    queued = asyncio.run(scenario())
+
+    assert "text" not in queued and queued["payloadRef"]
+    assert ingest_rag.texts["Big"] == text
+    assert list(tmp_path.iterdir()) == []  # deleted once the job completed
+
+
+def _write_pdf(path, pages):
+    """Write a minimal PDF with one line of Helvetica text per page."""
+    objs = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objs.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objs)} 0 R "
+            "/Resources << /Font << /F1 3 0 R >> >> >>"
+        )
+        kids.append(f"{len(objs)} 0 R")
+    objs[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out, offsets = "%PDF-1.4\n", []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets)
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    path.write_text(out)
+
+
+@pytest.fixture
+def deck_pdf(tmp_path):
+    pdf = tmp_path / "deck.pdf"
+    _write_pdf(pdf, [f"Page {i} covers topic {i}." for i in range(1, 13)])
+    return pdf
+
+
+def test_document_extractor_parallel_pages_arrive_in_order(deck_pdf):
+    from app.adapters.document_extractor import DocumentExtractor
+
+    # Large PDFs go through worker processes
+    extractor = DocumentExtractor(max_workers=2, parallel_min_pages=8, pages_per_task=3)
+    try:
+        pages = list(extractor.iter_pages(str(deck_pdf), ".pdf"))
+    finally:
+        extractor.close()
+
+    assert [n for n, _ in pages] == list(range(1, 13))
+    assert pages[4][1] == "Page 5 covers topic 5."
+
+
+def _stub_rag(store, max_tokens, embedder=None, **options):
+    """A rag-only RagService with the stub LLM and embedder over ``store``."""
+    from app.adapters.stub_llm import StubChat, StubEmbedder
+    from app.domain.chunking import TokenChunker
+    from app.domain.services import RagService
+
+    return RagService(
+        store,
+        StubChat(),
+        embedder or StubEmbedder("stub"),
+        rag_only=True,
+        chunker=TokenChunker(max_tokens=max_tokens, overlap_tokens=0),
+        **options,
+    )
+
+
+def test_ingested_chunks_and_hits_carry_their_pages(tmp_path, deck_pdf):
+    from app.adapters.document_extractor import DocumentExtractor
+
+    store = MockStore(str(tmp_path / "store"))
+    rag = _stub_rag(store, max_tokens=14, extractor=DocumentExtractor(max_workers=1))
+
+    result = rag.ingest_file(str(deck_pdf), "Deck", "demo")
+
+    assert result["success"] and result["chunks_created"] == 6
+    pages_by_text = {c["content"]: c["metadata"] for c in store._chunks.values()}
+    meta = pages_by_text["Page 5 covers topic 5.\nPage 6 covers topic 6."]
+    assert (meta["page_start"], meta["page_end"]) == (5, 6)
+    hit = store.search("demo", rag.embed.embed_query("topic"), k=1)[0]
+    assert hit["page_end"] == hit["page_start"] + 1
+
+
+def test_docx_headings_and_bullets_are_separate_segments(tmp_path):
+    import docx
+
+    from app.adapters.document_extractor import DocumentExtractor
+    from app.domain.chunking import TokenChunker
+
+    document = docx.Document()
+    document.add_heading("Overview", level=1)
+    document.add_paragraph("Alpha item", style="List Bullet")
+    document.add_paragraph("Beta item", style="List Bullet")
+    document.save(str(tmp_path / "notes.docx"))
+
+    pages = DocumentExtractor().iter_pages(str(tmp_path / "notes.docx"), ".docx")
+    segments = [text.strip() for text, _ in TokenChunker()._segments(t for _, t in pages)]
+
+    assert segments == ["Overview", "Alpha item", "Beta item"]
+
+
+PLAN_V1 = "Alpha beta gamma. Delta epsilon zeta. Eta theta iota. Kappa lambda mu."
+
+
+@pytest.fixture
+def plan_rag(tmp_path):
+    """A rag service with one sentence per chunk that counts embedded chunks."""
+    from app.adapters.stub_llm import StubEmbedder
+
+    class CountingStubEmbedder(StubEmbedder):
+        embedded = 0
+
+        def embed_batch(self, chunks):
+            self.embedded += len(chunks)
+            return super().embed_batch(chunks)
+
+    return _stub_rag(MockStore(str(tmp_path)), max_tokens=7, embedder=CountingStubEmbedder("stub"))
+
+
+def test_incremental_reingest_of_unchanged_text_embeds_nothing(plan_rag):
+    first = plan_rag.ingest_text("Plan", PLAN_V1, "demo", incremental=True)
+    assert (first["chunks_created"], plan_rag.embed.embedded) == (4, 4)
+
+    again = plan_rag.ingest_text("Plan", PLAN_V1, "demo", incremental=True)
+
+    assert again["source_id"] == first["source_id"]
+    assert (again["chunks_created"], again["chunks_unchanged"]) == (0, 4)
+    assert plan_rag.embed.embedded == 4
+
+
+def test_incremental_reingest_embeds_edits_and_removes_dropped_chunks(plan_rag):
+    first = plan_rag.ingest_text("Plan", PLAN_V1, "demo", incremental=True)
+
+    # One sentence edited, one dropped
+    v2 = "Alpha beta gamma. Delta epsilon ZETA. Eta theta iota."
+    update = plan_rag.ingest_text("Plan", v2, "demo", incremental=True)
+
+    assert (update["chunks_created"], update["chunks_unchanged"]) == (1, 2)
+    assert update["chunks_removed"] == 2
+    assert plan_rag.embed.embedded == 5
+    store = plan_rag.store
+    manifest = store.get_source_manifest("demo", first["source_id"])
+    assert sorted(store._chunks[c]["content"] for c in manifest) == sorted(
+        ["Alpha beta gamma.", "Delta epsilon ZETA.", "Eta theta iota."]
+    )
+
+
+def test_identical_chunks_from_another_source_are_stored_once(plan_rag):
+    plan_rag.ingest_text("Plan", "Alpha beta gamma. Delta epsilon zeta.", "demo")
+
+    plan_rag.ingest_text("Copy", "Alpha beta gamma.", "demo")
+
+    query = plan_rag.embed.embed_query("Alpha beta gamma.")
+    hits = plan_rag.store.search("demo", query, k=10)
+    assert len({h["id"] for h in hits}) == len(hits) == 2
+
+
+def test_mock_store_rejects_extending_another_tenants_source(tmp_path):
+    store = MockStore(str(tmp_path))
+    source_id = store.upsert_chunks("acme", "Doc", ["a"], [[1.0, 0.0]])
+
+    with pytest.raises(ValueError):
+        store.upsert_chunks("other", "Doc", ["b"], [[0.0, 1.0]], source_id=source_id)
+
+    manifest = store.get_source_manifest("acme", source_id)
+    assert [store._chunks[c]["content"] for c in manifest] == ["a"]
+    assert store.search("other", [0.0, 1.0], k=5) == []
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Six two-sentence documents sharing their second sentence, one empty file, one image."""
+    corpus = tmp_path / "corpus"
+    (corpus / "sub").mkdir(parents=True)
+    for i in range(6):
+        (corpus / "sub" / f"doc{i}.txt").write_text(f"Document {i} text. It has two sentences.")
+    (corpus / "empty.txt").write_text("")
+    (corpus / "image.png").write_bytes(b"\x89PNG")
+    return corpus
+
+
+@pytest.fixture
+def batch_pipeline(tmp_path):
+    from app.adapters.batch_ingest import BatchIngestPipeline
+    from app.adapters.ingest_job_repo import JsonFileIngestJobRepo
+
+    rag = _stub_rag(MockStore(str(tmp_path / "store")), max_tokens=6)
+    jobs = JsonFileIngestJobRepo(str(tmp_path / "jobs.json"))
+    return BatchIngestPipeline(rag, jobs, workers=2, group_size=3, checkpoint_every=2)
+
+
+def test_batch_ingest_pipeline_ingests_matching_files(batch_pipeline, corpus):
+    job = batch_pipeline.create_job("demo", "u1", str(corpus), "**/*.txt")
+    assert job["total"] == 7
+
+    done = batch_pipeline.run(job["jobId"])
+
+    assert done["status"] == "completed"
+    assert (done["processed"], done["checkpoint"], done["failed"]) == (7, 7, 0)
+    assert done["chunksCreated"] == 12
+    assert len(batch_pipeline.rag.store._chunks) == 7  # The shared sentence is stored once
+
+
+def test_batch_ingest_pipeline_resumes_from_its_checkpoint(tmp_path, batch_pipeline, corpus):
+    from app.adapters.ingest_job_repo import JsonFileIngestJobRepo
+
+    job_id = batch_pipeline.create_job("demo", "u1", str(corpus), "**/*.txt")["jobId"]
+    batch_pipeline.run(job_id)
+
+    # Progress survives a restart: the repo reloads it and a resumed run skips done files
+    assert JsonFileIngestJobRepo(str(tmp_path / "jobs.json")).get_job(job_id)["checkpoint"] == 7
+    batch_pipeline.jobs.update_job(job_id, {"checkpoint": 4, "status": "running"})
+    resumed = batch_pipeline.run(job_id)
+
+    assert (resumed["processed"], resumed["chunksCreated"]) == (7, 12)
+
+
+def test_batch_jobs_are_never_claimed_by_the_ingest_worker_pool(batch_pipeline, corpus):
+    job = batch_pipeline.create_job("demo", "u1", str(corpus), "**/*.txt")
+    later = job["createdAt"] + 3_600_000
+
+    # Even a job left "queued" by an older version is not taken for a text-ingest job
+    batch_pipeline.jobs.update_job(job["jobId"], {"status": "queued"})
+
+    assert batch_pipeline.jobs.list_stale_jobs(later, grace_ms=0) == []
+    assert not batch_pipeline.jobs.claim_job(job["jobId"], "worker", 60_000, later)
+
+
+def test_batch_job_that_cannot_start_is_marked_rejected(batch_pipeline, corpus):
+    job = batch_pipeline.create_job("demo", "u1", str(corpus), "**/*.txt")
+    assert job["status"] == "created"
+
+    batch_pipeline.reject(job["jobId"], "2 batch ingest jobs are already running")
+
+    assert batch_pipeline.jobs.get_job(job["jobId"])["status"] == "rejected"
+
+
+def test_batch_ingest_pipeline_rerun_embeds_nothing(batch_pipeline, corpus):
+    batch_pipeline.run(batch_pipeline.create_job("demo", "u1", str(corpus), "**/*.txt")["jobId"])
+
+    again = batch_pipeline.create_job("demo", "u1", str(corpus), "**/*.txt")
+    done = batch_pipeline.run(again["jobId"])
+
+    assert (done["status"], done["chunksCreated"]) == ("completed", 0)
+    assert len(batch_pipeline.rag.store._chunks) == 7
+
+
+REPORT_CHUNKS = [
+    "Quarterly revenue grew on strong demand.",
+    "Revenue guidance was raised for next year.",
+    "Margins improved as revenue scaled.",
+    "Part XR-200 is back-ordered until March.",
+]
+
+
+@pytest.fixture
+def report_store(tmp_path):
+    store = MockStore(str(tmp_path))
+    embeddings = [[1.0, 0.1], [0.9, 0.2], [0.8, 0.3], [0.0, 1.0]]
+    store.upsert_chunks("demo", "Report", REPORT_CHUNKS, embeddings)
+    return store
+
+
+def test_mock_store_hybrid_search_finds_exact_terms(report_store):
+    query_vector = [1.0, 0.0]
+    # Vector search alone ranks the part number last
+    assert report_store.search("demo", query_vector, k=2)[0]["text"] == REPORT_CHUNKS[0]
+
+    hits = report_store.search_hybrid("demo", "when is XR-200 available", query_vector, k=2)
+
+    assert hits[0]["text"] == REPORT_CHUNKS[3]
+    assert hits[0]["text_score"] > 0 and "rrf_score" in hits[0]
+    assert hits[0]["score"] == pytest.approx(0.0, abs=1e-6)  # Cosine, not BM25
+
+
+def test_mock_store_keyword_index_follows_writes_and_deletions(report_store):
+    sid = report_store.upsert_chunks(
+        "demo", "Parts", ["Part XR-300 replaces XR-200."], [[0.5, 0.5]]
+    )
+    assert "XR-300" in report_store.search_hybrid("demo", "XR-300", [1.0, 0.0], k=1)[0]["text"]
+
+    report_store.remove_chunks("demo", sid, report_store.get_source_manifest("demo", sid))
+
+    remaining = report_store.search_hybrid("demo", "XR-300", [1.0, 0.0], k=4)
+    assert all("XR-300" not in h["text"] for h in remaining)
+
+
+def test_mock_store_hybrid_search_is_tenant_scoped(report_store):
+    assert report_store.search_hybrid("other", "XR-200", [1.0, 0.0], k=2) == []
+
+
+def test_neo4j_hybrid_search_fuses_fulltext_and_vector(neo4j_session):
+    hits = _neo4j_store(neo4j_session).search_hybrid("small", "order XR-200?", [0.1], k=3)
+
+    assert neo4j_session.keywords == "order xr 200"  # Lucene syntax is stripped
+    assert [h["id"] for h in hits] == ["n90", "n0", "n10"]
+
+
+def test_neo4j_hybrid_search_falls_back_to_vector_without_fulltext_index(neo4j_session):
+    neo4j_session.fulltext_missing = True
+
+    hits = _neo4j_store(neo4j_session).search_hybrid("small", "order XR-200?", [0.1], k=3)
+
+    assert [h["id"] for h in hits] == ["n0", "n10", "n20"]
+
+
+def test_neo4j_hybrid_search_remembers_a_missing_fulltext_index(neo4j_session):
+    store = _neo4j_store(neo4j_session)
+    neo4j_session.fulltext_missing = True
+    store.search_hybrid("small", "order XR-200?", [0.1], k=3)
+    neo4j_session.fulltext_missing = False
+
+    hits = store.search_hybrid("small", "order XR-200?", [0.1], k=3)
+
+    assert neo4j_session.keywords is None  # the full-text query was not sent again
+    assert [h["id"] for h in hits] == ["n0", "n10", "n20"]
+
+
+def test_neo4j_store_close_stops_fulltext_threads_and_driver(neo4j_session):
+    from types import SimpleNamespace
+
+    store = _neo4j_store(neo4j_session)
+    store.search_hybrid("small", "order XR-200?", [0.1], k=3)
+    executor, closed = store._hybrid_executor, []
+    store.driver = SimpleNamespace(close=lambda: closed.append(True))
+
+    store.close()
+
+    assert closed and executor._shutdown and store._hybrid_executor is None
+
+
+@pytest.fixture
+def ollama():
+    from app.adapters.ollama_llm import OllamaChat
+
+    llm = OllamaChat(base="http://ollama", model="llama3", num_ctx=8192, keep_alive="1h")
+    yield llm
+    llm.close()
+
+
+def test_ollama_chat_keeps_model_loaded_with_one_context_size(ollama, monkeypatch):
+    posted = []
+
+    class Resp:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"message": {"role": "assistant", "content": "See [1]."}}
+
+    def fake_post(url, json, timeout):
+        posted.append((url, json))
+        return Resp()
+
+    monkeypatch.setattr(ollama._session, "post", fake_post)
+    hits = [{"text": "Revenue grew 10%.", "source": "q3.pdf"}]
+
+    assert ollama.answer(hits, "How did revenue change?") == "See [1]."
+    url, payload = posted[0]
+    assert url == "http://ollama/api/chat"
+    assert [m["role"] for m in payload["messages"]] == ["system", "user"]
+    assert "[1] Revenue grew 10%. (src: q3.pdf)" in payload["messages"][1]["content"]
+    assert payload["keep_alive"] == "1h" and payload["options"] == {"num_ctx": 8192}
+
+
+def test_ollama_async_calls_share_one_client_and_bound_concurrency(ollama, monkeypatch):
+    import json
+
+    import httpx
+
+    from app.adapters import ollama_llm
+
+    active, peak, clients = 0, 0, []
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        messages = json.loads(request.content)["messages"]
+        await asyncio.sleep(0.01 * (5 - len(messages)))
+        active -= 1
+        return httpx.Response(200, json={"message": {"content": str(len(messages))}})
+
+    real_client = httpx.AsyncClient
+
+    def client_factory(**kwargs):
+        clients.append(real_client(transport=httpx.MockTransport(handler), **kwargs))
+        return clients[-1]
+
+    monkeypatch.setattr(ollama_llm.httpx, "AsyncClient", client_factory)
+    ollama.max_parallel = 2
+    conversations = [[{"role": "user", "content": "q"}] * n for n in range(1, 5)]
+
+    async def scenario():
+        replies = await ollama.abatch_chat(conversations, max_concurrency=4)
+        await ollama.aclose()
+        return replies
+
+    assert asyncio.run(scenario()) == ["1", "2", "3", "4"]
+    assert peak == 2 and len(clients) == 1
+
+
+def test_conversation_history_returns_newest_messages_in_order(tmp_path):
+    from datetime import datetime
+
+    from app.adapters.mock_store import MockConversationStore
+    from app.domain.models import ConversationMessage
+
+    store = MockConversationStore(str(tmp_path))
+    conv_id = store.create_conversation("demo", "u1", "Thread")
+    same_time = datetime(2025, 1, 1)  # sequence numbers, not clock ties, decide order
+    for i in range(8):
+        message = ConversationMessage(
+            id=f"m{i}",
+            conversation_id=conv_id,
+            role="user" if i % 2 == 0 else "assistant",
+            content=f"message {i}",
+            timestamp=same_time,
+        )
+        store.add_message(conv_id, message)
+
+    history = store.get_conversation_history(conv_id, limit=3)
+
+    assert [m.content for m in history] == ["message 5", "message 6", "message 7"]
+    assert len(store.get_conversation_history(conv_id, limit=50)) == 8
+
+
+def test_neo4j_conversation_store_requires_unique_conversation_ids():
+    from types import SimpleNamespace
+
+    from app.adapters.neo4j_conversation_store import Neo4jConversationStore
+
+    statements = []
+
+    class Session:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def run(self, query, **params):
+            statements.append(" ".join(query.split()))
+
+    driver = SimpleNamespace(session=lambda database: Session())
+    store = Neo4jConversationStore(SimpleNamespace(database="neo4j"), driver=driver)
+    store.ensure_indexes()
+
+    # The old plain index on Conversation.id would block the constraint
+    assert statements[0] == "DROP INDEX conversation_id IF EXISTS"
+    assert "REQUIRE c.id IS UNIQUE" in statements[1]
+
+
+@pytest.fixture
+def legacy_data_dir(tmp_path):
+    """A data directory written by the old whole-file JSON stores: one message."""
+    import json
+
+    stamp = "2025-01-01T00:00:00"
+    conversation = {"id": "c1", "tenant_id": "demo", "user_id": "u1", "title": "Old"}
+    conversation.update(created_at=stamp, updated_at=stamp)
+    message = {"id": "m0", "conversation_id": "c1", "role": "user", "content": "hello"}
+    message.update(timestamp=stamp, metadata={})
+    (tmp_path / "conversations.json").write_text(json.dumps({"c1": conversation}))
+    (tmp_path / "messages.json").write_text(json.dumps({"m0": message}))
+    return tmp_path
+
+
+def _reply(content):
+    from datetime import datetime
+
+    from app.domain.models import ConversationMessage
+
+    return ConversationMessage(
+        id="m1", conversation_id="c1", role="assistant", content=content, timestamp=datetime.now()
+    )
+
+
+def test_local_conversation_store_imports_legacy_json(legacy_data_dir):
+    from app.adapters.mock_store import MockConversationStore
+
+    store = MockConversationStore(str(legacy_data_dir))
+
+    assert store.list_conversations("demo", "u1")[0].metadata["message_count"] == 1
+    assert [m.content for m in store.get_conversation_history("c1")] == ["hello"]
+
+
+def test_local_conversation_turn_appends_one_jsonl_line(legacy_data_dir):
+    import json
+
+    from app.adapters.mock_store import MockConversationStore
+
+    MockConversationStore(str(legacy_data_dir)).record_turn(
+        "c1", "demo", "u1", "Old", [_reply("hi")]
+    )
+
+    lines = (legacy_data_dir / "messages.jsonl").read_text().splitlines()
+    assert len(lines) == 2 and list(json.loads(lines[-1])["put"]) == ["m1"]
+
+
+def test_local_conversation_store_reopens_from_its_logs(legacy_data_dir):
+    from app.adapters.mock_store import MockConversationStore
+
+    MockConversationStore(str(legacy_data_dir)).record_turn(
+        "c1", "demo", "u1", "Old", [_reply("hi")]
+    )
+
+    reopened = MockConversationStore(str(legacy_data_dir))
+    assert [m.content for m in reopened.get_conversation_history("c1")] == ["hello", "hi"]
+    assert reopened.list_conversations("demo", "u1")[0].metadata["message_count"] == 2
+    assert reopened.list_conversations("demo", "u2") == []
@@ -1,34 +1,91 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
 from app.domain.services import RagService, TenantService
 
 
 class DummyStore:
     def __init__(self, hits=None):
         self._hits = hits or []
+        self.upserts = []
 
     def search(self, tenant_id: str, query_vector, k: int = 5):
         return self._hits[:k]
 
-    def upsert_chunks(self, tenant_id: str, title: str, chunks, embeddings):
-        return "source-123"
+    async def asearch(self, tenant_id: str, query_vector, k: int = 5):
+        return self.search(tenant_id, query_vector, k)
+
+    def upsert_chunks(self, tenant_id: str, title: str, chunks, embeddings, source_id=None):
+        self.upserts.append((len(chunks), source_id))
+        return source_id or "source-123"
 
     def get_recent_sources(self, tenant_id: str, limit: int = 20):
-        return [{"id": "s1", "title": "Doc", "created_at": "", "chunk_count": 3, "type": "document"}]
+        return [
+            {"id": "s1", "title": "Doc", "created_at": "", "chunk_count": 3, "type": "document"}
+        ]
 
 
 class DummyEmbedder:
+    def __init__(self):
+        self.queries = []
+
     def embed_query(self, text: str):
+        self.queries.append(text)
         return [0.1, 0.2, 0.3]
 
     def embed_batch(self, chunks):
         return [[0.1] * 3 for _ in chunks]
 
+    async def aembed_query(self, text: str):
+        return self.embed_query(text)
+
 
 class DummyLLM:
+    def __init__(self):
+        self.calls = 0
+
     def answer(self, hits, question: str, rag_only: bool = False) -> str:
+        self.calls += 1
         if rag_only:
             return "RAG_ONLY"
         return f"Answer to: {question} with {len(hits)} hits"
 
+    async def aanswer(self, hits, question: str, rag_only: bool = False) -> str:
+        return self.answer(hits, question, rag_only)
+
+    async def astream_answer(self, hits, question: str, rag_only: bool = False):
+        for word in self.answer(hits, question, rag_only).split(" "):
+            yield word + " "
+
+    def chat(self, messages):
+        self.calls += 1
+        return f"Chat answer with {len(messages)} messages"
+
+    async def achat(self, messages):
+        return self.chat(messages)
+
+
+@pytest.fixture
+def store():
+    return DummyStore(hits=[{"id": "1", "text": "alpha", "source": "doc1", "score": 0.8}])
+
+
+@pytest.fixture
+def embedder():
+    return DummyEmbedder()
+
+
+@pytest.fixture
+def llm():
+    return DummyLLM()
+
+
+@pytest.fixture
+def rag(store, llm, embedder):
+    return RagService(store=store, llm=llm, embed=embedder)
+
 
 def test_rag_service_query_basic():
     store = DummyStore(hits=[{"id": "1", "text": "alpha", "source": "doc1", "score": 0.8}])
@@ -53,6 +110,231 @@ def test_rag_service_ingest_text():
     assert result["source_id"] == "source-123"
 
 
+def test_rag_service_async_query_matches_sync(rag):
+    import asyncio
+
+    req = type("Req", (), {"query": "hello", "tenant_id": "demo", "context_limit": 5})
+
+    resp = asyncio.run(rag.aquery_documents(request=req))
+
+    assert resp.answer == rag.query_documents(request=req).answer
+    assert resp.sources[0].content == "alpha"
+
+
+def test_rag_service_stream_sends_sources_then_deltas(rag):
+    import asyncio
+
+    req = type("Req", (), {"query": "hello", "tenant_id": "demo", "context_limit": 5})
+
+    async def collect():
+        return [event async for event in rag.astream_query(request=req)]
+
+    events = asyncio.run(collect())
+
+    assert events[0][0] == "sources" and events[0][1][0].content == "alpha"
+    assert {name for name, _ in events[1:-1]} == {"delta"}
+    assert events[-1][0] == "done"
+    assert events[-1][1].answer == "".join(delta for _, delta in events[1:-1])
+
+
+CHUNKER_TEXT = "First sentence here. Second one! A third?\n\nNew paragraph " + "word " * 60 + "end."
+
+
+def test_token_chunker_respects_sentences_and_limits():
+    from app.domain.chunking import TokenChunker
+
+    chunker = TokenChunker(max_tokens=20, overlap_tokens=5)
+
+    chunks = chunker.chunk(CHUNKER_TEXT)
+
+    assert chunks[0] == "First sentence here. Second one! A third?"
+    assert all(chunker.count(c) <= 20 for c in chunks)
+
+
+def test_token_chunker_stream_matches_whole_text():
+    from app.domain.chunking import TokenChunker
+
+    chunker = TokenChunker(max_tokens=20, overlap_tokens=5)
+    # Feeding the text in arbitrary pieces yields the same chunks
+    pieces = [CHUNKER_TEXT[i : i + 7] for i in range(0, len(CHUNKER_TEXT), 7)]
+
+    assert list(chunker.chunk_stream(pieces)) == chunker.chunk(CHUNKER_TEXT)
+
+
+def test_token_chunker_rejects_overlap_as_large_as_the_chunk():
+    from app.domain.chunking import TokenChunker
+
+    with pytest.raises(ValueError):
+        TokenChunker(max_tokens=10, overlap_tokens=10)
+
+
+def test_rag_service_ingest_stream_appends_windows_to_one_source(store, llm, embedder):
+    from app.domain.chunking import TokenChunker
+
+    rag = RagService(
+        store=store,
+        llm=llm,
+        embed=embedder,
+        chunker=TokenChunker(max_tokens=4, overlap_tokens=0),
+        ingest_window=2,
+    )
+
+    result = rag.ingest_stream("T", ["One two three. " * 3, "Four five six. " * 2], "demo")
+    assert result["chunks_created"] == 5
+    assert store.upserts == [(2, None), (2, "source-123"), (1, "source-123")]
+
+
+class DummyAnswerCache:
+    def __init__(self):
+        self.entries = {}
+
+    def lookup(self, tenant_id, query_vector, k):
+        return self.entries.get((tenant_id, k))
+
+    def store(self, tenant_id, query, query_vector, answer, hits, k):
+        self.entries[(tenant_id, k)] = {"answer": answer, "hits": hits}
+
+    def invalidate_tenant(self, tenant_id):
+        self.entries = {key: e for key, e in self.entries.items() if key[0] != tenant_id}
+
+
+@pytest.fixture
+def dummy_answer_cache():
+    return DummyAnswerCache()
+
+
+CACHED_REQUEST = type(
+    "Req", (), {"query": "Q3 priorities?", "tenant_id": "demo", "context_limit": 5}
+)
+
+
+def test_rag_service_answer_cache_skips_llm_for_a_repeat(store, llm, embedder, dummy_answer_cache):
+    rag = RagService(store=store, llm=llm, embed=embedder, answer_cache=dummy_answer_cache)
+
+    first = rag.query_documents(request=CACHED_REQUEST)
+    second = rag.query_documents(request=CACHED_REQUEST)
+
+    assert llm.calls == 1
+    assert second.answer == first.answer and len(second.sources) == 1
+
+
+def test_rag_service_answer_cache_is_invalidated_on_ingest(
+    store, llm, embedder, dummy_answer_cache
+):
+    rag = RagService(store=store, llm=llm, embed=embedder, answer_cache=dummy_answer_cache)
+    rag.query_documents(request=CACHED_REQUEST)
+
+    rag.ingest_text(title="T", text="new facts", tenant_id="demo")
+    rag.query_documents(request=CACHED_REQUEST)
+
+    assert llm.calls == 2
+
+
+RRF_VECTOR = [{"id": "a", "score": 0.9}, {"id": "b", "score": 0.8}, {"id": "c", "score": 0.7}]
+RRF_KEYWORD = [{"id": "c", "text_score": 7.0}, {"id": "d", "text_score": 5.0}]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    from app.domain.retrieval import reciprocal_rank_fusion
+
+    fused = reciprocal_rank_fusion([RRF_VECTOR, RRF_KEYWORD], k=3, rrf_k=60)
+
+    # "c" is ranked by both lists, so it overtakes the vector-only top hit
+    assert [h["id"] for h in fused] == ["c", "a", "b"]
+    assert (fused[0]["score"], fused[0]["text_score"]) == (0.7, 7.0)  # Fields are merged
+    assert fused[0]["rrf_score"] == pytest.approx(1 / 63 + 1 / 61)
+
+
+def test_reciprocal_rank_fusion_weights_lists():
+    from app.domain.retrieval import reciprocal_rank_fusion
+
+    weighted = reciprocal_rank_fusion([RRF_VECTOR, RRF_KEYWORD], k=2, weights=[1.0, 0.0])
+
+    assert [h["id"] for h in weighted] == ["a", "b"]
+
+
+class LengthReranker:
+    """Prefers longer chunks; records how many candidates it saw."""
+
+    def __init__(self):
+        self.seen = 0
+
+    def rerank(self, query, hits, k):
+        self.seen = len(hits)
+        ranked = sorted(hits, key=lambda h: len(h["text"]), reverse=True)[:k]
+        return [{**h, "rerank_score": float(len(h["text"]))} for h in ranked]
+
+    async def arerank(self, query, hits, k):
+        return self.rerank(query, hits, k)
+
+
+@pytest.fixture
+def reranking_rag(llm, embedder):
+    hits = [{"id": str(i), "text": f"c{i} " + "x" * i, "source": "d"} for i in range(9)]
+    store = DummyStore(hits=hits)
+    return RagService(store, llm, embedder, reranker=LengthReranker(), rerank_candidates=6)
+
+
+def test_rag_service_reranks_overfetched_hits(reranking_rag):
+    req = type("Req", (), {"query": "hello", "tenant_id": "demo", "context_limit": 2})
+
+    resp = reranking_rag.query_documents(request=req)
+
+    assert reranking_rag.reranker.seen == 6
+    assert [d.id for d in resp.sources] == ["5", "4"]
+    assert resp.answer.endswith("with 2 hits")
+
+
+def test_rag_service_debug_query_reports_rerank_scores_and_timings(reranking_rag):
+    import asyncio
+
+    debug = asyncio.run(reranking_rag.adebug_query("hello", "demo", k=2))
+
+    assert [c["rerank_score"] for c in debug["retrieved_chunks"]] == [8.0, 7.0]
+    assert set(debug["timings_ms"]) == {"embed", "search", "rerank", "total"}
+
+
+@pytest.fixture
+def audit_hits():
+    """Two overlapping consecutive chunks (out of order), a copy of one, and a stray note."""
+    from app.domain.chunking import TokenChunker
+
+    text = " ".join(f"Finding {i} concerns supplier {i} in region {i % 3}." for i in range(12))
+    first, second, *_ = TokenChunker(max_tokens=40, overlap_tokens=20).chunk(text)
+    return [
+        {"id": "b", "text": second, "source": "Audit", "page_start": 2, "page_end": 2},
+        {"id": "a", "text": first, "source": "Audit", "page_start": 1, "page_end": 1},
+        {"id": "copy", "text": first.upper(), "source": "Audit copy"},
+        {"id": "other", "text": "Unrelated note about the cafeteria menu.", "source": "Memo"},
+    ]
+
+
+def test_context_builder_merges_consecutive_chunks_and_drops_duplicates(audit_hits):
+    from app.domain.context_builder import ContextBuilder
+
+    first, second = audit_hits[1]["text"], audit_hits[0]["text"]
+
+    context = ContextBuilder(max_tokens=1000).build(audit_hits)
+
+    # Consecutive chunks become one passage in document order, sent once
+    assert [h["id"] for h in context.hits] == ["b", "other"]
+    merged = context.hits[0]
+    assert merged["text"].startswith(first) and merged["text"].endswith(second)
+    assert (merged["page_start"], merged["page_end"], merged["merged_ids"]) == (1, 2, ["a"])
+    assert {"id": "copy", "reason": "duplicate", "of": "b"} in context.dropped
+
+
+def test_context_builder_truncates_at_a_sentence_to_fit_the_budget(audit_hits):
+    from app.domain.context_builder import ContextBuilder
+
+    small = ContextBuilder(max_tokens=40, min_fragment_tokens=10).build(audit_hits)
+
+    # The first passage is cut at a sentence end, then what no longer fits is dropped
+    assert [h["id"] for h in small.hits] == ["b"] and small.hits[0]["truncated"]
+    assert small.hits[0]["text"].endswith(".") and small.tokens <= 40
+    assert {"id": "other", "reason": "budget"} in small.dropped
+
+
 def test_tenant_service_access():
     svc = TenantService()
     # Same-tenant always allowed
@@ -62,3 +344,304 @@ def test_tenant_service_access():
     assert svc.validate_cross_tenant_access("owner", "a", "b") is True
 
 
+class FakeConversationStore:
+    """Records turns; clearing ``release`` holds writes until it is set again."""
+
+    def __init__(self):
+        self.turns, self.messages = [], []
+        self.release = threading.Event()
+        self.release.set()
+
+    def record_turn(self, conversation_id, tenant_id, user_id, title, messages):
+        self.release.wait(5)
+        self.turns.append((conversation_id, title, [m.role for m in messages]))
+        self.messages.extend(messages)
+
+    def get_conversation_history(self, conversation_id, limit=50):
+        return self.messages[-limit:]
+
+
+@pytest.fixture
+def conversation_store():
+    return FakeConversationStore()
+
+
+def _ask(service, query, conversation_id=None):
+    from app.domain.models import ConversationalQueryRequest
+
+    request = ConversationalQueryRequest(
+        conversation_id=conversation_id, query=query, tenant_id="demo", user_id="u1"
+    )
+    return request, service.conversational_query(request)
+
+
+@pytest.fixture
+def deferred_service(store, llm, embedder, conversation_store):
+    from app.domain.conversational_service import ConversationalRagService
+
+    service = ConversationalRagService(
+        store, llm, embedder, conversation_store, rag_only=True, defer_persistence=True
+    )
+    yield service
+    conversation_store.release.set()
+    service.close()
+
+
+def test_first_conversation_turn_is_recorded_in_one_write(store, llm, embedder, conversation_store):
+    from app.domain.conversational_service import ConversationalRagService
+
+    service = ConversationalRagService(store, llm, embedder, conversation_store, rag_only=True)
+
+    _, first = _ask(service, "What is alpha?")
+
+    # The conversation is created by its first turn: no extra round trips
+    assert conversation_store.turns == [
+        (first.conversation_id, "What is alpha?", ["user", "assistant"])
+    ]
+
+
+def test_deferred_turn_is_visible_before_it_is_stored(deferred_service, conversation_store):
+    conversation_store.release.clear()  # hold background writes
+
+    request, _ = _ask(deferred_service, "And beta?", conversation_id="c1")
+
+    assert conversation_store.turns == []
+    assert [m.content for m in deferred_service._load_history(request)][-2] == "And beta?"
+
+
+def test_deferred_turn_is_stored_once_on_close(deferred_service, conversation_store):
+    conversation_store.release.clear()
+    request, _ = _ask(deferred_service, "And beta?", conversation_id="c1")
+    conversation_store.release.set()
+
+    deferred_service.close()
+
+    assert len(conversation_store.turns) == 1 and deferred_service._pending == {}
+    history = deferred_service._load_history(request)
+    assert [m.content for m in history].count("And beta?") == 1
+
+
+def test_async_conversational_query_matches_sync(tmp_path, store, llm, embedder):
+    import asyncio
+
+    from app.adapters.mock_store import MockConversationStore
+    from app.domain.conversational_service import ConversationalRagService
+    from app.domain.models import ConversationalQueryRequest
+
+    conversations = MockConversationStore(str(tmp_path))
+    service = ConversationalRagService(store, llm, embedder, conversations)
+
+    def request(conversation_id=None):
+        return ConversationalQueryRequest(
+            conversation_id=conversation_id, query="What is alpha?", tenant_id="demo", user_id="u1"
+        )
+
+    sync = service.conversational_query(request())
+    response = asyncio.run(service.aconversational_query(request(sync.conversation_id)))
+
+    assert response.answer == sync.answer and response.sources[0].content == "alpha"
+    assert len(conversations.get_conversation_history(sync.conversation_id)) == 4
+
+
+class SummarizingLLM:
+    """Answers at length and writes a recognisable summary; records every prompt."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def chat(self, messages):
+        self.prompts.append(messages[-1]["content"])
+        if "Updated summary:" in messages[-1]["content"]:
+            return "SUMMARY: user asked about topics " + ", ".join(
+                str(i) for i in range(len(self.prompts))
+            )
+        return "long answer " * 200
+
+    def answer_prompts(self):
+        return [p for p in self.prompts if "Updated summary:" not in p]
+
+
+@pytest.fixture
+def summarized_conversation(tmp_path, store, embedder):
+    """Five turns with a summary update after every turn beyond the newest two messages."""
+    from app.adapters.mock_store import MockConversationStore
+    from app.domain.conversational_service import ConversationalRagService
+    from app.domain.models import ConversationalQueryRequest
+    from app.domain.summarizer import ConversationSummarizer
+
+    llm = SummarizingLLM()
+    conversations = MockConversationStore(str(tmp_path))
+    summarizer = ConversationSummarizer(llm, every_n_turns=1, keep_recent_messages=2)
+    service = ConversationalRagService(
+        store,
+        llm,
+        embedder,
+        conversations,
+        summarizer=summarizer,
+        history_message_tokens=50,
+    )
+    conversation_id = None
+    for turn in range(5):
+        response = service.conversational_query(
+            ConversationalQueryRequest(
+                conversation_id=conversation_id, query=f"topic {turn}?", tenant_id="t", user_id="u"
+            )
+        )
+        conversation_id = response.conversation_id
+        service._background.submit(lambda: None).result()  # let summary updates finish
+    yield SimpleNamespace(llm=llm, conversations=conversations, conversation_id=conversation_id)
+    service.close()
+
+
+def test_conversation_summary_folds_in_all_but_the_newest_turn(summarized_conversation):
+    c = summarized_conversation
+
+    summary = c.conversations.get_summary(c.conversation_id)
+
+    assert summary is not None and summary.text.startswith("SUMMARY")
+    assert summary.through_seq == 8
+
+
+def test_retrieval_query_uses_the_summary_instead_of_older_turns(summarized_conversation, embedder):
+    query = embedder.queries[-1]
+
+    assert query.startswith("topic 4?") and "Summary: SUMMARY" in query
+    assert len(query) < 1000  # older answers are not pasted in
+
+
+def test_answer_prompt_keeps_only_recent_turns_next_to_the_summary(summarized_conversation):
+    prompt = summarized_conversation.llm.answer_prompts()[-1]
+
+    # Turns 0-2 are in the summary; only turn 3 is sent verbatim
+    assert "topic 2?" not in prompt and "topic 3?" in prompt
+    assert "Summary of the earlier conversation" in prompt
+
+
+def test_conversation_prompt_keeps_a_bounded_recent_window_with_a_summarizer(store, llm, embedder):
+    from datetime import datetime
+
+    from app.domain.conversational_service import ConversationalRagService
+    from app.domain.models import ConversationMessage
+    from app.domain.summarizer import ConversationSummarizer
+
+    history = [
+        ConversationMessage(
+            id=f"m{i}",
+            conversation_id="c1",
+            role="user" if i % 2 == 0 else "assistant",
+            content=f"message {i}",
+            timestamp=datetime(2025, 1, 1),
+        )
+        for i in range(8)
+    ]
+    summarizer = ConversationSummarizer(llm, keep_recent_messages=2)
+    service = ConversationalRagService(store, llm, embedder, None, summarizer=summarizer)
+
+    # No summary yet: the unsummarized tail is still cut to the recent window
+    messages = service._conversation_messages([], "next?", history)
+    prompt = " ".join(m["content"] for m in messages)
+    assert "message 5" not in prompt and "message 6" in prompt and "message 7" in prompt
+    service.close()
+
+
+def test_query_rewriter_only_treats_references_without_antecedent_as_follow_ups():
+    from app.domain.query_rewriter import QueryRewriter
+
+    follow_ups = ["What does it cost?", "And the price?", "Why?", "How is that calculated?"]
+    standalone = [
+        "Is there a vacation policy?",
+        "Does the travel policy cover its per diems?",
+        "Pricing tiers for XR-300?",
+    ]
+
+    assert all(QueryRewriter.is_follow_up(q) for q in follow_ups)
+    assert not any(QueryRewriter.is_follow_up(q) for q in standalone)
+
+
+@pytest.fixture
+def xr300_history():
+    from datetime import datetime
+
+    from app.domain.models import ConversationMessage
+
+    turn = [("user", "What is the XR-300 launch date?"), ("assistant", "It launches in May [1].")]
+    return [
+        ConversationMessage(
+            id=f"m{i}",
+            conversation_id="c1",
+            role=role,
+            content=text,
+            timestamp=datetime(2025, 1, 1),
+        )
+        for i, (role, text) in enumerate(turn)
+    ]
+
+
+class RewritingLLM:
+    """Rewrites every question to the XR-300 price question; fails on "fail"."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, messages):
+        self.calls += 1
+        if "fail" in messages[-1]["content"]:
+            raise RuntimeError("LLM down")
+        return '"What is the XR-300 price?"\n'
+
+
+def test_heuristic_rewriter_prefixes_only_follow_ups(xr300_history):
+    from app.domain.query_rewriter import QueryRewriter
+
+    heuristic = QueryRewriter()
+
+    assert heuristic.rewrite("c1", "Who owns the Q3 budget review?", xr300_history) == (
+        "Who owns the Q3 budget review?"
+    )
+    assert heuristic.rewrite("c1", "And its price?", xr300_history) == (
+        "What is the XR-300 launch date? And its price?"
+    )
+
+
+def test_llm_rewriter_caches_rewrites_per_turn(xr300_history):
+    from app.domain.query_rewriter import QueryRewriter
+
+    llm = RewritingLLM()
+    rewriter = QueryRewriter(llm, mode="llm")
+
+    assert rewriter.rewrite("c1", "And its price?", xr300_history) == "What is the XR-300 price?"
+    assert rewriter.rewrite("c1", "and its  price?", xr300_history) == "What is the XR-300 price?"
+    assert llm.calls == 1 and rewriter.stats["hits"] == 1
+
+
+def test_llm_rewriter_falls_back_to_the_heuristic(xr300_history):
+    from app.domain.query_rewriter import QueryRewriter
+
+    rewriter = QueryRewriter(RewritingLLM(), mode="llm")
+
+    rewritten = rewriter.rewrite("c1", "Why did it fail?", xr300_history)
+
+    assert rewritten == "What is the XR-300 launch date? Why did it fail?"
+
+
+def test_conversational_query_embeds_only_the_rewritten_question(
+    store, embedder, conversation_store, xr300_history
+):
+    from app.domain.conversational_service import ConversationalRagService
+    from app.domain.models import ConversationalQueryRequest
+    from app.domain.query_rewriter import QueryRewriter
+
+    conversation_store.messages = list(xr300_history)
+    llm = RewritingLLM()
+    rewriter = QueryRewriter(llm, mode="llm")
+    service = ConversationalRagService(
+        store, llm, embedder, conversation_store, rag_only=True, rewriter=rewriter
+    )
+
+    service.conversational_query(
+        ConversationalQueryRequest(
+            conversation_id="c1", query="And its price?", tenant_id="t", user_id="u"
+        )
+    )
+
+    assert embedder.queries == ["What is the XR-300 price?"]